@@ -0,0 +1,62 @@
+# Legal Markdown Converter - Email PDF Assembly Benchmark
+"""
+Times building the combined email PDF (body, cover sheets, placeholders and
+merged PDF attachments) for emails with a growing number of attachments, to
+show how assembly cost scales per attachment.
+
+Usage:
+    python benchmarks/bench_email_assembly.py [--attachments 50 100 200 400] [--compare before.json]
+
+Only convert_email_to_pdf is timed; the attachments that are converted
+separately (DOCX, RTF, images, ...) are not.
+"""
+
+import sys
+import random
+import argparse
+
+import fitz  # PyMuPDF
+
+from harness import measure, run_metadata, write_results, load_results, print_table, compare_results
+from corpus import email_with_attachments
+
+from email_converter import convert_email_to_pdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark email PDF assembly")
+    parser.add_argument("--attachments", type=int, nargs="+", default=[50, 100, 200, 400])
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_results_email.json")
+    parser.add_argument("--compare", help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    results = []
+    for count in args.attachments:
+        data = email_with_attachments(random.Random(f"{args.seed}:{count}"), count)
+        stats, (pdf_bytes, separate) = measure(lambda: convert_email_to_pdf(data, "production.eml"),
+                                               repeat=args.repeat)
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            pages = len(doc)
+        results.append(dict(stats, case=f"email_{count}_attachments", stage="email_assembly",
+                            pages=pages, pages_per_s=pages / stats['median_s'],
+                            ms_per_attachment=stats['median_s'] * 1000 / count,
+                            pdf_kb=len(pdf_bytes) / 1024, separate=len(separate)))
+        print(f"  {count} attachments done", file=sys.stderr)
+
+    write_results(args.output, results, run_metadata(repeat=args.repeat, seed=args.seed))
+    print_table(results)
+    print(f"\n{'case':<26} {'pages':>7} {'ms/attachment':>14} {'PDF KB':>9}")
+    for r in results:
+        print(f"{r['case']:<26} {r['pages']:>7} {r['ms_per_attachment']:>14.2f} {r['pdf_kb']:>9.0f}")
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        if compare_results(results, load_results(args.compare), args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Legal Markdown Converter - Email HTML Body Benchmark
+"""
+Compares the two ways an HTML-only email body has been turned into text: the
+old regex tag stripping and the streaming markdown converter (email_html).
+Each body is also laid out as PDF pages, since the email body goes through
+the combined email PDF.
+
+Usage:
+    python benchmarks/bench_email_html.py [--sizes 100 1000 5000] [--output email_html.json]
+
+Sizes are in KB of HTML.
+"""
+
+import re
+import sys
+import random
+import argparse
+
+from harness import measure, add_throughput, run_metadata, write_results, print_table
+from corpus import html_email_body
+
+from email_html import html_to_markdown
+from email_converter import create_email_body_pdf
+
+
+def regex_to_text(html_body):
+    """The tag stripping parse_eml used before email_html."""
+    body = re.sub(r'<[^>]+>', '', html_body)
+    body = body.replace('&nbsp;', ' ').replace('&amp;', '&')
+    return body.replace('&lt;', '<').replace('&gt;', '>')
+
+
+def layout(body):
+    doc = create_email_body_pdf({'headers': {'subject': 'Benchmark'}, 'body': body})
+    pages = len(doc)
+    doc.close()
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML email body conversion")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_results_email_html.json")
+    args = parser.parse_args()
+
+    results = []
+    for size_kb in args.sizes:
+        html = html_email_body(random.Random(f"{args.seed}:{size_kb}"), size_kb * 1024)
+        case = f"html_body_{size_kb}kb"
+        for stage, convert in (('regex', regex_to_text), ('html_to_markdown', html_to_markdown)):
+            stats, text = measure(lambda: convert(html), repeat=args.repeat)
+            results.append(add_throughput(dict(stats, case=case, stage=stage, output_chars=len(text)),
+                                          size_bytes=len(html)))
+            stats, pages = measure(lambda: layout(text), repeat=args.repeat, track_memory=False)
+            results.append(add_throughput(dict(stats, case=case, stage=f"{stage}+pdf_layout", pages=pages),
+                                          pages=pages))
+        print(f"  {case} done", file=sys.stderr)
+
+    write_results(args.output, results, run_metadata(repeat=args.repeat, seed=args.seed))
+    print_table(results)
+    print(f"\n{'case':<26} {'stage':<28} {'output chars':>13} {'pages':>7}")
+    for r in results:
+        print(f"{r['case']:<26} {r['stage']:<28} {r.get('output_chars', '-'):>13} {r.get('pages', '-'):>7}")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Legal Markdown Converter - OCR Preprocessing Benchmark
+"""
+Measures how much image preprocessing (ocr_preprocess) changes Tesseract time
+per page on scanned PDFs, and what it does to the recognized text.
+
+Usage:
+    python benchmarks/bench_ocr_preprocess.py [--samples ~/real_scans] [--output ocr_pre.json]
+
+For each scanned page this times Tesseract on the raw 2x render, the
+preprocessing itself, and Tesseract on the preprocessed image. Text quality is
+reported as the share of recognized words found in the corpus vocabulary
+(synthetic cases) and as the word-level similarity of the two outputs.
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from difflib import SequenceMatcher
+
+from harness import measure, run_metadata, write_results, print_table
+from corpus import generate_corpus, WORDS, CASE_NAMES
+
+import fitz  # PyMuPDF
+import pytesseract
+from PIL import Image
+
+from ocr_preprocess import preprocess_page, pixmap_to_array, HAS_NUMPY
+
+VOCABULARY = set(WORDS) | {w.lower() for name in CASE_NAMES for w in re.findall(r"[A-Za-z]+", name)} | {"page"}
+
+
+def words(text):
+    return re.findall(r"[a-z]+", text.lower())
+
+
+def vocab_hit_rate(text):
+    found = words(text)
+    return sum(1 for w in found if w in VOCABULARY) / len(found) if found else 0.0
+
+
+def scanned_inputs(corpus_dir, samples_dir=None):
+    inputs = []
+    with open(os.path.join(corpus_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    for entry in manifest['files']:
+        if entry['kind'] == 'pdf' and 'scanned' in entry['case']:
+            inputs.append((entry['case'], os.path.join(corpus_dir, entry['filename']), True))
+    if samples_dir:
+        for name in sorted(os.listdir(samples_dir)):
+            if name.lower().endswith('.pdf'):
+                inputs.append((f"sample:{name}", os.path.join(samples_dir, name), False))
+    return inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR image preprocessing")
+    parser.add_argument("--corpus", default="bench_corpus")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--samples", help="Folder of real scanned PDFs to include")
+    parser.add_argument("--max-pages", type=int, default=5, help="Pages measured per document")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default="bench_results_ocr_preprocess.json")
+    args = parser.parse_args()
+
+    if not HAS_NUMPY:
+        sys.exit("NumPy is required for OCR preprocessing (pip install numpy)")
+    if not os.path.exists(os.path.join(args.corpus, 'manifest.json')):
+        generate_corpus(args.corpus, args.seed, args.scale)
+
+    results = []
+    for case, path, synthetic in scanned_inputs(args.corpus, args.samples):
+        with fitz.open(path) as doc:
+            pages = min(len(doc), args.max_pages)
+            totals = {'tesseract_raw': 0.0, 'preprocess': 0.0, 'tesseract_preprocessed': 0.0}
+            raw_text, clean_text = [], []
+            for page_num in range(pages):
+                page = doc[page_num]
+                rgb = page.get_pixmap(matrix=fitz.Matrix(2, 2))
+                raw_img = Image.frombytes("RGB", (rgb.width, rgb.height), rgb.samples)
+                gray = pixmap_to_array(page.get_pixmap(matrix=fitz.Matrix(2, 2), colorspace=fitz.csGRAY))
+
+                stats, text = measure(lambda: pytesseract.image_to_string(raw_img),
+                                      repeat=args.repeat, warmup=0, track_memory=False)
+                totals['tesseract_raw'] += stats['median_s']
+                raw_text.append(text)
+
+                stats, clean_img = measure(lambda: preprocess_page(gray), repeat=args.repeat, warmup=0)
+                totals['preprocess'] += stats['median_s']
+                if clean_img is None:
+                    continue
+                stats, text = measure(lambda: pytesseract.image_to_string(clean_img),
+                                      repeat=args.repeat, warmup=0, track_memory=False)
+                totals['tesseract_preprocessed'] += stats['median_s']
+                clean_text.append(text)
+
+        raw, clean = "\n".join(raw_text), "\n".join(clean_text)
+        for stage, seconds in totals.items():
+            results.append({'case': case, 'stage': stage, 'pages': pages, 'median_s': seconds / pages,
+                            'pages_per_s': pages / seconds if seconds else 0.0})
+        summary = results[-1]
+        summary['speedup_vs_raw'] = (totals['tesseract_raw'] /
+                                     (totals['preprocess'] + totals['tesseract_preprocessed'] or 1e-9))
+        summary['word_similarity'] = SequenceMatcher(None, words(raw), words(clean), autojunk=False).ratio()
+        if synthetic:
+            summary['vocab_hit_raw'] = vocab_hit_rate(raw)
+            summary['vocab_hit_preprocessed'] = vocab_hit_rate(clean)
+        print(f"  {case:<26} done", file=sys.stderr)
+
+    write_results(args.output, results, run_metadata(repeat=args.repeat, max_pages=args.max_pages))
+    print("Times below are seconds per page.")
+    print_table(results)
+    print(f"\n{'case':<26} {'speedup':>9} {'similarity':>11} {'vocab hits (raw/preprocessed)':>31}")
+    for r in results[2::3]:
+        hits = (f"{r['vocab_hit_raw']:.3f}/{r['vocab_hit_preprocessed']:.3f}"
+                if 'vocab_hit_raw' in r else '-')
+        print(f"{r['case']:<26} {r['speedup_vs_raw']:>8.2f}x {r['word_similarity']:>11.3f} {hits:>31}")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# Legal Markdown Converter - PDF Text Engine Comparison
+"""
+Compares the MarkItDown (pdfminer) and PyMuPDF engines on text PDFs: throughput
+and how much their output differs.
+
+Usage:
+    python benchmarks/bench_pdf_engines.py [--samples ~/real_pdfs] [--output engines.json]
+
+Output similarity is a word-level diff ratio (1.0 = identical words in the same
+order), so layout differences such as line wrapping do not count as changes.
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from io import BytesIO
+from difflib import SequenceMatcher
+
+from harness import measure, add_throughput, run_metadata, write_results, print_table
+from corpus import generate_corpus
+
+import fitz  # PyMuPDF
+from markitdown import MarkItDown
+
+from pymupdf_converter import pdf_to_markdown
+
+ENGINES = {
+    'markitdown': lambda data: MarkItDown().convert_stream(BytesIO(data)).markdown,
+    'pymupdf': lambda data: pdf_to_markdown(data),
+}
+
+
+def words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def heading_count(text):
+    return sum(1 for line in text.splitlines() if line.startswith('#'))
+
+
+def pdf_inputs(corpus_dir, samples_dir=None):
+    inputs = []
+    with open(os.path.join(corpus_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    for entry in manifest['files']:
+        if entry['kind'] == 'pdf' and 'scanned' not in entry['case']:
+            inputs.append((entry['case'], os.path.join(corpus_dir, entry['filename'])))
+    if samples_dir:
+        for name in sorted(os.listdir(samples_dir)):
+            if name.lower().endswith('.pdf'):
+                inputs.append((f"sample:{name}", os.path.join(samples_dir, name)))
+    return inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PDF text extraction engines")
+    parser.add_argument("--corpus", default="bench_corpus")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--samples", help="Folder of real PDFs to include")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_results_pdf_engines.json")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.corpus, 'manifest.json')):
+        generate_corpus(args.corpus, args.seed, args.scale)
+
+    results = []
+    for case, path in pdf_inputs(args.corpus, args.samples):
+        with open(path, 'rb') as f:
+            data = f.read()
+        with fitz.open(stream=data, filetype='pdf') as doc:
+            pages = len(doc)
+
+        outputs = {}
+        for engine, fn in ENGINES.items():
+            stats, output = measure(lambda: fn(data), repeat=args.repeat)
+            outputs[engine] = output
+            record = {'case': case, 'stage': engine, 'chars': len(output), 'headings': heading_count(output)}
+            record.update(add_throughput(stats, len(data), pages))
+            results.append(record)
+            print(f"  {case:<26} {engine:<12} done", file=sys.stderr)
+
+        reference, candidate = words(outputs['markitdown']), words(outputs['pymupdf'])
+        similarity = SequenceMatcher(None, reference, candidate, autojunk=False).ratio()
+        speedup = results[-2]['median_s'] / results[-1]['median_s'] if results[-1]['median_s'] else 0.0
+        results[-1]['word_similarity'] = similarity
+        results[-1]['speedup_vs_markitdown'] = speedup
+
+    write_results(args.output, results, run_metadata(repeat=args.repeat))
+    print_table(results)
+    print(f"\n{'case':<26} {'speedup':>9} {'similarity':>11} {'headings (markitdown/pymupdf)':>31}")
+    for markitdown_result, pymupdf_result in zip(results[::2], results[1::2]):
+        print(f"{pymupdf_result['case']:<26} {pymupdf_result['speedup_vs_markitdown']:>8.1f}x "
+              f"{pymupdf_result['word_similarity']:>11.3f} "
+              f"{markitdown_result['headings']:>19}/{pymupdf_result['headings']}")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
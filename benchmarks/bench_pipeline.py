@@ -0,0 +1,188 @@
+# Legal Markdown Converter - Per-Stage Pipeline Benchmark
+"""
+Times each stage of the conversion pipeline on the synthetic corpus and
+reports throughput and peak memory as JSON.
+
+Usage:
+    python benchmarks/bench_pipeline.py                          # generate corpus + run
+    python benchmarks/bench_pipeline.py --output before.json
+    python benchmarks/bench_pipeline.py --compare before.json    # flag regressions
+    python benchmarks/bench_pipeline.py --samples ~/real_msgs    # add real files (e.g. .msg)
+
+Stages: needs_ocr, ocr_pdf, markitdown, pandoc, strip_westlaw_links,
+email_assembly, zip and end_to_end (process_single_file).
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from io import BytesIO
+
+from harness import (measure, add_throughput, run_metadata, write_results, load_results,
+                     print_table, compare_results)
+from corpus import generate_corpus
+
+import fitz  # PyMuPDF
+from markitdown import MarkItDown
+
+import gui_launcher
+from gui_launcher import needs_ocr, ocr_pdf, strip_westlaw_links, process_zip_file, process_single_file
+from email_converter import process_email_file
+
+OCR_STAGES = {'ocr_pdf'}
+
+
+def runs_ocr(stage, entry, path):
+    """True for Tesseract stages, and for end_to_end runs of PDFs the pipeline will OCR."""
+    if stage in OCR_STAGES:
+        return True
+    return stage == 'end_to_end' and entry['kind'] == 'pdf' and needs_ocr(path)
+
+
+def markitdown_stage(data):
+    return MarkItDown().convert_stream(BytesIO(data)).markdown
+
+
+def pandoc_stage(path, input_format):
+    return subprocess.run(["pandoc", path, "-f", input_format, "-t", "markdown"],
+                          capture_output=True, check=True, text=True).stdout
+
+
+def end_to_end_stage(filename, data):
+    session_id = "benchmark"
+    state = gui_launcher.shared_state
+    state.create_session(session_id, {
+        'total': 1, 'current': 1, 'results': [], 'current_status': '', 'complete': False
+    })
+    result = None
+    try:
+        result = process_single_file(filename, data, session_id, save_locally=False)
+        if result['type'] != 'success':
+            raise RuntimeError(result['message'])
+        return result
+    finally:
+        state.delete_session(session_id)
+        # Remove the converted file kept for download
+        if result and result.get('file_id'):
+            state.expire_artifact(result['file_id'], 0)
+            state.purge_expired()
+
+
+def pdf_page_count(data):
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        return len(doc)
+
+
+def stages_for(entry, path, data):
+    """Return ``(stage, fn, pages)`` tuples for one corpus file."""
+    kind, case, filename = entry['kind'], entry['case'], entry['filename']
+    stages = []
+
+    if kind == 'pdf':
+        pages = pdf_page_count(data)
+        stages.append(('needs_ocr', lambda: needs_ocr(path), pages))
+        if 'scanned' not in case:
+            stages.append(('markitdown', lambda: markitdown_stage(data), pages))
+        if 'scanned' in case or 'mixed' in case:
+            stages.append(('ocr_pdf', lambda: ocr_pdf(path), pages))
+    elif kind in ('eml', 'msg'):
+        stages.append(('email_assembly', lambda: process_email_file(data, filename), None))
+    elif kind == 'zip':
+        stages.append(('zip', lambda: process_zip_file(data, filename), None))
+    elif kind == 'rtf':
+        stages.append(('pandoc', lambda: pandoc_stage(path, 'rtf'), None))
+    elif kind == 'docx':
+        stages.append(('pandoc', lambda: pandoc_stage(path, 'docx'), None))
+        stages.append(('markitdown', lambda: markitdown_stage(data), None))
+    elif kind == 'markdown':
+        text = data.decode('utf-8')
+        stages.append(('strip_westlaw_links', lambda: strip_westlaw_links(text), None))
+
+    if kind != 'markdown':
+        stages.append(('end_to_end', lambda: end_to_end_stage(filename, data), None))
+    return stages
+
+
+def sample_entries(samples_dir):
+    """Describe real sample files (e.g. Outlook .msg) in the same shape as the manifest."""
+    kinds = {'.pdf': 'pdf', '.eml': 'eml', '.msg': 'msg', '.zip': 'zip', '.docx': 'docx', '.rtf': 'rtf'}
+    entries = []
+    for name in sorted(os.listdir(samples_dir)):
+        kind = kinds.get(os.path.splitext(name)[1].lower())
+        if kind:
+            entries.append({'case': f"sample:{name}", 'filename': name, 'kind': kind,
+                            'bytes': os.path.getsize(os.path.join(samples_dir, name)), 'dir': samples_dir})
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each conversion pipeline stage")
+    parser.add_argument("--corpus", default="bench_corpus", help="Corpus folder (generated if missing)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--samples", help="Folder of real sample files to include (e.g. .msg)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cases", nargs="*", help="Only run these corpus cases")
+    parser.add_argument("--stages", nargs="*", help="Only run these stages")
+    parser.add_argument("--skip-ocr", action="store_true",
+                        help="Skip Tesseract stages and end_to_end for PDFs that need OCR "
+                             "(photos attached to the test emails are still OCR'd)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak-memory run")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Regression threshold (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    manifest_path = os.path.join(args.corpus, "manifest.json")
+    manifest = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    if not manifest or manifest['seed'] != args.seed or manifest['scale'] != args.scale:
+        print(f"Generating corpus in {args.corpus} (seed={args.seed}, scale={args.scale})...")
+        manifest = generate_corpus(args.corpus, args.seed, args.scale)
+
+    entries = [dict(e, dir=args.corpus) for e in manifest['files']]
+    if args.samples:
+        entries += sample_entries(args.samples)
+
+    results = []
+    for entry in entries:
+        if args.cases and entry['case'] not in args.cases:
+            continue
+        path = os.path.join(entry['dir'], entry['filename'])
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        for stage, fn, pages in stages_for(entry, path, data):
+            if args.stages and stage not in args.stages:
+                continue
+            if args.skip_ocr and runs_ocr(stage, entry, path):
+                continue
+            # OCR is slow enough that one timed run is representative
+            repeat = 1 if stage in OCR_STAGES else args.repeat
+            warmup = 0 if stage in OCR_STAGES else 1
+            record = {'case': entry['case'], 'stage': stage}
+            try:
+                stats, _ = measure(fn, repeat=repeat, warmup=warmup, track_memory=not args.no_memory)
+                record.update(add_throughput(stats, len(data), pages))
+            except Exception as e:
+                record['error'] = str(e)
+            results.append(record)
+            print(f"  {entry['case']:<26} {stage:<22} done", file=sys.stderr)
+
+    meta = run_metadata(seed=args.seed, scale=args.scale, repeat=args.repeat)
+    write_results(args.output, results, meta)
+    print_table(results)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        regressions = compare_results(results, load_results(args.compare), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
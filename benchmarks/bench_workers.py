@@ -0,0 +1,181 @@
+# Legal Markdown Converter - Distributed Worker Benchmark
+"""
+Runs a coordinator and several worker processes on this machine, standing in
+for office machines, uploads the benchmark corpus to the coordinator and
+times how long it takes until every file is converted.
+
+Usage:
+    python benchmarks/bench_workers.py [--workers 1 2 4] [--slots 1] [--kill-one]
+
+Each process runs gui_launcher.py in its own folder with its own config.json
+(state database and output folder), exactly as a separate machine would. The
+coordinator has "job_workers": 0, so every conversion happens on a worker.
+--kill-one kills a worker as soon as it has claimed a job, to check that the
+job is reassigned and the upload still completes.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+
+from harness import run_metadata, write_results, load_results, print_table, compare_results, REPO_ROOT
+from corpus import generate_corpus
+
+# Seconds to wait for an instance to start answering, and for an upload to finish
+STARTUP_TIMEOUT = 60
+CONVERSION_TIMEOUT = 3600
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_instance(folder, config):
+    """Run gui_launcher.py in ``folder`` with ``config`` as its config.json."""
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, 'config.json'), 'w') as f:
+        json.dump(config, f, indent=2)
+    log = open(os.path.join(folder, 'server.log'), 'w')
+    return subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, 'gui_launcher.py')],
+                            cwd=folder, stdout=log, stderr=subprocess.STDOUT)
+
+
+def get_json(url, token=None):
+    headers = {'X-Worker-Token': token} if token else {}
+    with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as response:
+        return json.loads(response.read())
+
+
+def wait_until_up(url, token):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            return get_json(url + '/workers', token)
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"{url} did not start within {STARTUP_TIMEOUT}s")
+
+
+def upload(url, paths):
+    """POST files to /process as a browser would; returns the session ID."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="files"; '
+                     f'filename="{os.path.basename(path)}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8') + data + b'\r\n')
+    body = b''.join(parts) + f'--{boundary}--\r\n'.encode('utf-8')
+    req = urllib.request.Request(url + '/process', data=body, method='POST',
+                                 headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    with urllib.request.urlopen(req, timeout=300) as response:
+        return json.loads(response.read())['session_id']
+
+
+def run_cluster(args, paths, worker_count, root):
+    port = free_port()
+    url = f'http://127.0.0.1:{port}'
+    coordinator_dir = os.path.join(root, 'coordinator')
+    token = uuid.uuid4().hex
+    processes = [start_instance(coordinator_dir, {
+        'server': {'mode': 'development', 'port': port, 'job_workers': 0, 'worker_token': token,
+                   'state_db': 'lmc_state.db'},
+        'local_save': {'path': os.path.join(coordinator_dir, 'output')},
+        'tracing': {'enabled': False}})]
+    workers = {}
+    try:
+        wait_until_up(url, token)
+        for i in range(worker_count):
+            name = f'worker-{i + 1}'
+            worker_dir = os.path.join(root, name)
+            workers[name] = start_instance(worker_dir, {
+                'server': {'mode': 'worker', 'state_db': 'lmc_state.db'},
+                'worker': {'coordinator': url, 'name': name, 'slots': args.slots, 'token': token},
+                'local_save': {'path': os.path.join(worker_dir, 'output')},
+                'tracing': {'enabled': False}})
+        processes += workers.values()
+        while len(get_json(url + '/workers', token)['workers']) < worker_count:
+            time.sleep(0.2)
+
+        start = time.perf_counter()
+        session_id = upload(url, paths)
+        killed = None
+        deadline = time.monotonic() + CONVERSION_TIMEOUT
+        while time.monotonic() < deadline:
+            if args.kill_one and killed is None and worker_count > 1:
+                busy = [w['name'] for w in get_json(url + '/workers', token)['workers'] if w['running']]
+                if busy:
+                    killed = busy[0]
+                    workers[killed].kill()
+                    print(f"  killed {killed}", file=sys.stderr)
+            status = get_json(f'{url}/status/{session_id}')
+            if status['complete']:
+                break
+            time.sleep(0.2)
+        else:
+            raise RuntimeError(f"conversion did not finish within {CONVERSION_TIMEOUT}s")
+        elapsed = time.perf_counter() - start
+    finally:
+        for process in processes:
+            process.kill()
+            process.wait()
+
+    per_worker = {}
+    for result in status['results']:
+        per_worker[result.get('worker', '?')] = per_worker.get(result.get('worker', '?'), 0) + 1
+    errors = [r['message'] for r in status['results'] if r['type'] == 'error']
+    return {'case': f'{worker_count}_workers', 'stage': 'cluster', 'runs': 1, 'median_s': elapsed,
+            'files': len(paths), 'files_per_s': len(paths) / elapsed, 'per_worker': per_worker,
+            'errors': errors, 'killed': killed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark conversions spread over local worker processes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--slots", type=int, default=1, help="Jobs each worker converts at a time")
+    parser.add_argument("--kill-one", action="store_true", help="Kill a busy worker to test reassignment")
+    parser.add_argument("--corpus", default="bench_corpus")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--output", default="bench_results_workers.json")
+    parser.add_argument("--compare", help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.corpus, 'manifest.json')):
+        generate_corpus(args.corpus, args.seed, args.scale)
+    with open(os.path.join(args.corpus, 'manifest.json')) as f:
+        paths = [os.path.abspath(os.path.join(args.corpus, entry['filename'])) for entry in json.load(f)['files']]
+
+    results = []
+    for count in args.workers:
+        with tempfile.TemporaryDirectory(prefix='lmc_cluster_') as root:
+            results.append(run_cluster(args, paths, count, root))
+        print(f"  {count} workers done", file=sys.stderr)
+
+    write_results(args.output, results, run_metadata(slots=args.slots, kill_one=args.kill_one))
+    print_table(results)
+    print(f"\n{'case':<26} {'files/s':>8} {'errors':>7}  per worker")
+    for r in results:
+        spread = ', '.join(f"{name}: {count}" for name, count in sorted(r['per_worker'].items()))
+        note = f" (killed {r['killed']})" if r['killed'] else ''
+        print(f"{r['case']:<26} {r['files_per_s']:>8.2f} {len(r['errors']):>7}  {spread}{note}")
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        if compare_results(results, load_results(args.compare), args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
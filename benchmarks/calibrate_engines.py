@@ -0,0 +1,135 @@
+# Legal Markdown Converter - Engine Routing Calibration
+"""
+Runs every engine that can convert each benchmark file and writes the routing
+table used by ``"conversion": {"routing": "auto"}`` (see engine_router).
+
+Usage:
+    python benchmarks/calibrate_engines.py [--samples ~/real_docs] [--quality-floor 0.9]
+                                           [--routes engine_routes.json]
+
+For each format and size bucket the fastest engine (seconds per MB) whose
+output stays within the quality floor is chosen. Quality is the word-level
+similarity of an engine's output to the default engine's output on the same
+file, taking the worst file in the bucket. Scanned PDFs are skipped; they go
+to OCR regardless of the text engine.
+
+Run it from the folder that holds config.json, or pass --routes with the path
+configured as ``routes_file``.
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from io import BytesIO
+from difflib import SequenceMatcher
+
+from harness import measure, run_metadata, write_results, print_table, REPO_ROOT
+from corpus import generate_corpus
+
+from pymupdf_converter import pdf_to_markdown
+from format_sniffer import sniff_format, resolve_extension
+from engine_router import (candidates, size_bucket, calibrate, save_routes, DEFAULT_ENGINES,
+                           DEFAULT_QUALITY_FLOOR, DEFAULT_ROUTES_FILE)
+from gui_launcher import run_markitdown, run_pandoc, needs_ocr, PANDOC_FORMATS
+
+
+def run_engine(engine, fmt, path, data):
+    if engine == 'pymupdf':
+        return pdf_to_markdown(data)
+    if engine == 'pandoc':
+        return run_pandoc(path, fmt)
+    return run_markitdown(BytesIO(data))
+
+
+def words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def file_format(path):
+    """Routing format of a file ('pdf' or a pandoc reader), or None if it has one engine only."""
+    name = os.path.basename(path)
+    ext = resolve_extension(sniff_format(path, name), name)
+    fmt = 'pdf' if ext == '.pdf' else PANDOC_FORMATS.get(ext)
+    if fmt is None or len(candidates(fmt)) < 2:
+        return None
+    if fmt == 'pdf' and needs_ocr(path):
+        return None
+    return fmt
+
+
+def calibration_inputs(corpus_dir, samples_dir=None):
+    inputs = []
+    with open(os.path.join(corpus_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    for entry in manifest['files']:
+        inputs.append((entry['case'], os.path.join(corpus_dir, entry['filename'])))
+    if samples_dir:
+        for name in sorted(os.listdir(samples_dir)):
+            path = os.path.join(samples_dir, name)
+            if os.path.isfile(path):
+                inputs.append((f"sample:{name}", path))
+    return [(case, path, fmt) for case, path in inputs for fmt in [file_format(path)] if fmt]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the engine routing table")
+    parser.add_argument("--corpus", default="bench_corpus")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--samples", help="Folder of real documents to include (recommended)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--quality-floor", type=float, default=DEFAULT_QUALITY_FLOOR)
+    parser.add_argument("--routes", default=os.path.join(REPO_ROOT, DEFAULT_ROUTES_FILE),
+                        help="Routing table to write")
+    parser.add_argument("--output", default="bench_results_engines.json")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.corpus, 'manifest.json')):
+        generate_corpus(args.corpus, args.seed, args.scale)
+
+    results, measurements = [], []
+    for case, path, fmt in calibration_inputs(args.corpus, args.samples):
+        with open(path, 'rb') as f:
+            data = f.read()
+        bucket = size_bucket(len(data))
+        megabytes = max(len(data) / (1024 * 1024), 1e-6)
+
+        outputs = {}
+        for engine in candidates(fmt):
+            try:
+                stats, outputs[engine] = measure(lambda: run_engine(engine, fmt, path, data),
+                                                 repeat=args.repeat, track_memory=False)
+            except Exception as e:
+                results.append({'case': case, 'stage': engine, 'error': str(e)})
+                continue
+            results.append(dict(stats, case=case, stage=engine, format=fmt, bucket=bucket))
+            measurements.append({'format': fmt, 'bucket': bucket, 'engine': engine,
+                                 'seconds_per_mb': stats['median_s'] / megabytes})
+            print(f"  {case:<26} {engine:<12} done", file=sys.stderr)
+
+        reference = words(outputs.get(DEFAULT_ENGINES[fmt], ''))
+        for m in measurements:
+            if 'quality' not in m:
+                candidate = words(outputs[m['engine']])
+                m['quality'] = SequenceMatcher(None, reference, candidate, autojunk=False).ratio() \
+                    if reference else 0.0
+
+    routes = calibrate(measurements, args.quality_floor)
+    meta = run_metadata(repeat=args.repeat, quality_floor=args.quality_floor)
+    save_routes(args.routes, routes, args.quality_floor, meta)
+    write_results(args.output, results, meta)
+
+    print_table(results)
+    print(f"\n{'format':<10} {'bucket':<8} {'engine':<12} {'s/MB':>8} {'quality':>8}")
+    for fmt, buckets in routes.items():
+        for bucket, route in buckets.items():
+            print(f"{fmt:<10} {bucket:<8} {route['engine']:<12} {route['seconds_per_mb']:>8.3f} "
+                  f"{route['quality']:>8.3f}")
+    print(f"\nRouting table written to {args.routes}")
+    print('Enable it with "conversion": {"routing": "auto"} in config.json')
+
+
+if __name__ == "__main__":
+    main()
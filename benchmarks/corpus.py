@@ -0,0 +1,339 @@
+# Legal Markdown Converter - Synthetic Benchmark Corpus
+"""
+Deterministic generator for representative benchmark inputs.
+
+Every file is derived from a seeded random generator, so two runs with the same
+seed and scale produce identical bytes and benchmark results can be compared
+between commits.
+
+Usage:
+    python benchmarks/corpus.py --out bench_corpus [--seed 1234] [--scale 1.0]
+
+Outlook .msg files cannot be synthesized (there is no writer for the OLE
+container); put real samples in a folder and pass it to the benchmark with
+``--samples`` instead.
+"""
+
+import os
+import io
+import json
+import random
+import zipfile
+import argparse
+from email.message import EmailMessage
+from email.utils import format_datetime
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw
+
+WORDS = (
+    "plaintiff defendant court motion summary judgment discovery deposition exhibit "
+    "counsel pursuant agreement breach contract damages liability negligence witness "
+    "testimony objection sustained overruled hearing transcript order appeal statute "
+    "jurisdiction venue party claim respondent petitioner affidavit evidence record "
+    "the of and to in that is for on with as by at this which be from or an was"
+).split()
+
+CASE_NAMES = ["Smith v. Jones", "Acme Corp. v. Roadrunner LLC", "In re Estate of Brown",
+              "State v. Doe", "Texas Oil Co. v. Gulf Pipeline, Inc."]
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+
+
+def sentence(rng, min_words=8, max_words=24):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize() + "."
+
+
+def paragraph(rng, sentences=5):
+    return " ".join(sentence(rng) for _ in range(rng.randint(max(1, sentences - 2), sentences + 2)))
+
+
+def westlaw_markdown(rng, paragraphs=200):
+    """Markdown shaped like a converted Westlaw download, full of citation links."""
+    parts = []
+    for i in range(paragraphs):
+        text = paragraph(rng)
+        case = rng.choice(CASE_NAMES)
+        link = (f"[{case}, {rng.randint(100, 999)} S.W.3d {rng.randint(1, 999)}]"
+                f"(https://1.next.westlaw.com/Link/Document/FullText?findType=Y&serNum={rng.randint(10**6, 10**7)}"
+                f"&originatingDoc=I{rng.randint(10**9, 10**10)}(Keycite))")
+        parts.append(f"{text} See {link}.  {sentence(rng)}")
+        if i % 10 == 0:
+            parts.append(f"## Section {i // 10 + 1}")
+    return "\n\n".join(parts)
+
+
+def _text_page(doc, rng, page_num):
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.insert_textbox(fitz.Rect(72, 60, 540, 90), f"{rng.choice(CASE_NAMES)} - Page {page_num}",
+                        fontsize=14, fontname="helv")
+    body = "\n\n".join(paragraph(rng, 4) for _ in range(4))
+    page.insert_textbox(fitz.Rect(72, 100, 540, 740), body, fontsize=10, fontname="helv")
+    return page
+
+
+def text_pdf(rng, pages):
+    """A born-digital PDF with a text layer on every page."""
+    doc = fitz.open()
+    for i in range(pages):
+        _text_page(doc, rng, i + 1)
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
+
+
+def _scan_image(rng, page, fax=False):
+    """Render a text page to pixels, optionally degraded like a fax (gray, speckle, skew)."""
+    pix = page.get_pixmap(matrix=fitz.Matrix(1.5, 1.5), colorspace=fitz.csGRAY)
+    img = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    if fax:
+        background = Image.new("L", img.size, 200)
+        img = Image.composite(img, background, img.point(lambda v: 255 if v < 128 else 0))
+        draw = ImageDraw.Draw(img)
+        draw.point([(rng.randrange(img.width), rng.randrange(img.height)) for _ in range(4000)], fill=30)
+        img = img.rotate(rng.uniform(-2.0, 2.0), fillcolor=200, expand=False)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def scanned_pdf(rng, pages, fax=False):
+    """An image-only PDF (no text layer), as produced by a scanner."""
+    source = fitz.open()
+    doc = fitz.open()
+    for i in range(pages):
+        text_page = _text_page(source, rng, i + 1)
+        png = _scan_image(rng, text_page, fax=fax)
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        page.insert_image(page.rect, stream=png)
+    source.close()
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
+
+
+def mixed_pdf(rng, pages):
+    """Alternating text and scanned pages, plus a blank page every tenth page."""
+    source = fitz.open()
+    doc = fitz.open()
+    for i in range(pages):
+        if i % 10 == 9:
+            doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        elif i % 2 == 0:
+            _text_page(doc, rng, i + 1)
+        else:
+            png = _scan_image(rng, _text_page(source, rng, i + 1))
+            page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            page.insert_image(page.rect, stream=png)
+    source.close()
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
+
+
+def png_image(rng, width=800, height=600):
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    for line in range(0, height - 40, 30):
+        draw.text((40, 20 + line), sentence(rng, 4, 10), fill="black")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def rtf_document(rng, paragraphs):
+    """An RTF document - saved with a .doc extension like Westlaw exports."""
+    parts = [r"{\rtf1\ansi\deff0{\fonttbl{\f0 Times New Roman;}}\f0\fs24 "]
+    for i in range(paragraphs):
+        if i % 20 == 0:
+            parts.append(r"{\b\fs32 " + f"Section {i // 20 + 1}" + r"}\par ")
+        parts.append(paragraph(rng) + r"\par ")
+    parts.append("}")
+    return "".join(parts).encode("ascii")
+
+
+def docx_document(rng, paragraphs):
+    """A minimal but valid DOCX with headings, body text and Westlaw hyperlinks."""
+    body = []
+    rels = []
+    for i in range(paragraphs):
+        if i % 25 == 0:
+            body.append('<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr>'
+                        f'<w:r><w:t>Section {i // 25 + 1}</w:t></w:r></w:p>')
+        rid = f"rId{100 + i}"
+        rels.append(f'<Relationship Id="{rid}" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+                    f'relationships/hyperlink" Target="https://1.next.westlaw.com/Link/Document/{i}" '
+                    'TargetMode="External"/>')
+        body.append(f'<w:p><w:r><w:t xml:space="preserve">{escape(paragraph(rng))} </w:t></w:r>'
+                    f'<w:hyperlink r:id="{rid}"><w:r><w:t>{escape(rng.choice(CASE_NAMES))}</w:t></w:r>'
+                    '</w:hyperlink></w:p>')
+
+    document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+                'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                f'<w:body>{"".join(body)}</w:body></w:document>')
+    content_types = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                     '<Default Extension="xml" ContentType="application/xml"/>'
+                     '<Override PartName="/word/document.xml" ContentType="application/'
+                     'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>')
+    package_rels = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+                    'relationships/officeDocument" Target="word/document.xml"/></Relationships>')
+    document_rels = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                     f'{"".join(rels)}</Relationships>')
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        # Fixed timestamps keep the archive bytes deterministic
+        for name, xml in (("[Content_Types].xml", content_types), ("_rels/.rels", package_rels),
+                          ("word/document.xml", document), ("word/_rels/document.xml.rels", document_rels)):
+            zf.writestr(zipfile.ZipInfo(name, date_time=(2025, 1, 1, 0, 0, 0)), xml)
+    return buf.getvalue()
+
+
+def html_email_body(rng, size_bytes):
+    """An HTML email body of about ``size_bytes`` shaped like Outlook output: layout tables,
+    inline styles, entities and a reply chain quoted a level deeper per reply."""
+    style = "font-family:Calibri,sans-serif;font-size:11pt;color:#1f497d;margin:0in 0in 0.0001pt"
+    parts = ["<html>\r\n<head>\r\n<meta charset=\"utf-8\">\r\n<style>\r\n",
+             "p.MsoNormal\r\n\t{margin:0in;\r\n\tfont-size:11pt;}\r\n" * 40, "</style>\r\n</head>\r\n<body>\r\n"]
+    size = sum(len(p) for p in parts)
+    depth = 0
+    while size < size_bytes:
+        block = [f"<h2>{escape(rng.choice(CASE_NAMES))} &ndash; Update</h2>\r\n",
+                 "<table width=\"100%\" cellpadding=\"0\">\r\n  <tr>\r\n"]
+        for _ in range(3):
+            block.append(f"    <td style=\"{style}\">\r\n      <p class=\"MsoNormal\">{escape(paragraph(rng))}"
+                         f"&nbsp;</p>\r\n    </td>\r\n")
+        block.append("  </tr>\r\n</table>\r\n<ul>\r\n")
+        block.extend(f"  <li><span style=\"{style}\">{escape(sentence(rng))}</span></li>\r\n" for _ in range(4))
+        block.append("</ul>\r\n<p class=\"MsoNormal\"><b>From:</b> Counsel &lt;counsel@example.com&gt;<br>\r\n"
+                     "<b>Sent:</b> Monday&nbsp;&#8211; 9:30 AM<br>\r\n</p>\r\n")
+        # Threads of up to 8 replies, each quoted inside the next
+        if depth < 8:
+            block.append("<blockquote style=\"margin-left:.5in\">\r\n")
+            depth += 1
+        else:
+            block.append("</blockquote>\r\n" * depth)
+            depth = 0
+        parts.extend(block)
+        size += sum(len(p) for p in block)
+    parts.append("</blockquote>\r\n" * depth + "</body>\r\n</html>\r\n")
+    return "".join(parts)
+
+
+def email_with_attachments(rng, attachments, html_only=False):
+    """An EML message with a mix of PDF, image, DOCX, RTF and text attachments."""
+    msg = EmailMessage()
+    msg["From"] = "Opposing Counsel <counsel@example.com>"
+    msg["To"] = "Paralegal <paralegal@example.com>"
+    msg["Subject"] = f"{rng.choice(CASE_NAMES)} - Production Volume {rng.randint(1, 20)}"
+    msg["Date"] = format_datetime(datetime(2025, 1, 1, 9, 30, tzinfo=timezone.utc))
+
+    body = "\n\n".join(paragraph(rng) for _ in range(12))
+    if html_only:
+        html = "".join(f"<p>{escape(p)}</p>" for p in body.split("\n\n"))
+        msg.set_content(f"<html><body><h1>Production</h1>{html}</body></html>", subtype="html")
+    else:
+        msg.set_content(body)
+
+    for i in range(attachments):
+        kind = i % 5
+        if kind == 0:
+            msg.add_attachment(text_pdf(rng, 2), maintype="application", subtype="pdf", filename=f"exhibit_{i}.pdf")
+        elif kind == 1:
+            msg.add_attachment(png_image(rng, 400, 300), maintype="image", subtype="png", filename=f"photo_{i}.png")
+        elif kind == 2:
+            msg.add_attachment(docx_document(rng, 20), maintype="application",
+                               subtype="vnd.openxmlformats-officedocument.wordprocessingml.document",
+                               filename=f"letter_{i}.docx")
+        elif kind == 3:
+            msg.add_attachment(rtf_document(rng, 10), maintype="application", subtype="msword",
+                               filename=f"westlaw_{i}.doc")
+        else:
+            msg.add_attachment(paragraph(rng), filename=f"notes_{i}.txt")
+
+    # A fixed boundary keeps the message bytes deterministic
+    if msg.is_multipart():
+        msg.set_boundary("==bench-boundary==")
+    return msg.as_bytes()
+
+
+def nested_zip(rng, depth, files_per_level):
+    """A ZIP containing documents and another ZIP, ``depth`` levels deep."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i in range(files_per_level):
+            if i % 3 == 0:
+                name, data = f"level{depth}_doc{i}.pdf", text_pdf(rng, 2)
+            elif i % 3 == 1:
+                name, data = f"level{depth}_doc{i}.docx", docx_document(rng, 15)
+            else:
+                name, data = f"level{depth}_doc{i}.doc", rtf_document(rng, 8)
+            zf.writestr(zipfile.ZipInfo(name, date_time=(2025, 1, 1, 0, 0, 0)), data)
+        if depth > 1:
+            zf.writestr(zipfile.ZipInfo(f"nested_level{depth - 1}.zip", date_time=(2025, 1, 1, 0, 0, 0)),
+                        nested_zip(rng, depth - 1, files_per_level))
+    return buf.getvalue()
+
+
+def corpus_spec(scale=1.0):
+    """Return ``(case_name, filename, kind, generator)`` for every corpus file."""
+    def n(value):
+        return max(1, int(value * scale))
+
+    return [
+        ("text_pdf", "brief.pdf", "pdf", lambda rng: text_pdf(rng, n(40))),
+        ("text_pdf_large", "transcript.pdf", "pdf", lambda rng: text_pdf(rng, n(300))),
+        ("scanned_pdf", "scanned_production.pdf", "pdf", lambda rng: scanned_pdf(rng, n(8))),
+        ("scanned_fax_pdf", "fax.pdf", "pdf", lambda rng: scanned_pdf(rng, n(8), fax=True)),
+        ("mixed_pdf", "mixed.pdf", "pdf", lambda rng: mixed_pdf(rng, n(20))),
+        ("email_many_attachments", "production.eml", "eml", lambda rng: email_with_attachments(rng, n(60))),
+        ("email_html_only", "newsletter.eml", "eml",
+         lambda rng: email_with_attachments(rng, n(5), html_only=True)),
+        ("nested_zip", "archive.zip", "zip", lambda rng: nested_zip(rng, 3, n(6))),
+        ("rtf_as_doc", "westlaw_export.doc", "rtf", lambda rng: rtf_document(rng, n(400))),
+        ("large_docx", "contract.docx", "docx", lambda rng: docx_document(rng, n(2000))),
+        ("westlaw_markdown", "westlaw.md", "markdown", lambda rng: westlaw_markdown(rng, n(400)).encode("utf-8")),
+    ]
+
+
+def generate_corpus(out_dir, seed=1234, scale=1.0):
+    """Write the corpus to ``out_dir`` and return the manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {"seed": seed, "scale": scale, "files": []}
+
+    for case, filename, kind, generator in corpus_spec(scale):
+        # Each case gets its own generator so adding a case never changes the others
+        rng = random.Random(f"{seed}:{case}")
+        data = generator(rng)
+        with open(os.path.join(out_dir, filename), "wb") as f:
+            f.write(data)
+        manifest["files"].append({"case": case, "filename": filename, "kind": kind, "bytes": len(data)})
+
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the synthetic benchmark corpus")
+    parser.add_argument("--out", default="bench_corpus", help="Output folder")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply page/attachment counts")
+    args = parser.parse_args()
+
+    manifest = generate_corpus(args.out, args.seed, args.scale)
+    for entry in manifest["files"]:
+        print(f"{entry['case']:<24} {entry['filename']:<28} {entry['bytes'] / 1024:>10.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# Legal Markdown Converter - Benchmark Harness
+"""
+Shared timing, memory and reporting helpers for the benchmark scripts.
+
+Results are written as JSON so runs can be compared with ``--compare``:
+
+    {"meta": {...}, "results": [{"case": ..., "stage": ..., "median_s": ...}, ...]}
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Benchmarks import the converter modules from the repository root
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def measure(fn, repeat=3, warmup=1, track_memory=True):
+    """Time ``fn()`` and return timing statistics plus the result of the last call.
+
+    Timed runs are done without tracemalloc (it slows allocation-heavy code
+    considerably); peak Python heap usage is measured in one extra run.
+    Memory used by subprocesses such as pandoc and tesseract is not included.
+    """
+    result = None
+    for _ in range(warmup):
+        result = fn()
+
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+
+    stats = {
+        'runs': repeat,
+        'mean_s': statistics.mean(timings),
+        'median_s': statistics.median(timings),
+        'min_s': min(timings),
+        'max_s': max(timings),
+    }
+
+    if track_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        stats['peak_mem_mb'] = peak / (1024 * 1024)
+
+    return stats, result
+
+
+def add_throughput(stats, size_bytes=None, pages=None):
+    """Add MB/s and pages/s (based on the median run) to a stats dict."""
+    median = stats['median_s'] or 1e-9
+    if size_bytes is not None:
+        stats['bytes'] = size_bytes
+        stats['mb_per_s'] = size_bytes / (1024 * 1024) / median
+    if pages is not None:
+        stats['pages'] = pages
+        stats['pages_per_s'] = pages / median
+    return stats
+
+
+def run_metadata(**extra):
+    """Describe the machine and code version a benchmark ran on."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    meta = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+    try:
+        import resource
+        # Peak RSS of finished subprocesses (pandoc, tesseract); KB on Linux, bytes on macOS
+        meta['children_maxrss'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    except ImportError:
+        pass
+    meta.update(extra)
+    return meta
+
+
+def write_results(path, results, meta):
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+
+
+def load_results(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def print_table(results):
+    print(f"{'case':<26} {'stage':<22} {'median s':>10} {'MB/s':>9} {'pages/s':>9} {'peak MB':>9}")
+    for r in results:
+        if 'error' in r:
+            print(f"{r['case']:<26} {r['stage']:<22} {'error: ' + r['error'][:60]}")
+            continue
+        mb = f"{r['mb_per_s']:.2f}" if 'mb_per_s' in r else '-'
+        pages = f"{r['pages_per_s']:.1f}" if 'pages_per_s' in r else '-'
+        peak = f"{r['peak_mem_mb']:.1f}" if 'peak_mem_mb' in r else '-'
+        print(f"{r['case']:<26} {r['stage']:<22} {r['median_s']:>10.4f} {mb:>9} {pages:>9} {peak:>9}")
+
+
+def compare_results(current, baseline, threshold=0.10):
+    """Print per-stage changes against a baseline run.
+
+    Returns the list of (case, stage) pairs whose median time regressed by more
+    than ``threshold`` (0.10 = 10% slower).
+    """
+    base = {(r['case'], r['stage']): r for r in baseline['results'] if 'median_s' in r}
+    regressions = []
+
+    print(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'} "
+          f"({baseline['meta'].get('timestamp', '?')}):")
+    print(f"{'case':<26} {'stage':<22} {'before s':>10} {'after s':>10} {'change':>9}")
+    for r in current:
+        key = (r['case'], r['stage'])
+        if key not in base or 'median_s' not in r:
+            continue
+        before, after = base[key]['median_s'], r['median_s']
+        change = (after - before) / before if before else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print(f"{key[0]:<26} {key[1]:<22} {before:>10.4f} {after:>10.4f} {change:>+8.1%}{flag}")
+    return regressions
@@ -0,0 +1,144 @@
+# Legal Markdown Converter - Shared PDF Document Context
+"""
+Opens a PDF once per file and caches what the pipeline stages learn about it,
+so OCR detection, text extraction and OCR never repeat each other's work:
+
+- per-page text layer (first read by needs_ocr, reused by ocr_pdf)
+- per-page image coverage (fraction of the page covered by images)
+- rendered pixmaps (small LRU cache - they are large)
+
+Usage:
+    with DocumentContext(path=pdf_path) as ctx:
+        if needs_ocr(ctx):
+            ...
+
+PyMuPDF documents must not be used from several threads at once; every page
+access goes through ``ctx.lock``.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+
+import fitz  # PyMuPDF
+
+from metrics import CACHE_HITS, CACHE_MISSES
+
+# Rendered pixmaps kept per document (a 2x letter page is ~5.6 MB in RGB)
+MAX_CACHED_PIXMAPS = 4
+
+
+class DocumentContext:
+    """A PDF opened once, with cached per-page text, image coverage and renders.
+
+    Args:
+        path: Path to the PDF (either path or data is required)
+        data: PDF bytes
+    """
+
+    def __init__(self, path=None, data=None):
+        if path is None and data is None:
+            raise ValueError("DocumentContext needs a path or data")
+        self.path = path
+        self.data = data
+        if data is not None:
+            self.doc = fitz.open(stream=data, filetype="pdf")
+        else:
+            self.doc = fitz.open(path, filetype="pdf")
+        self.lock = threading.RLock()
+        self._text = {}
+        self._coverage = {}
+        self._pixmaps = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            self._pixmaps.clear()
+            if not self.doc.is_closed:
+                self.doc.close()
+
+    @property
+    def page_count(self):
+        return len(self.doc)
+
+    def page_text(self, page_num):
+        """The page's text layer (stripped), cached."""
+        with self.lock:
+            if page_num in self._text:
+                CACHE_HITS.inc(cache='page_text')
+                return self._text[page_num]
+            CACHE_MISSES.inc(cache='page_text')
+            text = self.doc[page_num].get_text().strip()
+            self._text[page_num] = text
+            return text
+
+    def image_coverage(self, page_num):
+        """Fraction (0-1) of the page area covered by images, cached."""
+        with self.lock:
+            if page_num in self._coverage:
+                CACHE_HITS.inc(cache='image_coverage')
+                return self._coverage[page_num]
+            CACHE_MISSES.inc(cache='image_coverage')
+            page = self.doc[page_num]
+            page_area = abs(page.rect) or 1.0
+            covered = 0.0
+            for info in page.get_image_info():
+                bbox = fitz.Rect(info["bbox"]) & page.rect
+                covered += abs(bbox)
+            coverage = min(1.0, covered / page_area)
+            self._coverage[page_num] = coverage
+            return coverage
+
+    def text_blocks(self, page_num):
+        """Bounding boxes of the page's text blocks, oriented like its renders (see pixmap)."""
+        with self.lock:
+            page = self.doc[page_num]
+            return [fitz.Rect(block[:4]) * page.rotation_matrix for block in page.get_text("blocks")
+                    if block[6] == 0 and block[4].strip()]
+
+    def pixmap(self, page_num, zoom=2, gray=False):
+        """Render a page (cached, LRU). Callers must not modify the returned pixmap."""
+        key = (page_num, zoom, gray)
+        with self.lock:
+            if key in self._pixmaps:
+                CACHE_HITS.inc(cache='pixmap')
+                self._pixmaps.move_to_end(key)
+                return self._pixmaps[key]
+            CACHE_MISSES.inc(cache='pixmap')
+            colorspace = fitz.csGRAY if gray else fitz.csRGB
+            pix = self.doc[page_num].get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=colorspace)
+            self._pixmaps[key] = pix
+            while len(self._pixmaps) > MAX_CACHED_PIXMAPS:
+                self._pixmaps.popitem(last=False)
+            return pix
+
+    def release_page(self, page_num):
+        """Drop everything cached for a page once no later stage needs it."""
+        with self.lock:
+            self._text.pop(page_num, None)
+            self._coverage.pop(page_num, None)
+            for key in [key for key in self._pixmaps if key[0] == page_num]:
+                del self._pixmaps[key]
+
+    def has_text_layer(self, page_num, min_chars=100, max_image_coverage=0.5):
+        """True for born-digital pages: real text and not mostly a scanned image."""
+        return (len(self.page_text(page_num)) >= min_chars
+                and self.image_coverage(page_num) < max_image_coverage)
+
+    def stream(self):
+        """A fresh binary stream of the PDF, for engines that parse it themselves."""
+        if self.data is not None:
+            return io.BytesIO(self.data)
+        return open(self.path, "rb")
+
+
+def open_context(pdf):
+    """Return ``(ctx, owned)`` for a DocumentContext or a PDF path."""
+    if isinstance(pdf, DocumentContext):
+        return pdf, False
+    return DocumentContext(path=pdf), True
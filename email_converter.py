@@ -10,15 +10,18 @@ This PDF can then be processed by the main converter for markdown output.
 
 import os
 import email
-import tempfile
-from email import policy
-from email.parser import BytesParser
 from datetime import datetime
 from io import BytesIO
 
 # PDF generation
 import fitz  # PyMuPDF - already a dependency
 
+from metrics import timed_stage
+from mime_stream import parse_message, read_attachment, close_attachments, content_id, cid_references
+from email_html import html_to_markdown
+from email_images import split_decorative_images, reference_line, DEFAULT_POLICY as DEFAULT_INLINE_IMAGE_POLICY
+from tracing import traced, set_attributes
+
 # For MSG files (Outlook format)
 try:
     import extract_msg
@@ -27,13 +30,19 @@ except ImportError:
     HAS_EXTRACT_MSG = False
 
 
+@traced()
 def parse_eml(file_path_or_bytes):
-    """Parse an EML file and extract headers, body, and attachments."""
+    """Parse an EML file and extract headers, body, and attachments.
+
+    The message is read in one streaming pass (see mime_stream); attachments
+    come back as spooled file handles, not bytes.
+    """
     if isinstance(file_path_or_bytes, bytes):
-        msg = BytesParser(policy=policy.default).parsebytes(file_path_or_bytes)
+        parsed = parse_message(BytesIO(file_path_or_bytes))
     else:
         with open(file_path_or_bytes, 'rb') as f:
-            msg = BytesParser(policy=policy.default).parse(f)
+            parsed = parse_message(f)
+    msg = parsed['headers']
 
     # Extract headers
     headers = {
@@ -44,78 +53,32 @@ def parse_eml(file_path_or_bytes):
         'date': msg.get('Date', ''),
     }
 
-    # Extract body
-    body = ''
-    html_body = None
-
-    if msg.is_multipart():
-        for part in msg.walk():
-            content_type = part.get_content_type()
-            content_disposition = str(part.get('Content-Disposition', ''))
-
-            # Skip attachments when looking for body
-            if 'attachment' in content_disposition:
-                continue
-
-            if content_type == 'text/plain':
-                try:
-                    body = part.get_content()
-                except:
-                    body = part.get_payload(decode=True).decode('utf-8', errors='replace')
-            elif content_type == 'text/html' and not body:
-                try:
-                    html_body = part.get_content()
-                except:
-                    html_body = part.get_payload(decode=True).decode('utf-8', errors='replace')
-    else:
-        content_type = msg.get_content_type()
-        if content_type == 'text/plain':
-            body = msg.get_content()
-        elif content_type == 'text/html':
-            html_body = msg.get_content()
+    body = parsed['plain']
+    html_body = parsed['html']
 
     # Use HTML body if no plain text available
     if not body and html_body:
-        # Simple HTML to text conversion
-        import re
-        body = re.sub(r'<[^>]+>', '', html_body)
-        body = body.replace('&nbsp;', ' ').replace('&amp;', '&')
-        body = body.replace('&lt;', '<').replace('&gt;', '>')
+        body = html_to_markdown(html_body)
 
-    # Extract attachments
-    attachments = []
-    for part in msg.walk():
-        content_disposition = str(part.get('Content-Disposition', ''))
-        if 'attachment' in content_disposition or part.get_filename():
-            filename = part.get_filename()
-            if filename:
-                payload = part.get_payload(decode=True)
-                if payload:
-                    attachments.append({
-                        'filename': filename,
-                        'data': payload,
-                        'content_type': part.get_content_type()
-                    })
+    attachments = parsed['attachments']
 
     return {
         'headers': headers,
         'body': body,
-        'attachments': attachments
+        'attachments': attachments,
+        'cid_refs': parsed['cid_refs']
     }
 
 
+@traced()
 def parse_msg(file_path_or_bytes):
     """Parse an MSG file (Outlook format) and extract headers, body, and attachments."""
     if not HAS_EXTRACT_MSG:
         raise ImportError("extract-msg library is required for MSG files. Install with: pip install extract-msg")
 
-    # extract-msg needs a file path, so write bytes to temp file if needed
+    # extract-msg (olefile) reads from a file-like object, so bytes never touch disk
     if isinstance(file_path_or_bytes, bytes):
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.msg') as tmp:
-            tmp.write(file_path_or_bytes)
-            tmp_path = tmp.name
-        msg = extract_msg.Message(tmp_path)
-        os.unlink(tmp_path)
+        msg = extract_msg.Message(BytesIO(file_path_or_bytes))
     else:
         msg = extract_msg.Message(file_path_or_bytes)
 
@@ -128,7 +91,7 @@ def parse_msg(file_path_or_bytes):
         'date': str(msg.date) if msg.date else '',
     }
 
-    # Extract body
+    # Extract body (HTML-only messages have no plain text body)
     body = msg.body or ''
 
     # Extract attachments
@@ -137,53 +100,117 @@ def parse_msg(file_path_or_bytes):
         if hasattr(attachment, 'data') and attachment.data:
             attachments.append({
                 'filename': attachment.longFilename or attachment.shortFilename or 'attachment',
-                'data': attachment.data,
-                'content_type': getattr(attachment, 'mimetype', 'application/octet-stream')
+                'content_type': getattr(attachment, 'mimetype', 'application/octet-stream'),
+                'size': len(attachment.data),
+                'file': BytesIO(attachment.data),
+                'content_id': content_id(getattr(attachment, 'cid', None)),
+                'inline': bool(getattr(attachment, 'hidden', False)),
             })
 
+    # Images shown in the HTML body are referenced by Content-ID
+    try:
+        html_body = msg.htmlBody or b''
+    except Exception:
+        html_body = b''
+    if isinstance(html_body, bytes):
+        html_body = html_body.decode('utf-8', errors='replace')
+    cid_refs = cid_references(html_body)
+    if not body.strip() and html_body:
+        body = html_to_markdown(html_body)
+
     msg.close()
 
     return {
         'headers': headers,
         'body': body,
-        'attachments': attachments
+        'attachments': attachments,
+        'cid_refs': cid_refs
     }
 
 
-def create_cover_sheet_pdf(title, subtitle=None):
-    """Create a simple PDF cover sheet."""
-    doc = fitz.open()
-    page = doc.new_page(width=612, height=792)  # Letter size
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # Letter size
+
+# Body text layout
+BODY_FONTSIZE = 10
+BODY_LINE_HEIGHT = 12
+BODY_MARGIN_LEFT = 50
+BODY_MARGIN_TOP = 50
+BODY_MARGIN_BOTTOM = 742
+BODY_MAX_CHARS_PER_LINE = 85  # Approximate characters that fit per line
+
+# Text boxes shared by every generated page
+TITLE_RECT = fitz.Rect(50, 300, 562, 400)
+SUBTITLE_RECT = fitz.Rect(50, 400, 562, 450)
+PLACEHOLDER_RECT = fitz.Rect(50, 350, 562, 450)
+HEADER_RECT = fitz.Rect(50, 50, 562, 170)
 
-    # Title
-    title_rect = fitz.Rect(50, 300, 562, 400)
-    page.insert_textbox(
-        title_rect,
-        title,
-        fontsize=24,
-        fontname="helv",
-        align=fitz.TEXT_ALIGN_CENTER
-    )
 
-    # Subtitle
+def add_cover_sheet(doc, title, subtitle=None):
+    """Append a cover sheet page to ``doc``.
+
+    Drawn directly rather than stamped from a cached template page: everything on
+    a cover sheet is the attachment's own title, so a template would be blank.
+    """
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.insert_textbox(TITLE_RECT, title, fontsize=24, fontname="helv", align=fitz.TEXT_ALIGN_CENTER)
     if subtitle:
-        subtitle_rect = fitz.Rect(50, 400, 562, 450)
-        page.insert_textbox(
-            subtitle_rect,
-            subtitle,
-            fontsize=14,
-            fontname="helv",
-            align=fitz.TEXT_ALIGN_CENTER,
-            color=(0.4, 0.4, 0.4)
-        )
+        page.insert_textbox(SUBTITLE_RECT, subtitle, fontsize=14, fontname="helv",
+                            align=fitz.TEXT_ALIGN_CENTER, color=(0.4, 0.4, 0.4))
+    return page
+
+
+def add_placeholder_page(doc, text):
+    """Append a page with a centered gray note (for attachments converted separately)."""
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.insert_textbox(PLACEHOLDER_RECT, text, fontsize=12, fontname="helv",
+                        align=fitz.TEXT_ALIGN_CENTER, color=(0.5, 0.5, 0.5))
+    return page
+
+
+def _wrap_lines(body, max_chars=BODY_MAX_CHARS_PER_LINE):
+    """Split body text into output lines, wrapping long lines at word boundaries."""
+    for line in body.split('\n'):
+        if len(line) <= max_chars:
+            yield line
+            continue
+        current_line = ''
+        for word in line.split(' '):
+            test_line = current_line + (' ' if current_line else '') + word
+            if len(test_line) <= max_chars:
+                current_line = test_line
+            else:
+                if current_line:
+                    yield current_line
+                current_line = word
+        if current_line:
+            yield current_line
 
-    return doc
 
+def _insert_lines(page, y_pos, lines):
+    """Write body lines top-down from ``y_pos``, one line every BODY_LINE_HEIGHT points."""
+    # Trailing blank lines would only move the (invisible) cursor
+    while lines and not lines[-1].strip():
+        lines = lines[:-1]
+    if lines:
+        page.insert_text(fitz.Point(BODY_MARGIN_LEFT, y_pos + BODY_FONTSIZE), lines,
+                         fontsize=BODY_FONTSIZE, fontname="helv",
+                         lineheight=BODY_LINE_HEIGHT / BODY_FONTSIZE)
 
-def create_email_body_pdf(email_data):
-    """Create a PDF from the email headers and body."""
-    doc = fitz.open()
-    page = doc.new_page(width=612, height=792)  # Letter size
+
+@traced()
+def create_email_body_pdf(email_data, doc=None):
+    """Lay out the email headers and body as PDF pages.
+
+    Args:
+        email_data: Parsed email (see parse_eml / parse_msg)
+        doc: Document to append the pages to (default: a new one)
+
+    Returns:
+        fitz.Document: ``doc``, or the new document
+    """
+    if doc is None:
+        doc = fitz.open()
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
 
     headers = email_data['headers']
     body = email_data['body']
@@ -201,97 +228,27 @@ def create_email_body_pdf(email_data):
     if headers.get('subject'):
         header_lines.append(f"Subject: {headers['subject']}")
 
-    header_text = '\n'.join(header_lines)
-
-    # Insert headers
-    y_pos = 50
-    header_rect = fitz.Rect(50, y_pos, 562, y_pos + 120)
-    page.insert_textbox(
-        header_rect,
-        header_text,
-        fontsize=10,
-        fontname="helv"
-    )
+    page.insert_textbox(HEADER_RECT, '\n'.join(header_lines), fontsize=BODY_FONTSIZE, fontname="helv")
 
     # Divider line
-    y_pos = 180
-    page.draw_line(fitz.Point(50, y_pos), fitz.Point(562, y_pos), color=(0.7, 0.7, 0.7))
+    page.draw_line(fitz.Point(50, 180), fitz.Point(562, 180), color=(0.7, 0.7, 0.7))
 
-    # Body text - handle long bodies across multiple pages
-    # Split body into lines and insert line by line to handle pagination properly
+    # Body text - each page's lines go in with a single insert_text call
     y_pos = 200
-    line_height = 12
-    fontsize = 10
-    margin_left = 50
-    margin_right = 562
-    margin_bottom = 742
-
-    # Split body into lines, preserving empty lines
-    lines = body.split('\n')
-
-    for line in lines:
+    page_lines = []
+    for line in _wrap_lines(body):
         # Check if we need a new page
-        if y_pos + line_height > margin_bottom:
-            page = doc.new_page(width=612, height=792)
-            y_pos = 50
-
-        # Handle long lines by wrapping
-        # Approximate characters that fit per line
-        max_chars_per_line = 85
-
-        if len(line) <= max_chars_per_line:
-            # Line fits, insert it
-            page.insert_text(
-                fitz.Point(margin_left, y_pos + fontsize),
-                line,
-                fontsize=fontsize,
-                fontname="helv"
-            )
-            y_pos += line_height
-        else:
-            # Line needs wrapping
-            words = line.split(' ')
-            current_line = ''
-
-            for word in words:
-                test_line = current_line + (' ' if current_line else '') + word
-
-                if len(test_line) <= max_chars_per_line:
-                    current_line = test_line
-                else:
-                    # Output current line
-                    if current_line:
-                        if y_pos + line_height > margin_bottom:
-                            page = doc.new_page(width=612, height=792)
-                            y_pos = 50
-
-                        page.insert_text(
-                            fitz.Point(margin_left, y_pos + fontsize),
-                            current_line,
-                            fontsize=fontsize,
-                            fontname="helv"
-                        )
-                        y_pos += line_height
-
-                    current_line = word
-
-            # Output remaining text
-            if current_line:
-                if y_pos + line_height > margin_bottom:
-                    page = doc.new_page(width=612, height=792)
-                    y_pos = 50
-
-                page.insert_text(
-                    fitz.Point(margin_left, y_pos + fontsize),
-                    current_line,
-                    fontsize=fontsize,
-                    fontname="helv"
-                )
-                y_pos += line_height
+        if y_pos + len(page_lines) * BODY_LINE_HEIGHT + BODY_LINE_HEIGHT > BODY_MARGIN_BOTTOM:
+            _insert_lines(page, y_pos, page_lines)
+            page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            y_pos, page_lines = BODY_MARGIN_TOP, []
+        page_lines.append(line)
+    _insert_lines(page, y_pos, page_lines)
 
     return doc
 
 
+@traced()
 def attachment_to_pdf(attachment_data, attachment_filename):
     """Convert an attachment to PDF format for merging.
 
@@ -340,12 +297,19 @@ def attachment_to_pdf(attachment_data, attachment_filename):
     return doc
 
 
-def convert_email_to_pdf(file_path_or_bytes, original_filename):
+@traced()
+@timed_stage('email_assembly')
+def convert_email_to_pdf(file_path_or_bytes, original_filename, inline_images=DEFAULT_INLINE_IMAGE_POLICY):
     """
     Convert an EML or MSG file to a combined PDF with attachments.
 
+    Args:
+        inline_images: What to do with signature logos, tracking pixels and other
+            decorative images (see email_images.POLICIES)
+
     Returns:
-        tuple: (pdf_bytes, list of non-convertible attachments for separate processing)
+        tuple: (pdf_bytes, list of non-convertible attachments for separate processing;
+        read them with read_attachment and release them with close_attachments)
     """
     ext = os.path.splitext(original_filename)[1].lower()
 
@@ -357,57 +321,45 @@ def convert_email_to_pdf(file_path_or_bytes, original_filename):
     else:
         raise ValueError(f"Unsupported email format: {ext}")
 
-    # Create the combined PDF
+    # Decorative images get no cover sheet or conversion of their own
+    email_data['attachments'], decorative = split_decorative_images(
+        email_data['attachments'], email_data['cid_refs'], inline_images)
+    if decorative and inline_images == 'reference':
+        email_data['body'] = email_data['body'].rstrip('\n') + '\n\n' + reference_line(decorative)
+    close_attachments(decorative)
+    set_attributes(attachments=len(email_data['attachments']), decorative_images=len(decorative))
+
+    # Build the combined PDF in place: body, cover sheets and placeholders are
+    # added as pages of one document; only PDF attachments are merged in
     combined_pdf = fitz.open()
     separate_attachments = []
 
     # Add email body
-    body_pdf = create_email_body_pdf(email_data)
-    combined_pdf.insert_pdf(body_pdf)
-    body_pdf.close()
+    create_email_body_pdf(email_data, combined_pdf)
 
     # Process attachments
     for i, attachment in enumerate(email_data['attachments'], 1):
         filename = attachment['filename']
-        data = attachment['data']
         ext_att = os.path.splitext(filename)[1].lower()
 
-        # Create cover sheet for this attachment
-        cover = create_cover_sheet_pdf(
-            f"# Begin Email Attachment {i}",
-            f'Filename: "{filename}"'
-        )
-        combined_pdf.insert_pdf(cover)
-        cover.close()
-
-        # Try to convert attachment to PDF
-        if ext_att in ['.pdf', '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.tif']:
-            att_pdf = attachment_to_pdf(data, filename)
+        # Cover sheet for this attachment
+        add_cover_sheet(combined_pdf, f"# Begin Email Attachment {i}", f'Filename: "{filename}"')
+
+        # PDFs are merged in; images are OCR'd directly later (see image_ocr), like other files
+        if ext_att == '.pdf':
+            att_pdf = attachment_to_pdf(read_attachment(attachment), filename)
             if att_pdf:
                 combined_pdf.insert_pdf(att_pdf)
                 att_pdf.close()
+                close_attachments([attachment])
             else:
                 # Couldn't convert, add to separate processing list
                 separate_attachments.append(attachment)
         else:
-            # Non-image/PDF attachments need separate processing
-            # Add a placeholder in the combined PDF
-            placeholder = fitz.open()
-            page = placeholder.new_page(width=612, height=792)
-
-            text_rect = fitz.Rect(50, 350, 562, 450)
-            page.insert_textbox(
-                text_rect,
-                f"[See converted attachment below]\n\nOriginal file: {filename}",
-                fontsize=12,
-                fontname="helv",
-                align=fitz.TEXT_ALIGN_CENTER,
-                color=(0.5, 0.5, 0.5)
-            )
-            combined_pdf.insert_pdf(placeholder)
-            placeholder.close()
-
-            # Add to separate processing list for MarkItDown conversion
+            # Non-PDF attachments need separate processing; leave a placeholder in the combined PDF
+            add_placeholder_page(combined_pdf, f"[See converted attachment below]\n\nOriginal file: {filename}")
+
+            # Add to separate processing list (MarkItDown, pandoc or image OCR)
             separate_attachments.append(attachment)
 
     # Get PDF bytes
@@ -417,12 +369,14 @@ def convert_email_to_pdf(file_path_or_bytes, original_filename):
     return pdf_bytes, separate_attachments
 
 
-def process_email_file(file_path_or_bytes, original_filename):
+def process_email_file(file_path_or_bytes, original_filename, inline_images=DEFAULT_INLINE_IMAGE_POLICY):
     """
     Main entry point for email processing.
 
     Converts email to PDF and returns:
     - pdf_bytes: The combined PDF of email + attachment cover sheets
     - attachments: List of attachments that need separate MarkItDown processing
+
+    ``inline_images`` is the policy for decorative images (see email_images).
     """
-    return convert_email_to_pdf(file_path_or_bytes, original_filename)
+    return convert_email_to_pdf(file_path_or_bytes, original_filename, inline_images)
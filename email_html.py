@@ -0,0 +1,279 @@
+# Legal Markdown Converter - Email HTML to Markdown
+"""
+Converts HTML-only email bodies to markdown in one pass over the HTML.
+
+The HTML is tokenized incrementally in blocks by a single compiled regular
+expression (so the scanning runs in C, unlike html.parser), and markdown is
+written out block by block: time is linear in the size of the body and only
+the current paragraph is held in memory. Entities are decoded with
+``html.unescape`` (``&nbsp;``, ``&#8217;``, ``&eacute;`` ...).
+
+Kept: paragraphs, line breaks, headings, bulleted and numbered lists, quoted
+replies (blockquote), table rows (cells joined with " | "), rules and
+preformatted text. Dropped: <head>, <style>, <script>, images and link URLs
+(the link text is kept).
+
+Usage:
+    markdown = html_to_markdown(html)
+    html_to_markdown(html, write=out.write)
+"""
+
+import re
+from html import unescape
+
+# Characters of HTML tokenized at a time
+FEED_SIZE = 64 * 1024
+
+# Elements whose content is never shown
+HIDDEN_TAGS = {'head', 'title', 'style', 'script', 'noscript', 'template'}
+# Elements that start and end a block of text
+BLOCK_TAGS = {'p', 'div', 'section', 'article', 'header', 'footer', 'main', 'aside', 'nav', 'center',
+              'address', 'figure', 'figcaption', 'form', 'fieldset', 'table', 'thead', 'tbody', 'tfoot',
+              'caption', 'dl', 'dt', 'dd', 'body', 'html'}
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+CELL_TAGS = {'td', 'th'}
+# Elements whose content is raw text, read up to the closing tag
+RAW_TEXT_END = {'script': re.compile(r'</script\s*>', re.IGNORECASE),
+                'style': re.compile(r'</style\s*>', re.IGNORECASE)}
+# Replies quoted deeper than this are shown at this depth (long chains nest one level per reply)
+MAX_QUOTE_DEPTH = 5
+
+
+_TOKEN = re.compile(r"""
+      <!--.*?-->                                            # comment (incl. Outlook's <!--[if mso]>)
+    | (?P<open_comment><!--)                                # comment not closed in this block (see _Tokenizer)
+    | <[!?][^>]*>                                           # doctype, <?xml ...>, <![endif]>
+    | <(/?)([a-zA-Z][\w:.-]*)                               # start or end tag:
+      (?:[^>"'=]                                            #   name, unquoted value, space
+       | =(?=(?P<value>\s*(?:"[^"]*"|'[^']*')|))(?P=value)   #   "=" and a quoted value, if it is closed
+       | ["']                                               #   quote inside an unquoted value (Don't)
+      )*>
+""", re.DOTALL | re.VERBOSE)
+# A quote only opens a quoted value right after "=", and the lookahead takes the whole value or
+# nothing, so each character has one way to match: no backtracking on unclosed quotes
+# Where a token may begin (a "<" followed by anything else is text)
+_TOKEN_START = re.compile(r"<(?:[/!?a-zA-Z]|$)")
+
+
+class _Tokenizer:
+    """Splits HTML fed in blocks into tags and text for a _MarkdownWriter."""
+
+    def __init__(self, writer):
+        self._writer = writer
+        self._pending = ''
+        self._raw_tag = None
+        # Inside a comment that continues past the block: its text is skipped as it is fed, so an
+        # unclosed "<!--" costs neither memory nor a rescan of the rest of the body on every block
+        self._in_comment = False
+
+    def feed(self, html, final=False):
+        writer = self._writer
+        html = self._pending + html
+        pos = 0
+        while True:
+            if self._in_comment:
+                end = html.find('-->', pos)
+                if end < 0:
+                    # Keep the last two characters in case "-->" is split across blocks
+                    pos = max(pos, len(html) - 2)
+                    break
+                self._in_comment = False
+                pos = end + 3
+                continue
+
+            if self._raw_tag:
+                end = RAW_TEXT_END[self._raw_tag].search(html, pos)
+                if not end:
+                    # Keep enough for a closing tag split across blocks
+                    pos = max(pos, len(html) - 16)
+                    break
+                writer.handle_endtag(self._raw_tag)
+                self._raw_tag = None
+                pos = end.end()
+                continue
+
+            match = _TOKEN.search(html, pos)
+            if not match:
+                break
+            if match.start() > pos:
+                writer.handle_data(unescape(html[pos:match.start()]))
+            if match.group('open_comment'):
+                self._in_comment = True
+                pos = match.end()
+                continue
+            tag = match.group(3)
+            if tag:
+                tag = tag.lower()
+                if match.group(2):
+                    writer.handle_endtag(tag)
+                else:
+                    writer.handle_starttag(tag)
+                    if tag in RAW_TEXT_END:
+                        self._raw_tag = tag
+            pos = match.end()
+
+        rest = html[pos:]
+        if self._in_comment:
+            # A comment left open at the end of the body hides the rest, as in a browser
+            self._pending = '' if final else rest
+            return
+        if final or self._raw_tag:
+            self._pending = '' if final else rest
+            if final and rest and not self._raw_tag:
+                writer.handle_data(unescape(rest))
+            return
+
+        # Hold back a tag or entity that may be cut off at the end of the block
+        start = _TOKEN_START.search(rest)
+        cut = start.start() if start else len(rest)
+        amp = rest.rfind('&', 0, cut)
+        if amp >= 0 and ';' not in rest[amp:cut]:
+            cut = amp
+        if cut:
+            writer.handle_data(unescape(rest[:cut]))
+        self._pending = rest[cut:]
+
+
+class _MarkdownWriter:
+    def __init__(self, write):
+        self._write = write
+        self._lines = []      # finished lines of the current block
+        self._inline = []     # text of the current line
+        self._hidden = 0      # depth inside HIDDEN_TAGS
+        self._pre = 0         # depth inside <pre>
+        self._quote = 0       # blockquote depth
+        self._lists = []      # [tag, items so far] per open list
+        self._marker = ''     # list marker or heading marks for the current block
+        self._tight = None    # 'li' or 'tr' while in a list item or table row
+        self._started = False
+        self._last_tight = None
+
+    # Output
+
+    def _break_line(self):
+        text = ''.join(self._inline)
+        self._inline = []
+        self._lines.append(text if self._pre else ' '.join(text.split()))
+
+    def _end_block(self, tight=None):
+        """Write out the current block (if it has any text).
+
+        Consecutive list items, or consecutive table rows, are written on
+        adjacent lines; other blocks are separated by a blank line.
+        """
+        self._break_line()
+        lines = self._lines
+        self._lines = []
+        while lines and not lines[-1].strip():
+            lines.pop()
+        while lines and not lines[0].strip():
+            lines.pop(0)
+        marker, self._marker = self._marker, ''
+        tight = tight or self._tight
+        self._tight = None
+        if not lines:
+            return
+
+        quote = '> ' * min(self._quote, MAX_QUOTE_DEPTH)
+        # Continuation lines of a list item line up with its text
+        indent = ' ' * len(marker) if tight == 'li' else ''
+        text = '\n'.join(quote + (marker if i == 0 else indent) + line for i, line in enumerate(lines))
+        if self._started:
+            self._write('\n' if tight and tight == self._last_tight else '\n\n')
+        self._write(text)
+        self._started = True
+        self._last_tight = tight
+
+    def close(self):
+        self._end_block()
+
+    # Tokenizer callbacks
+
+    def handle_starttag(self, tag):
+        if tag in HIDDEN_TAGS:
+            self._hidden += 1
+        elif tag == 'body':
+            self._hidden = 0  # an unclosed <head> must not hide the message
+        if self._hidden:
+            return
+
+        if tag == 'br':
+            self._break_line()
+        elif tag in CELL_TAGS:
+            if ''.join(self._inline).strip():
+                self._inline.append(' | ')
+        elif tag == 'tr':
+            self._end_block()
+            self._tight = 'tr'
+        elif tag == 'li':
+            self._end_block()
+            indent = '  ' * max(len(self._lists) - 1, 0)
+            if self._lists:
+                self._lists[-1][1] += 1
+            numbered = self._lists and self._lists[-1][0] == 'ol'
+            self._marker = indent + (f"{self._lists[-1][1]}. " if numbered else '- ')
+            self._tight = 'li'
+        elif tag in ('ul', 'ol'):
+            self._end_block()
+            self._lists.append([tag, 0])
+        elif tag in HEADING_TAGS:
+            self._end_block()
+            self._marker = '#' * HEADING_TAGS[tag] + ' '
+        elif tag == 'blockquote':
+            self._end_block()
+            self._quote += 1
+        elif tag == 'pre':
+            self._end_block()
+            self._pre += 1
+        elif tag == 'hr':
+            self._end_block()
+            self._inline.append('---')
+            self._end_block()
+        elif tag in BLOCK_TAGS:
+            self._end_block()
+
+    def handle_endtag(self, tag):
+        if tag in HIDDEN_TAGS:
+            self._hidden = max(self._hidden - 1, 0)
+            return
+        if self._hidden:
+            return
+
+        if tag in ('tr', 'li'):
+            self._end_block(tight=tag)
+        elif tag in ('ul', 'ol'):
+            self._end_block()
+            if self._lists:
+                self._lists.pop()
+        elif tag == 'blockquote':
+            self._end_block()
+            self._quote = max(self._quote - 1, 0)
+        elif tag == 'pre':
+            self._end_block()
+            self._pre = max(self._pre - 1, 0)
+        elif tag in HEADING_TAGS or tag in BLOCK_TAGS:
+            self._end_block()
+
+    def handle_data(self, data):
+        if not self._hidden:
+            self._inline.append(data)
+
+
+def html_to_markdown(html, write=None):
+    """Convert an HTML email body to markdown.
+
+    Args:
+        html: The HTML (str)
+        write: Optional callback receiving the markdown piece by piece (returns None)
+
+    Returns:
+        str: The markdown, or None when ``write`` is given
+    """
+    parts = [] if write is None else None
+    writer = _MarkdownWriter(write or parts.append)
+    tokenizer = _Tokenizer(writer)
+    for start in range(0, len(html), FEED_SIZE):
+        tokenizer.feed(html[start:start + FEED_SIZE])
+    tokenizer.feed('', final=True)
+    writer.close()
+    return None if parts is None else ''.join(parts)
@@ -0,0 +1,99 @@
+# Legal Markdown Converter - Email Image Classification
+"""
+Separates an email's real image attachments from images that only decorate
+the message: signature logos and other inline images, images the HTML body
+shows through ``cid:`` links, tracking pixels, and repeats of an image seen
+earlier in the message (a long reply chain carries the same logo once per
+reply).
+
+Decorative images are listed once under the email body instead of each
+getting a cover sheet, a placeholder page and an OCR pass.
+
+Policies (``"email": {"inline_images": ...}`` in config.json):
+- reference: one line under the body naming them (default)
+- skip: leave them out entirely
+- convert: treat them like any other attachment
+"""
+
+import hashlib
+
+from PIL import Image
+
+from metrics import EMAIL_IMAGES_SKIPPED
+
+POLICIES = ("reference", "skip", "convert")
+DEFAULT_POLICY = "reference"
+
+# Images no larger than this on both sides are tracking pixels, spacers or social icons
+TINY_IMAGE_MAX_SIDE = 32
+
+
+def image_dimensions(stream):
+    """(width, height) of an image file object, or None if it cannot be read (only the header is decoded)."""
+    stream.seek(0)
+    try:
+        with Image.open(stream) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def file_digest(stream):
+    stream.seek(0)
+    digest = hashlib.sha1()
+    for block in iter(lambda: stream.read(1024 * 1024), b""):
+        digest.update(block)
+    return digest.digest()
+
+
+def decorative_reason(attachment, cid_refs, seen_digests):
+    """Why an attachment is decorative ('tiny', 'cid', 'inline' or 'duplicate'), or None.
+
+    Args:
+        attachment: Attachment record (see mime_stream)
+        cid_refs: Content-IDs the email's HTML body refers to
+        seen_digests: Digests of the images seen so far in this email (updated)
+    """
+    size = image_dimensions(attachment['file'])
+    # Outlook often leaves the MIME type out, so anything Pillow can open counts as an image
+    if size is None and not (attachment['content_type'] or '').startswith('image/'):
+        return None
+    if size and max(size) <= TINY_IMAGE_MAX_SIDE:
+        return 'tiny'
+    if attachment.get('content_id') and attachment['content_id'] in cid_refs:
+        return 'cid'
+    if attachment.get('inline'):
+        return 'inline'
+    digest = file_digest(attachment['file'])
+    if digest in seen_digests:
+        return 'duplicate'
+    seen_digests.add(digest)
+    return None
+
+
+def split_decorative_images(attachments, cid_refs, policy=DEFAULT_POLICY):
+    """Split attachments into (attachments to convert, decorative images).
+
+    With the 'convert' policy nothing is split off.
+    """
+    if policy == 'convert':
+        return list(attachments), []
+    kept, decorative = [], []
+    seen_digests = set()
+    for attachment in attachments:
+        reason = decorative_reason(attachment, cid_refs, seen_digests)
+        if reason:
+            EMAIL_IMAGES_SKIPPED.inc(reason=reason)
+            decorative.append(attachment)
+        else:
+            kept.append(attachment)
+    return kept, decorative
+
+
+def reference_line(images):
+    """One line naming the decorative images, with a count for names that repeat."""
+    counts = {}
+    for image in images:
+        counts[image['filename']] = counts.get(image['filename'], 0) + 1
+    names = [f"{name} (x{count})" if count > 1 else name for name, count in counts.items()]
+    return f"[Inline images not converted: {', '.join(names)}]"
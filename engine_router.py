@@ -0,0 +1,140 @@
+# Legal Markdown Converter - Conversion Engine Routing
+"""
+Registry of which conversion engines can handle which formats, and a routing
+table that picks an engine per format and size bucket.
+
+Without a routing table every format uses its default engine (the long-standing
+behaviour: pandoc for documents it reads, MarkItDown for PDFs). With
+``"conversion": {"routing": "auto"}`` the table written by
+``benchmarks/calibrate_engines.py`` is used instead: for each format and size
+bucket it names the fastest engine whose output stayed within the quality
+floor of the default engine's on local benchmark runs.
+
+Routing table format (engine_routes.json):
+    {"meta": {...}, "quality_floor": 0.9,
+     "routes": {"pdf": {"small": {"engine": "pymupdf", "seconds_per_mb": 0.4, "quality": 0.97}, ...}}}
+"""
+
+import os
+import json
+import threading
+
+# Engines and the formats (pandoc reader names, plus 'pdf') each can convert
+ENGINE_FORMATS = {
+    'pandoc': {'docx', 'odt', 'html', 'epub', 'rst', 'org', 'latex', 'rtf'},
+    'markitdown': {'pdf', 'docx', 'html', 'epub'},
+    'pymupdf': {'pdf'},
+}
+
+# Engine used for each format when no routing table applies
+DEFAULT_ENGINES = {
+    'pdf': 'markitdown',
+    'docx': 'pandoc', 'odt': 'pandoc', 'html': 'pandoc', 'epub': 'pandoc',
+    'rst': 'pandoc', 'org': 'pandoc', 'latex': 'pandoc', 'rtf': 'pandoc',
+}
+
+# (name, upper bound in bytes); the last bucket is unbounded
+SIZE_BUCKETS = (('small', 1024 * 1024), ('medium', 20 * 1024 * 1024), ('large', None))
+
+DEFAULT_ROUTES_FILE = 'engine_routes.json'
+DEFAULT_QUALITY_FLOOR = 0.9
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def candidates(fmt):
+    """Engines that can convert ``fmt``, default engine first."""
+    engines = sorted(name for name, formats in ENGINE_FORMATS.items() if fmt in formats)
+    default = DEFAULT_ENGINES.get(fmt)
+    if default in engines:
+        engines.remove(default)
+        engines.insert(0, default)
+    return engines
+
+
+def size_bucket(size_bytes):
+    for name, limit in SIZE_BUCKETS:
+        if limit is None or size_bytes < limit:
+            return name
+    return SIZE_BUCKETS[-1][0]
+
+
+def load_routes(path=DEFAULT_ROUTES_FILE):
+    """The routing table at ``path`` ({} if missing or invalid), cached until the file changes."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, 'r') as f:
+                routes = json.load(f).get('routes', {})
+        except (OSError, ValueError, AttributeError):
+            routes = {}
+        _cache[path] = (mtime, routes)
+        return routes
+
+
+def choose_engine(fmt, size_bytes, routes=None, requested=None):
+    """Pick the engine for one file.
+
+    Args:
+        fmt: Format name (see DEFAULT_ENGINES)
+        size_bytes: File size
+        routes: Routing table (see load_routes); None uses defaults only
+        requested: Engine explicitly asked for (e.g. chosen in the web interface)
+
+    Returns:
+        tuple: (engine, reason) where reason is 'requested', 'calibrated' or 'default'
+    """
+    options = candidates(fmt)
+    if requested in options:
+        return requested, 'requested'
+    route = (routes or {}).get(fmt, {}).get(size_bucket(size_bytes))
+    if route and route.get('engine') in options:
+        return route['engine'], 'calibrated'
+    return DEFAULT_ENGINES.get(fmt, options[0] if options else None), 'default'
+
+
+def calibrate(measurements, quality_floor=DEFAULT_QUALITY_FLOOR):
+    """Build a routing table from benchmark measurements.
+
+    Args:
+        measurements: Dicts with 'format', 'bucket', 'engine', 'seconds_per_mb'
+            and 'quality' (output similarity to the default engine, 0-1)
+        quality_floor: Minimum quality for an engine to be chosen
+
+    Returns:
+        dict: {format: {bucket: {'engine', 'seconds_per_mb', 'quality'}}}
+    """
+    grouped = {}
+    for m in measurements:
+        runs = grouped.setdefault((m['format'], m['bucket']), {}).setdefault(m['engine'], [])
+        runs.append(m)
+
+    routes = {}
+    for (fmt, bucket), engines in sorted(grouped.items()):
+        summary = []
+        for engine, runs in engines.items():
+            summary.append({
+                'engine': engine,
+                'seconds_per_mb': sum(r['seconds_per_mb'] for r in runs) / len(runs),
+                # The weakest file decides whether an engine is good enough
+                'quality': min(r['quality'] for r in runs),
+            })
+        eligible = [s for s in summary if s['quality'] >= quality_floor]
+        if eligible:
+            best = min(eligible, key=lambda s: s['seconds_per_mb'])
+        else:
+            best = max(summary, key=lambda s: s['quality'])
+        routes.setdefault(fmt, {})[bucket] = best
+    return routes
+
+
+def save_routes(path, routes, quality_floor, meta):
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'quality_floor': quality_floor, 'routes': routes}, f, indent=2)
@@ -0,0 +1,287 @@
+# Legal Markdown Converter - Hot Folder Watcher
+"""
+Watches one or more input folders and feeds new files into the conversion
+pipeline, so files dropped into a shared folder are converted without a manual
+upload.
+
+A file is only picked up once its size and modification time have stopped
+changing for ``settle_seconds`` (copies over the network arrive in pieces).
+On Linux the watcher is woken by inotify as soon as a file is closed or moved
+into the folder; everywhere else (macOS, Windows, network shares) it falls back
+to rescanning every ``poll_interval`` seconds.
+
+Converted inputs are moved into a ``processed_subfolder`` inside the watched
+folder (failures go to a "Failed" subfolder) so they are not picked up again.
+"""
+
+import os
+import sys
+import time
+import shutil
+import select
+import ctypes
+import ctypes.util
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# inotify event masks (see <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+
+# Files that are still being written by common copy tools / editors
+TEMP_SUFFIXES = ('.tmp', '.part', '.partial', '.crdownload', '.download')
+
+# Conversions of an unchanged file that may end in OSError (e.g. still locked by the writer) before it is
+# moved to "Failed"
+MAX_OSERROR_ATTEMPTS = 3
+
+
+def _open_inotify(folders):
+    """Return a non-blocking inotify fd watching ``folders``, or None if unavailable."""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        # IN_NONBLOCK and IN_CLOEXEC share their values with O_NONBLOCK and O_CLOEXEC
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        for folder in folders:
+            libc.inotify_add_watch(fd, os.fsencode(folder), IN_CLOSE_WRITE | IN_MOVED_TO)
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+def _is_candidate(name):
+    """Skip hidden files, Office lock files and partially downloaded files."""
+    lowered = name.lower()
+    return not (name.startswith('.') or name.startswith('~$') or lowered.endswith(TEMP_SUFFIXES))
+
+
+class FolderWatcher:
+    """Debounced hot-folder watcher with a bounded pool of conversion workers.
+
+    Args:
+        folders: List of folder paths to watch
+        process_fn: Called as ``process_fn(path)`` for each settled file; should
+            return a result dict like ``process_single_file`` does
+        settle_seconds: How long size/mtime must be unchanged before ingesting
+        poll_interval: Seconds between rescans (upper bound when inotify is used)
+        max_workers: Maximum number of files converted at the same time
+        processed_subfolder: Subfolder that converted inputs are moved into
+    """
+
+    def __init__(self, folders, process_fn, settle_seconds=2.0, poll_interval=1.0,
+                 max_workers=2, processed_subfolder="Converted"):
+        self.folders = [os.path.expanduser(f) for f in folders]
+        self.process_fn = process_fn
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.max_workers = max(1, int(max_workers))
+        self.processed_subfolder = processed_subfolder
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="watch")
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._inotify_fd = None
+
+        # path -> (size, mtime, first_seen, stable_since)
+        self._pending = {}
+        # paths submitted to the executor and not yet finished
+        self._in_flight = set()
+        # (path, size, mtime) of files we could not move away after converting
+        self._done = set()
+        # (path, size, mtime) -> conversions of that version that ended in OSError
+        self._os_errors = {}
+
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._latencies = deque(maxlen=100)  # seconds from first seen to finished
+        self._recent = deque(maxlen=20)
+
+    def start(self):
+        """Start watching in a background thread."""
+        for folder in self.folders:
+            os.makedirs(folder, exist_ok=True)
+        self._inotify_fd = _open_inotify(self.folders)
+        self._thread = threading.Thread(target=self._run, name="folder-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching and wait for running conversions to finish."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._executor.shutdown(wait=True)
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._scan()
+            self._wait()
+
+    def _wait(self):
+        """Sleep until the next rescan, waking early on inotify events."""
+        if self._inotify_fd is None:
+            self._stop.wait(self.poll_interval)
+            return
+        readable, _, _ = select.select([self._inotify_fd], [], [], self.poll_interval)
+        if readable:
+            # The events themselves are not needed - any activity triggers a rescan
+            try:
+                while os.read(self._inotify_fd, 64 * 1024):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def _scan(self):
+        now = time.time()
+        seen = set()
+
+        for folder in self.folders:
+            try:
+                entries = list(os.scandir(folder))
+            except OSError:
+                continue
+
+            for entry in entries:
+                if not entry.is_file() or not _is_candidate(entry.name):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+
+                path = entry.path
+                seen.add(path)
+                if (path, stat.st_size, stat.st_mtime) in self._done:
+                    continue
+
+                with self._lock:
+                    if path in self._in_flight:
+                        continue
+                    previous = self._pending.get(path)
+                    if previous is None or previous[:2] != (stat.st_size, stat.st_mtime):
+                        first_seen = previous[2] if previous else now
+                        self._pending[path] = (stat.st_size, stat.st_mtime, first_seen, now)
+                        continue
+                    if now - previous[3] < self.settle_seconds:
+                        continue
+
+                    del self._pending[path]
+                    self._in_flight.add(path)
+                    self._queued += 1
+                self._executor.submit(self._process, path, previous[2])
+
+        with self._lock:
+            # Forget files that disappeared before settling
+            for path in list(self._pending):
+                if path not in seen:
+                    del self._pending[path]
+            self._done = {key for key in self._done if key[0] in seen}
+            self._os_errors = {key: count for key, count in self._os_errors.items() if key[0] in seen}
+
+    def _process(self, path, first_seen):
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+
+        started = time.time()
+        filename = os.path.basename(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # Removed before its turn
+            self._release(path)
+            return
+        key = (path, stat.st_size, stat.st_mtime)
+        try:
+            result = self.process_fn(path)
+        except OSError as e:
+            # Probably still locked by the writer: let the next scans retry this version a few times
+            with self._lock:
+                attempts = self._os_errors.get(key, 0) + 1
+                self._os_errors[key] = attempts
+            if attempts < MAX_OSERROR_ATTEMPTS:
+                self._release(path)
+                return
+            result = {'type': 'error', 'message': f'{filename} failed to convert: {str(e)}'}
+        except Exception as e:
+            result = {'type': 'error', 'message': f'{filename} failed to convert: {str(e)}'}
+
+        ok = result.get('type') == 'success'
+        destination = self.processed_subfolder if ok else "Failed"
+        if not self._move_input(path, destination):
+            with self._lock:
+                self._done.add(key)
+
+        finished = time.time()
+        with self._lock:
+            self._active -= 1
+            self._in_flight.discard(path)
+            self._os_errors.pop(key, None)
+            if ok:
+                self._completed += 1
+            else:
+                self._failed += 1
+            self._latencies.append(finished - first_seen)
+            self._recent.append({
+                'filename': filename,
+                'type': result.get('type'),
+                'message': result.get('message', ''),
+                'wait_seconds': round(started - first_seen, 2),
+                'convert_seconds': round(finished - started, 2),
+            })
+
+    def _release(self, path):
+        """Give a file back to the scanner without a result."""
+        with self._lock:
+            self._active -= 1
+            self._in_flight.discard(path)
+
+    def _move_input(self, path, subfolder):
+        """Move a processed input out of the watched folder. Returns True on success."""
+        if not subfolder:
+            return False
+        target_dir = os.path.join(os.path.dirname(path), subfolder)
+        try:
+            os.makedirs(target_dir, exist_ok=True)
+            name, ext = os.path.splitext(os.path.basename(path))
+            target = os.path.join(target_dir, name + ext)
+            counter = 1
+            while os.path.exists(target):
+                target = os.path.join(target_dir, f"{name} ({counter}){ext}")
+                counter += 1
+            shutil.move(path, target)
+            return True
+        except OSError:
+            return False
+
+    def stats(self):
+        """Return queue depth and latency statistics for the UI."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                'enabled': True,
+                'folders': self.folders,
+                'backend': 'inotify' if self._inotify_fd is not None else 'polling',
+                'settling': len(self._pending),
+                'queued': self._queued,
+                'active': self._active,
+                'completed': self._completed,
+                'failed': self._failed,
+                'recent': list(self._recent),
+            }
+
+        if latencies:
+            stats['latency_avg'] = round(sum(latencies) / len(latencies), 2)
+            stats['latency_p50'] = round(latencies[len(latencies) // 2], 2)
+            stats['latency_p95'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2)
+        return stats
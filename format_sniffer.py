@@ -0,0 +1,216 @@
+# Legal Markdown Converter - Content-Based Format Detection
+"""
+Identifies a file's real format from its first bytes (magic numbers and
+container signatures) instead of trusting the extension, so each file is sent
+to the right conversion engine the first time.
+
+Recognized formats:
+    pdf, rtf, html, eml, zip, docx, xlsx, pptx, odt, epub, msg, doc, xls, ppt,
+    png, jpeg, gif, bmp, tiff, text
+
+Anything else returns None and is routed by extension as before.
+"""
+
+import os
+import re
+import zipfile
+from io import BytesIO
+
+# How much of the file is read for sniffing
+SNIFF_BYTES = 8192
+
+OLE_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+# Formats that map directly to an extension-style name the pipeline already uses
+FORMAT_EXTENSIONS = {
+    'pdf': '.pdf', 'rtf': '.rtf', 'html': '.html', 'eml': '.eml', 'zip': '.zip',
+    'docx': '.docx', 'xlsx': '.xlsx', 'pptx': '.pptx', 'odt': '.odt', 'epub': '.epub',
+    'msg': '.msg', 'doc': '.doc', 'xls': '.xls', 'ppt': '.ppt',
+    'png': '.png', 'jpeg': '.jpg', 'gif': '.gif', 'bmp': '.bmp', 'tiff': '.tif', 'text': '.txt',
+}
+
+# Extensions that are expected to hold each format (for misroute detection)
+EXPECTED_EXTENSIONS = {
+    'pdf': {'.pdf'},
+    'rtf': {'.rtf'},
+    'html': {'.html', '.htm', '.xhtml'},
+    'eml': {'.eml'},
+    'zip': {'.zip'},
+    'docx': {'.docx', '.docm', '.dotx'},
+    'xlsx': {'.xlsx', '.xlsm'},
+    'pptx': {'.pptx', '.pptm'},
+    'odt': {'.odt'},
+    'epub': {'.epub'},
+    'msg': {'.msg'},
+    'doc': {'.doc', '.dot'},
+    'xls': {'.xls'},
+    'ppt': {'.ppt'},
+    'png': {'.png'},
+    'jpeg': {'.jpg', '.jpeg'},
+    'gif': {'.gif'},
+    'bmp': {'.bmp'},
+    'tiff': {'.tif', '.tiff'},
+    'text': {'.txt', '.md', '.csv', '.rst', '.org', '.tex', '.json', '.xml'},
+}
+
+# Formats identified by a binary signature - detection is reliable enough to override the extension
+SIGNATURE_FORMATS = {'pdf', 'rtf', 'zip', 'docx', 'xlsx', 'pptx', 'odt', 'epub', 'msg', 'doc', 'xls', 'ppt',
+                     'png', 'jpeg', 'gif', 'bmp', 'tiff'}
+
+# Package formats that are ZIP files underneath; a bare 'zip' result never overrides these
+ZIP_PACKAGE_EXTENSIONS = {'.docx', '.docm', '.dotx', '.xlsx', '.xlsm', '.pptx', '.pptm', '.odt', '.ods', '.odp',
+                          '.epub'}
+
+EMAIL_HEADER = re.compile(
+    rb'^(Return-Path|Received|From|To|Subject|Date|Message-ID|MIME-Version|X-[\w-]+|Delivered-To):',
+    re.IGNORECASE | re.MULTILINE)
+
+
+def _read_head(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source[:SNIFF_BYTES])
+    if hasattr(source, 'read'):
+        position = source.tell()
+        head = source.read(SNIFF_BYTES)
+        source.seek(position)
+        return head
+    with open(source, 'rb') as f:
+        return f.read(SNIFF_BYTES)
+
+
+def _zip_format(source):
+    """Tell OOXML, OpenDocument and EPUB packages apart from plain ZIP archives."""
+    try:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            archive = zipfile.ZipFile(BytesIO(bytes(source)))
+        else:
+            archive = zipfile.ZipFile(source)
+    except (zipfile.BadZipFile, OSError):
+        return 'zip'
+
+    with archive:
+        names = set(archive.namelist())
+        if 'mimetype' in names:
+            mimetype = archive.read('mimetype')[:100]
+            if mimetype.startswith(b'application/epub+zip'):
+                return 'epub'
+            if mimetype.startswith(b'application/vnd.oasis.opendocument.text'):
+                return 'odt'
+        if '[Content_Types].xml' in names:
+            if any(n.startswith('word/') for n in names):
+                return 'docx'
+            if any(n.startswith('xl/') for n in names):
+                return 'xlsx'
+            if any(n.startswith('ppt/') for n in names):
+                return 'pptx'
+    return 'zip'
+
+
+def _ole_format(head):
+    """Tell Outlook MSG, Word, Excel and PowerPoint OLE files apart.
+
+    Stream names live in the directory sectors as UTF-16LE; for small files they
+    fall within the sniffed bytes, otherwise the extension decides.
+    """
+    if '__substg1.0_'.encode('utf-16-le') in head or '__properties_version1.0'.encode('utf-16-le') in head:
+        return 'msg'
+    if 'WordDocument'.encode('utf-16-le') in head:
+        return 'doc'
+    if 'Workbook'.encode('utf-16-le') in head:
+        return 'xls'
+    if 'PowerPoint Document'.encode('utf-16-le') in head:
+        return 'ppt'
+    return None
+
+
+def sniff_format(source, filename=None):
+    """Detect a file's format from its content.
+
+    Args:
+        source: File bytes, a seekable binary file object, or a path
+        filename: Original filename, used to resolve OLE files whose directory
+            is beyond the sniffed bytes
+
+    Returns:
+        str or None: A format name (see module docstring), or None if unknown
+    """
+    head = _read_head(source)
+    if not head:
+        return None
+
+    if head.startswith(b'%PDF-') or b'%PDF-' in head[:1024]:
+        return 'pdf'
+    if head.startswith(b'{\\rtf'):
+        return 'rtf'
+    if head.startswith(b'PK\x03\x04') or head.startswith(b'PK\x05\x06'):
+        return _zip_format(source)
+    if head.startswith(OLE_SIGNATURE):
+        ext = os.path.splitext(filename or '')[1].lower()
+        detected = _ole_format(head)
+        if detected:
+            return detected
+        for fmt in ('msg', 'doc', 'xls', 'ppt'):
+            if ext in EXPECTED_EXTENSIONS[fmt]:
+                return fmt
+        return 'doc'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if head.startswith(b'BM') and len(head) > 14 and head[6:10] == b'\x00\x00\x00\x00':
+        return 'bmp'
+    if head.startswith((b'II*\x00', b'MM\x00*')):
+        return 'tiff'
+
+    # Text-based formats: skip a UTF-8 BOM and leading whitespace
+    text = head.lstrip(b'\xef\xbb\xbf').lstrip()
+    lowered = text[:512].lower()
+    if lowered.startswith((b'<!doctype html', b'<html', b'<head', b'<body')) or \
+            (lowered.startswith(b'<?xml') and b'<html' in lowered):
+        return 'html'
+    if EMAIL_HEADER.match(text) and len(EMAIL_HEADER.findall(text[:4096])) >= 2:
+        return 'eml'
+
+    # Plain text: decodes as UTF-8 and has no control characters besides whitespace
+    try:
+        decoded = head.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # A multi-byte character may be cut off at the end of the sniffed bytes
+        if e.start < len(head) - 4:
+            return None
+        decoded = head[:e.start].decode('utf-8')
+    if not any(ord(c) < 32 and c not in '\t\n\r\f' for c in decoded):
+        return 'text'
+    return None
+
+
+def is_misrouted(fmt, filename):
+    """True when the detected format does not match the file's extension."""
+    if fmt is None:
+        return False
+    ext = os.path.splitext(filename)[1].lower()
+    return ext not in EXPECTED_EXTENSIONS.get(fmt, set())
+
+
+def resolve_extension(fmt, filename):
+    """Return the extension a file should be routed by.
+
+    Signature-based formats override a wrong extension (an RTF saved as .doc, a
+    PDF with no extension). Text-based formats (html, eml, text) only override
+    extensions that promise a binary format, since e.g. an HTML fragment is not
+    recognizable as HTML from its first bytes.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if fmt is None or not is_misrouted(fmt, filename):
+        return ext
+    if fmt == 'zip' and ext in ZIP_PACKAGE_EXTENSIONS:
+        return ext
+    if fmt in SIGNATURE_FORMATS:
+        return FORMAT_EXTENSIONS[fmt]
+
+    binary_extensions = set().union(*(EXPECTED_EXTENSIONS[f] for f in SIGNATURE_FORMATS))
+    if ext in binary_extensions or not ext:
+        return FORMAT_EXTENSIONS[fmt]
+    return ext
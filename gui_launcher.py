@@ -1,6 +1,7 @@
 # Legal Markdown Converter - Main Flask Application
 from flask import Flask, request, render_template_string, jsonify, send_file
 import os
+import sys
 import tempfile
 import re
 import subprocess
@@ -9,16 +10,39 @@ import socket
 from markitdown import MarkItDown
 from markdown_it import MarkdownIt
 from markdown_it.token import Token
-import fitz  # PyMuPDF
 import pytesseract
 from PIL import Image
 import io
 import json
 import uuid
+import hmac
 import threading
 import time
+from contextlib import contextmanager, nullcontext
 from werkzeug.utils import secure_filename
 from email_converter import process_email_file
+from mime_stream import read_attachment, close_attachments
+from email_images import POLICIES as INLINE_IMAGE_POLICIES, DEFAULT_POLICY as INLINE_IMAGE_POLICY
+from pymupdf_converter import pdf_to_markdown
+from document_context import DocumentContext, open_context
+from image_ocr import ocr_image, IMAGE_EXTENSIONS
+from page_classifier import classify_page, BLANK_MAX_INK_RATIO
+from ocr_preprocess import preprocess_page, pixmap_to_array, HAS_NUMPY, STEPS as PREPROCESS_STEPS
+from pdf_shards import convert_pdf_sharded, CancellableConversion, DEFAULT_SHARD_PAGES, DEFAULT_MIN_PAGES
+from folder_watcher import FolderWatcher
+from engine_router import choose_engine, load_routes, DEFAULT_ROUTES_FILE
+from format_sniffer import sniff_format, resolve_extension
+from memfile import real_path
+from state_store import StateStore, DEFAULT_STATE_DB
+from job_queue import JobRunner, attempts_exhausted, over_limit, retry_after, THROUGHPUT_WINDOW
+from job_cost import estimate_job
+from worker_client import RemoteWorker
+from wsgi_server import serve, try_lock
+from metrics import (timed_stage, render_metrics, snapshot as metrics_snapshot, CONVERSION_SECONDS, CONVERSIONS, OCR_PAGES, PANDOC_CALLS,
+                     MARKITDOWN_CALLS, FALLBACKS, FORMAT_MISROUTES, OCR_PAGES_SKIPPED, SPECULATIVE_WINNERS, QUEUE_DEPTH, HTTP_REQUEST_SECONDS,
+                     ADMISSION_REJECTED)
+from tracing import start_trace, traced, span, set_attributes, load_trace, run_in_context
+import profiling
 
 app = Flask(__name__)
 UPLOAD_FOLDER = tempfile.gettempdir()
@@ -36,6 +60,9 @@ def get_output_folder():
 
 OUTPUT_FOLDER = get_output_folder()
 DEBUG_FOLDER = os.path.join(OUTPUT_FOLDER, "debug")
+TRACE_FOLDER = os.path.join(OUTPUT_FOLDER, "traces")
+# Streamed results waiting to be downloaded by remote users
+RESULTS_FOLDER = os.path.join(UPLOAD_FOLDER, "lmc_results")
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
 def is_debug_enabled():
@@ -47,6 +74,176 @@ def is_debug_enabled():
     except:
         return False
 
+def is_tracing_enabled():
+    """Check if per-job trace files should be saved (on unless disabled in config)."""
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+            return config.get('tracing', {}).get('enabled', True)
+    except:
+        return True
+
+def get_profiling_config():
+    """Get the profiling section of config (see profiling.resolve_settings)."""
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+            return config.get('profiling', {})
+    except:
+        return {}
+
+def get_default_pdf_engine():
+    """Get the default PDF text engine from config ('markitdown' or 'pymupdf')."""
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+            engine = config.get('conversion', {}).get('pdf_engine', 'markitdown')
+            return engine if engine in PDF_ENGINES else 'markitdown'
+    except:
+        return 'markitdown'
+
+def get_ocr_config():
+    """Get OCR settings from config (image preprocessing is off unless enabled)."""
+    defaults = {
+        'preprocess': False,
+        'preprocess_steps': list(PREPROCESS_STEPS),
+        'skip_blank_pages': True,
+        'speculative': True,
+        'speculative_pages': 2,
+        'blank_max_ink_ratio': BLANK_MAX_INK_RATIO
+    }
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+            defaults.update(config.get('ocr', {}))
+    except:
+        pass
+    return defaults
+
+def get_email_config():
+    """Get email settings from config (decorative inline images are listed, not converted)."""
+    defaults = {
+        'inline_images': INLINE_IMAGE_POLICY
+    }
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+            defaults.update(config.get('email', {}))
+    except:
+        pass
+    if defaults['inline_images'] not in INLINE_IMAGE_POLICIES:
+        defaults['inline_images'] = INLINE_IMAGE_POLICY
+    return defaults
+
+def get_shard_config():
+    """Get page-shard settings for large text PDFs from the conversion section of config."""
+    defaults = {
+        'shard_pages': DEFAULT_SHARD_PAGES,
+        'shard_min_pages': DEFAULT_MIN_PAGES,
+        'shard_workers': 0  # 0 = one per CPU
+    }
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+            conversion = config.get('conversion', {})
+            defaults.update({k: v for k, v in conversion.items() if k in defaults})
+    except:
+        pass
+    return defaults
+
+def get_routing_config():
+    """Get engine routing settings ('fixed' uses default engines, 'auto' the calibrated table)."""
+    defaults = {
+        'routing': 'fixed',
+        'routes_file': DEFAULT_ROUTES_FILE
+    }
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+            conversion = config.get('conversion', {})
+            defaults.update({k: v for k, v in conversion.items() if k in defaults})
+    except:
+        pass
+    return defaults
+
+def get_watch_config():
+    """Get hot-folder watcher settings from config."""
+    defaults = {
+        'enabled': False,
+        'folders': [],
+        'settle_seconds': 2,
+        'poll_interval': 1,
+        'max_workers': 2,
+        'processed_subfolder': 'Converted'
+    }
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+            defaults.update(config.get('watch', {}))
+    except:
+        pass
+    return defaults
+
+def get_server_config():
+    """Get server settings ('development' runs Flask's own server, 'production' a WSGI server)."""
+    defaults = {
+        'mode': 'development',
+        'port': 5050,
+        'workers': 4,
+        'threads': 8,
+        'job_workers': 2,
+        'worker_token': '',
+        'state_db': DEFAULT_STATE_DB,
+        'jobs_folder': 'lmc_jobs'
+    }
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+            defaults.update(config.get('server', {}))
+    except:
+        pass
+    return defaults
+
+def get_queue_config():
+    """Get admission limits for the job queue (0 = no limit, see job_queue.over_limit)."""
+    defaults = {
+        'max_jobs': 200,
+        'max_mb': 2048,
+        'max_ocr_pages': 3000
+    }
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+            defaults.update(config.get('queue', {}))
+    except:
+        pass
+    return defaults
+
+def get_worker_config():
+    """Get worker-mode settings: the coordinator to take jobs from (see worker_client)."""
+    defaults = {
+        'coordinator': '',
+        'name': '',
+        'slots': 2,
+        'token': ''
+    }
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+            defaults.update(config.get('worker', {}))
+    except:
+        pass
+    return defaults
+
+def format_eta(seconds):
+    """Format a remaining-time estimate for status messages (e.g. '4m 10s')."""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+
 def get_local_ip():
     """Get the local network IP address."""
     try:
@@ -58,39 +255,120 @@ def get_local_ip():
     except:
         return "127.0.0.1"
 
-# Store converted files in memory for remote downloads
-converted_files = {}
-
+# Extensions converted with Pandoc, and the Pandoc reader for each
 PANDOC_FORMATS = {
-    ".docx", ".odt", ".html", ".htm", ".tex", ".epub", ".rst", ".org", ".rtf"}
+    ".docx": "docx", ".odt": "odt", ".html": "html", ".htm": "html", ".tex": "latex",
+    ".epub": "epub", ".rst": "rst", ".org": "org", ".rtf": "rtf"}
+# Zip-based formats pandoc cannot read from stdin; in-memory input gets a path (see memfile)
+PANDOC_BINARY_FORMATS = {"docx", "odt", "epub"}
+
+# Engines that can extract a PDF's text layer (selectable per job, or 'auto' to use the routing table)
+PDF_ENGINES = ("markitdown", "pymupdf")
+
+# PDFs with fewer text-layer characters per page than this are ambiguous (see has_thin_text_layer)
+THIN_TEXT_CHARS_PER_PAGE = 500
+# Share of the OCR'd words the text layer must hold for text extraction to be worth waiting for
+TEXT_LAYER_MIN_SHARE = 0.5
+
+# Sessions and converted files for remote download, shared by all server processes
+shared_state = StateStore(get_server_config()['state_db'])
+# Uploaded files waiting in the job queue; kept next to the state database, not in the temp folder,
+# so that queued jobs still have their files after a reboot
+JOBS_FOLDER = os.path.join(os.path.dirname(shared_state.path),
+                           os.path.expanduser(get_server_config()['jobs_folder']))
+# Seconds a finished session, and a downloaded file, stay available
+SESSION_KEEP_SECONDS = 30
+DOWNLOAD_KEEP_SECONDS = 60
+
+# Runs queued uploads in this process (started with the server, see start_job_runner)
+job_runner = None
+
+# Each server process publishes its counters under its own key every few seconds; /metrics sums them
+METRICS_KEY_PREFIX = 'metrics.process.'
+METRICS_PUBLISH_INTERVAL = 5
+# (pid, key) of this process; production workers are forked after import, so the key is made per pid
+_metrics_key = (None, None)
+
+# Hot-folder watcher (started in one process only, see start_hot_folder_watcher)
+hot_folder_watcher = None
+_watch_lock = None
+# Seconds between publishing the watcher's statistics to the other processes, and how long they stay valid
+WATCH_STATS_INTERVAL = 1
+WATCH_STATS_MAX_AGE = 10
+
+def pick_engine(fmt, size_bytes, requested=None):
+    """Choose the conversion engine for one file (see engine_router).
+
+    An engine requested for the job wins. With 'auto' requested, or
+    "routing": "auto" in config, the calibrated routing table is used;
+    otherwise (or for formats not in the table) the format's default engine,
+    which for PDFs is the configured pdf_engine.
+
+    Args:
+        fmt: Format name, e.g. 'pdf' or a pandoc reader such as 'docx'
+        size_bytes: File size
+        requested: Engine chosen for the job, 'auto', or None
 
-# Store processing status
-processing_status = {}
+    Returns:
+        tuple: (engine, reason) with reason 'requested', 'calibrated' or 'default'
+    """
+    settings = get_routing_config()
+    routes = None
+    if requested == 'auto' or settings['routing'] == 'auto':
+        routes = load_routes(settings['routes_file'])
+    if requested == 'auto':
+        requested = None
+
+    engine, reason = choose_engine(fmt, size_bytes, routes, requested)
+    if fmt == 'pdf' and reason == 'default':
+        engine = get_default_pdf_engine()
+    set_attributes(engine=engine, engine_reason=reason)
+    return engine, reason
+
+@traced()
+def route_extension(source, filename):
+    """Return the extension to route a file by, checking its content first.
+
+    Westlaw .doc downloads that are really RTF, PDFs without an extension and
+    similar mislabelled files go straight to the right engine instead of failing
+    in the wrong one first. Mismatches are counted in FORMAT_MISROUTES.
+
+    Args:
+        source: File bytes or a path
+        filename: The original filename
 
-def is_rtf_file(filepath):
-    """Check if a file is actually RTF format by looking at its content."""
+    Returns:
+        str: A lowercase extension such as ".pdf" (may be "" if unknown)
+    """
+    ext = os.path.splitext(filename)[1].lower()
     try:
-        with open(filepath, 'rb') as f:
-            # Read first few bytes to check for RTF signature
-            header = f.read(10)
-            return header.startswith(b'{\\rtf')
-    except:
-        return False
+        detected = sniff_format(source, filename)
+    except OSError:
+        return ext
+    routed = resolve_extension(detected, filename)
+    set_attributes(detected_format=detected or 'unknown')
+    if routed != ext:
+        FORMAT_MISROUTES.inc(extension=ext or 'none', detected=detected)
+        set_attributes(routed_as=routed)
+    return routed
+
+@traced()
+@timed_stage('needs_ocr')
+def needs_ocr(pdf):
+    """Check if a PDF needs OCR by testing if it has extractable text.
 
-def needs_ocr(pdf_path):
-    """Check if a PDF needs OCR by testing if it has extractable text."""
+    Args:
+        pdf: A PDF path or a DocumentContext (whose page text is cached for later stages)
+    """
     try:
-        doc = fitz.open(pdf_path)
-        # Check first few pages for text
-        pages_to_check = min(3, len(doc))
-        total_text = ""
-        
-        for i in range(pages_to_check):
-            page = doc[i]
-            text = page.get_text().strip()
-            total_text += text
-            
-        doc.close()
+        ctx, owned = open_context(pdf)
+        try:
+            # Check first few pages for text
+            pages_to_check = min(3, ctx.page_count)
+            total_text = "".join(ctx.page_text(i) for i in range(pages_to_check))
+        finally:
+            if owned:
+                ctx.close()
         
         # If we have very little text relative to the page count, probably needs OCR
         # This is a heuristic - adjust threshold as needed
@@ -98,34 +376,301 @@ def needs_ocr(pdf_path):
     except:
         return True  # If we can't read it, assume it needs OCR
 
-def ocr_pdf(pdf_path):
-    """Perform OCR on a PDF and return the extracted text."""
+@traced()
+@timed_stage('ocr_preprocess')
+def preprocess_for_ocr(ctx, page_num, steps):
+    """Render a page in grayscale and clean it up for Tesseract (see ocr_preprocess).
+
+    Returns None if the page turns out to have no content at all.
+    """
+    pix = ctx.pixmap(page_num, zoom=2, gray=True)
+    return preprocess_page(pixmap_to_array(pix), steps)
+
+@traced()
+@timed_stage('ocr_pdf')
+def ocr_pdf(pdf, out=None, progress=None, pages=None, cancel=None, continued=False):
+    """Perform OCR on a PDF and return the extracted text.
+
+    Pages that already have a real text layer (and are not mostly a scanned
+    image), pages with text but no images (e.g. our email cover sheets) and
+    blank pages are not sent to Tesseract (see page_classifier).
+
+    With ``out``, each page is written as soon as it is recognized and nothing
+    is kept in memory, so memory use does not grow with the page count.
+
+    Args:
+        pdf: A PDF path or a DocumentContext
+        out: Optional text file object to stream the result into (returns None)
+        progress: Optional callback ``progress(page, total, eta_seconds)`` called
+            after each page
+        pages: Page numbers (0-based) to OCR, in order; default all pages
+        cancel: Optional threading.Event; OCR stops after the current page once set
+        continued: True when ``out`` already holds earlier pages (a separator is written first)
+    """
     try:
-        doc = fitz.open(pdf_path)
-        full_text = []
-        
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            
-            # Convert page to image
-            mat = fitz.Matrix(2, 2)  # 2x zoom for better OCR quality
-            pix = page.get_pixmap(matrix=mat)
-            img_data = pix.tobytes("png")
-            
-            # Convert to PIL Image
-            img = Image.open(io.BytesIO(img_data))
-            
-            # Perform OCR
-            text = pytesseract.image_to_string(img)
-            
-            if text.strip():
-                full_text.append(f"## Page {page_num + 1}\n\n{text}")
-        
-        doc.close()
+        ctx, owned = open_context(pdf)
+        ocr_settings = get_ocr_config()
+        preprocess = ocr_settings['preprocess'] and HAS_NUMPY
+        full_text = [] if out is None else None
+        pages_written = 1 if continued else 0
+        skipped = {}
+        
+        total = ctx.page_count
+        pages = range(total) if pages is None else pages
+        set_attributes(pages=len(pages))
+        
+        try:
+            started = time.monotonic()
+            for done_here, page_num in enumerate(pages, 1):
+                if cancel is not None and cancel.is_set():
+                    set_attributes(cancelled_at_page=page_num + 1)
+                    break
+                with span('ocr_page', page=page_num + 1):
+                    kind = classify_page(ctx, page_num, ocr_settings['skip_blank_pages'],
+                                         ocr_settings['blank_max_ink_ratio'])
+                    if kind != 'scan':
+                        text = ctx.page_text(page_num)
+                        skipped[kind] = skipped.get(kind, 0) + 1
+                        OCR_PAGES_SKIPPED.inc(reason=kind)
+                        set_attributes(source=kind)
+                    else:
+                        if preprocess:
+                            img = preprocess_for_ocr(ctx, page_num, ocr_settings['preprocess_steps'])
+                        else:
+                            # Render the page (2x zoom for better OCR quality) straight into a PIL image
+                            pix = ctx.pixmap(page_num, zoom=2)
+                            img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+                        # Perform OCR (preprocessing returns None for pages with no content)
+                        if img is None:
+                            text = ""
+                            set_attributes(source='empty')
+                        else:
+                            text = pytesseract.image_to_string(img)
+                            OCR_PAGES.inc()
+                    ctx.release_page(page_num)
+
+                    if text.strip():
+                        page_text = f"## Page {page_num + 1}\n\n{text}"
+                        if out is None:
+                            full_text.append(page_text)
+                        else:
+                            out.write(("\n\n---\n\n" if pages_written else "") + page_text)
+                            out.flush()
+                        pages_written += 1
+
+                if progress:
+                    done = page_num + 1
+                    eta = (time.monotonic() - started) / done_here * (total - done)
+                    progress(done, total, eta)
+        finally:
+            if owned:
+                ctx.close()
+        
+        set_attributes(**{f'{kind}_pages': count for kind, count in skipped.items()})
+        if out is not None:
+            return None
         return "\n\n---\n\n".join(full_text)
     except Exception as e:
         raise Exception(f"OCR failed: {str(e)}")
 
+def has_thin_text_layer(ctx, pages_to_check=3):
+    """True for PDFs that passed needs_ocr but whose text layer may still be too thin to use.
+
+    Checks the same first pages as needs_ocr: little text per page, or pages
+    that are mostly a scanned image (often with a partial or garbage text layer).
+    """
+    pages = range(min(pages_to_check, ctx.page_count))
+    chars = sum(len(ctx.page_text(i)) for i in pages)
+    return (chars < THIN_TEXT_CHARS_PER_PAGE * len(pages)
+            or any(ctx.image_coverage(i) >= 0.5 for i in pages))
+
+@traced()
+def speculative_pdf_text(ctx, engine, out, progress=None):
+    """Text-extract and OCR a PDF with a thin text layer at the same time; keep the winner.
+
+    Text extraction runs in a child process (page shards for long PDFs, see
+    pdf_shards) while the first pages are OCR'd, so neither waits on the
+    other's use of the document. OCR is cancelled as soon as the extracted
+    text proves sufficient. If the OCR'd first pages show the text layer
+    holds only a fraction of the words, text extraction is stopped and OCR
+    simply continues, so neither result waits for the other to fail first.
+
+    Args:
+        ctx: A DocumentContext
+        engine: Text engine (see PDF_ENGINES)
+        out: Text file object the winning result is written to
+        progress: OCR page progress callback (see ocr_pdf)
+
+    Returns:
+        str: 'text' or 'ocr', whichever result was written
+    """
+    head_pages = range(min(get_ocr_config()['speculative_pages'], ctx.page_count))
+    min_pages = get_shard_config()['shard_min_pages']
+    sharded = bool(min_pages) and ctx.page_count >= min_pages
+    cancel_ocr = threading.Event()
+    cancel_text = threading.Event()
+    text_done = threading.Event()
+    extracted = {}
+
+    # run_sharded materializes its own path, so only the single conversion needs one here
+    with nullcontext() if sharded else pdf_path(ctx) as path:
+        conversion = None if sharded else CancellableConversion(path, engine)
+
+        def extract():
+            try:
+                if sharded:
+                    content = run_sharded(ctx, engine, cancel=cancel_text)
+                else:
+                    content = conversion.result()
+                extracted['content'] = strip_westlaw_links(content)
+            except Exception as e:
+                extracted['error'] = str(e)
+            # text_done before cancel_ocr: a cancelled OCR head always finds the text result ready
+            text_done.set()
+            if len(extracted.get('content', '').strip()) >= 50:
+                cancel_ocr.set()
+
+        threading.Thread(target=run_in_context(extract), daemon=True).start()
+        head = ocr_pdf(ctx, pages=head_pages, cancel=cancel_ocr, progress=progress)
+
+        # OCR only stops early for sufficient text, so otherwise the head is complete
+        head_complete = not cancel_ocr.is_set()
+        if head_complete and not text_done.is_set():
+            # OCR of the first pages finished first: does the text layer hold most of their words?
+            layer_words = sum(len(ctx.page_text(i).split()) for i in head_pages)
+            if layer_words >= len(head.split()) * TEXT_LAYER_MIN_SHARE:
+                text_done.wait()
+
+        content = extracted.get('content', '')
+        if not head_complete or (text_done.is_set() and len(content.strip()) >= 50):
+            SPECULATIVE_WINNERS.inc(winner='text')
+            set_attributes(winner='text')
+            out.write(content)
+            return 'text'
+
+        # OCR wins: stop text extraction instead of letting it run on
+        cancel_text.set()
+        if conversion is not None:
+            conversion.cancel()
+
+    SPECULATIVE_WINNERS.inc(winner='ocr')
+    set_attributes(winner='ocr', text_error=extracted.get('error'))
+    FALLBACKS.inc(from_engine=engine, to_engine='ocr')
+    out.write(head)
+    ocr_pdf(ctx, out, progress, pages=range(len(head_pages), ctx.page_count), continued=bool(head.strip()))
+    return 'ocr'
+
+@traced()
+@timed_stage('ocr_image')
+def run_image_ocr(source, out=None, progress=None):
+    """OCR an image file directly, frame by frame for multi-page TIFFs (see image_ocr)."""
+    ocr_settings = get_ocr_config()
+    steps = ocr_settings['preprocess_steps'] if ocr_settings['preprocess'] and HAS_NUMPY else None
+    return ocr_image(source, out=out, progress=progress, preprocess_steps=steps,
+                     skip_blank=ocr_settings['skip_blank_pages'],
+                     max_ink_ratio=ocr_settings['blank_max_ink_ratio'])
+
+@traced()
+@timed_stage('markitdown')
+def run_markitdown(stream):
+    """Convert a binary stream with MarkItDown and return the raw markdown."""
+    try:
+        result = MarkItDown().convert_stream(stream)
+    except Exception:
+        MARKITDOWN_CALLS.inc(outcome='error')
+        raise
+    MARKITDOWN_CALLS.inc(outcome='success')
+    return result.markdown
+
+@traced()
+@timed_stage('pandoc')
+def run_pandoc(source, input_format):
+    """Convert a file to markdown with Pandoc. Raises CalledProcessError on failure.
+
+    Args:
+        source: A file path, or the file's bytes (UTF-8 text formats go in on stdin)
+        input_format: Pandoc reader name (see PANDOC_FORMATS)
+    """
+    set_attributes(format=input_format)
+    text = None
+    if not isinstance(source, str) and input_format not in PANDOC_BINARY_FORMATS:
+        try:
+            text = bytes(source).decode("utf-8")
+        except UnicodeDecodeError:
+            pass  # e.g. cp1252 HTML: pandoc reads the file and fails, so the caller falls back to MarkItDown
+    try:
+        if isinstance(source, str):
+            pandoc_output = _pandoc(["pandoc", source, "-f", input_format, "-t", "markdown"])
+        elif text is not None:
+            pandoc_output = _pandoc(["pandoc", "-f", input_format, "-t", "markdown"], text)
+        else:
+            with real_path(source, "." + input_format) as path:
+                pandoc_output = _pandoc(["pandoc", path, "-f", input_format, "-t", "markdown"])
+    except Exception:
+        PANDOC_CALLS.inc(format=input_format, outcome='error')
+        raise
+    PANDOC_CALLS.inc(format=input_format, outcome='success')
+    return pandoc_output.stdout
+
+def _pandoc(args, stdin=None):
+    return subprocess.run(args, input=stdin, capture_output=True, check=True, text=True, encoding="utf-8")
+
+@traced()
+@timed_stage('pymupdf')
+def run_pymupdf(ctx):
+    """Convert a PDF's text layer to markdown with PyMuPDF."""
+    with ctx.lock:
+        return pdf_to_markdown(ctx.doc)
+
+@traced()
+@timed_stage('pdf_shards')
+def run_sharded(ctx, engine, progress=None, cancel=None):
+    """Convert a large text PDF in parallel page shards (see pdf_shards)."""
+    settings = get_shard_config()
+    set_attributes(pages=ctx.page_count, shard_pages=settings['shard_pages'])
+    # The worker processes open the PDF themselves, so in-memory PDFs need a path
+    with pdf_path(ctx) as path:
+        return convert_pdf_sharded(path, engine, settings['shard_pages'],
+                                   settings['shard_workers'] or None, progress, cancel)
+
+@contextmanager
+def pdf_path(ctx):
+    """A path to the context's PDF for other processes, materialized for in-memory PDFs (see memfile)."""
+    if ctx.path:
+        yield ctx.path
+    else:
+        with real_path(ctx.data, ".pdf") as path:
+            yield path
+
+def extract_pdf_text(pdf, engine=None, progress=None):
+    """Extract a text PDF as raw markdown with the given engine (default from config).
+
+    PDFs with at least ``shard_min_pages`` pages are converted in parallel
+    page shards.
+
+    Args:
+        pdf: A PDF path or a DocumentContext
+        engine: One of PDF_ENGINES
+        progress: Optional callback receiving shard states (sharded PDFs only)
+    """
+    engine = engine or get_default_pdf_engine()
+    ctx, owned = open_context(pdf)
+    try:
+        min_pages = get_shard_config()['shard_min_pages']
+        if min_pages and ctx.page_count >= min_pages:
+            return run_sharded(ctx, engine, progress)
+        if engine == 'pymupdf':
+            return run_pymupdf(ctx)
+        # MarkItDown (pdfminer) parses the file itself
+        with ctx.stream() as stream:
+            return run_markitdown(stream)
+    finally:
+        if owned:
+            ctx.close()
+
+@traced()
+@timed_stage('strip_westlaw_links')
 def strip_westlaw_links(text):
     # Fix broken lines inside [label] text first
     text = re.sub(r'\[([^\]].*?)\n([^\]].*?)\]\(', lambda m: f"[{m.group(1)} {m.group(2)}](", text)
@@ -142,7 +687,8 @@ def strip_westlaw_links(text):
     return text.strip()
 
 
-def convert_file_to_markdown(file_path_or_data, filename, is_data=False):
+@traced()
+def convert_file_to_markdown(file_path_or_data, filename, is_data=False, pdf_engine=None, ext=None):
     """
     Convert a single file to markdown content.
 
@@ -150,69 +696,57 @@ def convert_file_to_markdown(file_path_or_data, filename, is_data=False):
         file_path_or_data: Either a file path (str) or file bytes
         filename: The original filename (used for extension detection)
         is_data: If True, file_path_or_data is bytes; if False, it's a path
+        pdf_engine: Engine requested for text PDFs (see PDF_ENGINES, or 'auto'); None lets pick_engine decide
+        ext: Extension the caller already routed the file by (see route_extension); None routes it here
 
     Returns:
         str: The converted markdown content
     """
-    ext = os.path.splitext(filename)[1].lower()
-
-    # If we have bytes, write to temp file
-    if is_data:
-        with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as tmp:
-            tmp.write(file_path_or_data)
-            file_path = tmp.name
-        cleanup_needed = True
-    else:
-        file_path = file_path_or_data
-        cleanup_needed = False
-
-    try:
-        # Handle PDFs
-        if ext == ".pdf":
-            if needs_ocr(file_path):
-                return ocr_pdf(file_path)
+    set_attributes(filename=filename)
+    if ext is None:
+        ext = route_extension(file_path_or_data, filename)
+
+    # Images are OCR'd straight from their bytes (no temp file or PDF round trip)
+    if ext in IMAGE_EXTENSIONS:
+        return run_image_ocr(file_path_or_data)
+
+    # Bytes are converted in memory; nothing is written to a temp file
+    size = len(file_path_or_data) if is_data else os.path.getsize(file_path_or_data)
+
+    # Handle PDFs
+    if ext == ".pdf":
+        source = {'data': file_path_or_data} if is_data else {'path': file_path_or_data}
+        with DocumentContext(**source) as ctx:
+            if needs_ocr(ctx):
+                return ocr_pdf(ctx)
             else:
-                with open(file_path, "rb") as stream:
-                    result = MarkItDown().convert_stream(stream)
-                    content = strip_westlaw_links(result.markdown)
-                    if len(content.strip()) < 50:
-                        # Fall back to OCR if text extraction yielded little content
-                        return ocr_pdf(file_path)
-                    return content
-
-        # Handle RTF (check actual content, not just extension)
-        if is_rtf_file(file_path):
-            try:
-                pandoc_output = subprocess.run(
-                    ["pandoc", file_path, "-f", "rtf", "-t", "markdown"],
-                    capture_output=True, check=True, text=True
-                )
-                return strip_westlaw_links(pandoc_output.stdout)
-            except:
-                pass  # Fall through to MarkItDown
-
-        # Handle Pandoc formats
-        if ext in PANDOC_FORMATS:
-            try:
-                pandoc_output = subprocess.run(
-                    ["pandoc", file_path, "-f", ext[1:], "-t", "markdown"],
-                    capture_output=True, check=True, text=True
-                )
-                return strip_westlaw_links(pandoc_output.stdout)
-            except:
-                pass  # Fall through to MarkItDown
-
-        # Default: use MarkItDown
-        with open(file_path, "rb") as stream:
-            result = MarkItDown().convert_stream(stream)
-            return strip_westlaw_links(result.markdown)
-
-    finally:
-        if cleanup_needed and os.path.exists(file_path):
-            os.unlink(file_path)
-
-
-def process_zip_file(zip_data, zip_filename, status_callback=None):
+                pdf_engine, _ = pick_engine('pdf', size, pdf_engine)
+                if get_ocr_config()['speculative'] and has_thin_text_layer(ctx):
+                    out = io.StringIO()
+                    speculative_pdf_text(ctx, pdf_engine, out)
+                    return out.getvalue()
+                content = strip_westlaw_links(extract_pdf_text(ctx, pdf_engine))
+                if len(content.strip()) < 50:
+                    # Fall back to OCR if text extraction yielded little content
+                    FALLBACKS.inc(from_engine=pdf_engine, to_engine='ocr')
+                    return ocr_pdf(ctx)
+                return content
+
+    # Handle Pandoc formats (including RTF saved with a .doc extension), unless routed to MarkItDown
+    if ext in PANDOC_FORMATS and pick_engine(PANDOC_FORMATS[ext], size)[0] == 'pandoc':
+        try:
+            return strip_westlaw_links(run_pandoc(file_path_or_data, PANDOC_FORMATS[ext]))
+        except (subprocess.CalledProcessError, OSError) as e:
+            FALLBACKS.inc(from_engine='pandoc', to_engine='markitdown')  # Fall through to MarkItDown
+            set_attributes(pandoc_error=str(e)[:200])
+
+    # Default: use MarkItDown
+    with (io.BytesIO(file_path_or_data) if is_data else open(file_path_or_data, "rb")) as stream:
+        return strip_westlaw_links(run_markitdown(stream))
+
+
+@traced()
+def process_zip_file(zip_data, zip_filename, status_callback=None, pdf_engine=None):
     """
     Extract and convert all files from a ZIP archive.
 
@@ -220,126 +754,206 @@ def process_zip_file(zip_data, zip_filename, status_callback=None):
         zip_data: The ZIP file as bytes
         zip_filename: Original ZIP filename
         status_callback: Optional function to call with status updates
+        pdf_engine: Engine requested for text PDFs inside the archive (see convert_file_to_markdown)
 
     Returns:
         str: Combined markdown content with headers for each file
     """
+    set_attributes(filename=zip_filename)
     content_parts = []
     content_parts.append(f"## Begin ZIP Contents\n**Archive:** {zip_filename}\n")
 
-    with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as tmp_zip:
-        tmp_zip.write(zip_data)
-        tmp_zip_path = tmp_zip.name
+    with zipfile.ZipFile(io.BytesIO(zip_data), 'r') as zf:
+        # Get list of files (skip directories and hidden files)
+        file_list = [f for f in zf.namelist()
+                    if not f.endswith('/')
+                    and not os.path.basename(f).startswith('.')
+                    and not f.startswith('__MACOSX')]
 
-    try:
-        with zipfile.ZipFile(tmp_zip_path, 'r') as zf:
-            # Get list of files (skip directories and hidden files)
-            file_list = [f for f in zf.namelist()
-                        if not f.endswith('/')
-                        and not os.path.basename(f).startswith('.')
-                        and not f.startswith('__MACOSX')]
-
-            for i, inner_filename in enumerate(file_list, 1):
-                if status_callback:
-                    status_callback(f"Processing ZIP file {i}/{len(file_list)}: {inner_filename}")
-
-                inner_ext = os.path.splitext(inner_filename)[1].lower()
-                display_name = os.path.basename(inner_filename)
-
-                try:
-                    inner_data = zf.read(inner_filename)
-
-                    # Handle nested ZIPs recursively
-                    if inner_ext == '.zip':
-                        nested_content = process_zip_file(inner_data, display_name, status_callback)
-                        content_parts.append(f"\n### ZIP File {i}: {display_name}\n\n{nested_content}")
-
-                    # Handle nested emails
-                    elif inner_ext in ['.eml', '.msg']:
-                        try:
-                            pdf_bytes, attachments = process_email_file(inner_data, display_name)
-                            # For simplicity, just note it's an email - full processing would be recursive
-                            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp_pdf:
-                                tmp_pdf.write(pdf_bytes)
-                                tmp_pdf_path = tmp_pdf.name
-                            try:
-                                email_content = convert_file_to_markdown(tmp_pdf_path, "email.pdf")
-                            finally:
-                                os.unlink(tmp_pdf_path)
-                            content_parts.append(f"\n### File {i}: {display_name}\n\n{email_content}")
-                        except Exception as e:
-                            content_parts.append(f"\n### File {i}: {display_name}\n\n[Error processing email: {str(e)}]")
-
-                    # Handle all other files
-                    else:
-                        file_content = convert_file_to_markdown(inner_data, display_name, is_data=True)
-                        content_parts.append(f"\n### File {i}: {display_name}\n\n{file_content}")
+        for i, inner_filename in enumerate(file_list, 1):
+            if status_callback:
+                status_callback(f"Processing ZIP file {i}/{len(file_list)}: {inner_filename}")
 
-                except Exception as e:
-                    content_parts.append(f"\n### File {i}: {display_name}\n\n[Error converting file: {str(e)}]")
+            display_name = os.path.basename(inner_filename)
 
-    finally:
-        os.unlink(tmp_zip_path)
+            try:
+                inner_data = zf.read(inner_filename)
+                inner_ext = route_extension(inner_data, display_name)
+
+                # Handle nested ZIPs recursively
+                if inner_ext == '.zip':
+                    nested_content = process_zip_file(inner_data, display_name, status_callback, pdf_engine)
+                    content_parts.append(f"\n### ZIP File {i}: {display_name}\n\n{nested_content}")
+
+                # Handle nested emails
+                elif inner_ext in ['.eml', '.msg']:
+                    try:
+                        pdf_bytes, attachments = process_email_file(inner_data, display_name,
+                                                                    get_email_config()['inline_images'])
+                        close_attachments(attachments)
+                        # For simplicity, just note it's an email - full processing would be recursive
+                        email_content = convert_file_to_markdown(pdf_bytes, "email.pdf", is_data=True,
+                                                                 pdf_engine=pdf_engine, ext='.pdf')
+                        content_parts.append(f"\n### File {i}: {display_name}\n\n{email_content}")
+                    except Exception as e:
+                        content_parts.append(f"\n### File {i}: {display_name}\n\n[Error processing email: {str(e)}]")
+
+                # Handle all other files
+                else:
+                    file_content = convert_file_to_markdown(inner_data, display_name, is_data=True,
+                                                            pdf_engine=pdf_engine, ext=inner_ext)
+                    content_parts.append(f"\n### File {i}: {display_name}\n\n{file_content}")
+
+            except Exception as e:
+                content_parts.append(f"\n### File {i}: {display_name}\n\n[Error converting file: {str(e)}]")
 
     content_parts.append("\n## End ZIP Contents")
     return "\n".join(content_parts)
 
-def process_single_file(filename, file_data, session_id, save_locally=True):
-    """Process a single file and update status.
+def process_single_file(filename, file_data, session_id, save_locally=True, job_id=None):
+    """Process a single file, update status and record conversion metrics.
+
+    Takes the same arguments as _convert_single_file. The returned result dict
+    includes the 'route' the file took through the pipeline, the 'trace_id' of
+    the saved span timeline when tracing is enabled, and 'profile_files' when the
+    job was profiled.
+    """
+    start = time.perf_counter()
+    trace_folder = TRACE_FOLDER if is_tracing_enabled() else None
+    profile_settings = profiling.resolve_settings(get_profiling_config(), shared_state)
+    session_requested = (shared_state.get_session(session_id) or {}).get('profile', False)
+
+    with start_trace('process_single_file', folder=trace_folder, filename=filename, bytes=len(file_data)) as trace:
+        if profiling.should_profile(filename, profile_settings, session_requested):
+            # Save the profile next to the debug PDFs
+            profile_prefix = os.path.join(DEBUG_FOLDER, secure_filename(os.path.splitext(filename)[0]) +
+                                          time.strftime("_%Y%m%d-%H%M%S_profile"))
+            with profiling.profile_job(profile_prefix, profile_settings['mode'],
+                                       profile_settings['interval_ms']) as profile:
+                result = _convert_single_file(filename, file_data, session_id, save_locally, job_id)
+            result['profile_files'] = profile.paths
+            if profile.skipped:
+                result['profile_skipped'] = profile.skipped
+        else:
+            result = _convert_single_file(filename, file_data, session_id, save_locally, job_id)
+        route = result.setdefault('route', 'unknown')
+        set_attributes(route=route, outcome=result['type'])
+    CONVERSION_SECONDS.observe(time.perf_counter() - start, route=route)
+    CONVERSIONS.inc(route=route, outcome=result['type'])
+    if trace_folder:
+        result['trace_id'] = trace.trace_id
+    return result
+
+def _convert_single_file(filename, file_data, session_id, save_locally=True, job_id=None):
+    """Convert a single file and update status.
 
     Args:
         filename: Original filename
         file_data: File bytes
         session_id: Session ID for status updates
-        save_locally: If True, save to local folder. If False, only store in memory for download.
+        save_locally: If True, save to local folder. If False, keep in the results folder for download.
+        job_id: Queue job being run, if any; OCR resumes from the job's last checkpoint
     """
-    ext = os.path.splitext(filename)[1].lower()
-    input_path = os.path.join(UPLOAD_FOLDER, secure_filename(filename))
+    # PDF engine chosen for this job in the web interface (None = routing/config default)
+    requested_engine = (shared_state.get_session(session_id) or {}).get('pdf_engine')
 
-    # Save the file
-    with open(input_path, 'wb') as f:
-        f.write(file_data)
+    # Route by content, not just extension (e.g. Westlaw .doc files that are really RTF)
+    ext = route_extension(file_data, filename)
+    misrouted = ext != os.path.splitext(filename)[1].lower()
+    if misrouted:
+        shared_state.update_session(session_id, current_status=f'{filename} detected as {ext[1:].upper()} format')
 
     output_filename = os.path.splitext(filename)[0] + ".md"
     output_path = os.path.join(OUTPUT_FOLDER, output_filename)
-    file_id = str(uuid.uuid4())
+    # A resumed job writes to the same file it was writing before
+    file_id = job_id or str(uuid.uuid4())
 
-    def save_output(content):
-        """Save output based on whether this is a local or remote request."""
+    def streamed_path():
         if save_locally:
-            # Local user - save to folder
-            with open(output_path, "w", encoding="utf-8") as f_out:
-                f_out.write(content)
-        else:
-            # Remote user - store in memory for download
-            converted_files[file_id] = {
-                'filename': output_filename,
-                'content': content
-            }
+            return output_path
+        os.makedirs(RESULTS_FOLDER, exist_ok=True)
+        return os.path.join(RESULTS_FOLDER, file_id + ".md")
+
+    def save_streamed(produce, append_at=None):
+        """Save output (see save_output), with ``produce(out)`` writing the content into the text file as it goes.
+
+        With ``append_at``, the file already holds output from an earlier
+        attempt at the job up to that byte offset, and ``produce`` continues it.
+        """
+        path = streamed_path()
+        try:
+            if append_at:
+                with open(path, "r+b") as f_out:
+                    f_out.truncate(append_at)
+            with open(path, "a" if append_at else "w", encoding="utf-8") as f_out:
+                produce(f_out)
+        except Exception:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        if not save_locally:
+            shared_state.put_artifact(file_id, output_filename, path)
+
+    def ocr_to_output(run_ocr, resumable=False):
+        """Run ``run_ocr(out, progress)`` straight into the output file, publishing page progress and ETA.
+
+        With ``resumable``, a queued job saves a checkpoint after each page, and
+        ``run_ocr(out, progress, first_page, continued)`` is called: a job that
+        was interrupted continues after the last page it wrote.
+        """
+        checkpoint = shared_state.get_checkpoint(job_id, 'ocr') if job_id and resumable else None
+        if checkpoint and not (os.path.exists(streamed_path()) and
+                               os.path.getsize(streamed_path()) >= checkpoint['offset']):
+            checkpoint = None  # The partial output is gone; start over
+        if checkpoint:
+            shared_state.update_session(session_id, current_status=f'{filename}: resuming OCR after page {checkpoint["page"]}...')
+
+        def run(out):
+            def progress(page, total, eta):
+                shared_state.update_session(
+                    session_id, ocr_progress={'page': page, 'total': total, 'eta_seconds': round(eta)},
+                    current_status=f'{filename}: OCR page {page} of {total} ({format_eta(eta)} remaining)')
+                if job_id and resumable:
+                    shared_state.save_checkpoint(job_id, 'ocr', {'page': page, 'offset': out.tell()})
+            if not resumable:
+                return run_ocr(out, progress)
+            if checkpoint:
+                return run_ocr(out, progress, checkpoint['page'], checkpoint['offset'] > 0)
+            return run_ocr(out, progress, 0, False)
+
+        try:
+            save_streamed(run, append_at=checkpoint['offset'] if checkpoint else None)
+        finally:
+            shared_state.clear_fields(session_id, 'ocr_progress')
+
+    def save_output(content):
+        """Save output to the local folder, or for a remote user to the results folder for download."""
+        save_streamed(lambda out: out.write(content))
 
     try:
         # Handle ZIP files - extract and convert all contents
         if ext == ".zip":
-            processing_status[session_id]['current_status'] = f'{filename} is a ZIP archive, extracting and converting contents...'
+            shared_state.update_session(session_id, current_status=f'{filename} is a ZIP archive, extracting and converting contents...')
 
             try:
                 def status_cb(msg):
-                    processing_status[session_id]['current_status'] = f'{filename}: {msg}'
+                    shared_state.update_session(session_id, current_status=f'{filename}: {msg}')
 
-                content = process_zip_file(file_data, filename, status_cb)
+                content = process_zip_file(file_data, filename, status_cb, requested_engine)
                 save_output(content)
-                return {'type': 'success', 'message': f'{filename} ZIP archive converted successfully', 'file_id': file_id, 'filename': output_filename}
+                return {'type': 'success', 'message': f'{filename} ZIP archive converted successfully', 'file_id': file_id, 'filename': output_filename, 'route': 'zip'}
 
             except Exception as zip_err:
-                return {'type': 'error', 'message': f'{filename} ZIP processing failed: {str(zip_err)}'}
+                return {'type': 'error', 'message': f'{filename} ZIP processing failed: {str(zip_err)}', 'route': 'zip'}
 
         # Handle email files (EML/MSG) - convert to PDF first, then process
         if ext in [".eml", ".msg"]:
-            processing_status[session_id]['current_status'] = f'{filename} is an email file, extracting content and attachments...'
+            shared_state.update_session(session_id, current_status=f'{filename} is an email file, extracting content and attachments...')
 
             try:
                 # Convert email to PDF (includes body + attachment cover sheets)
-                pdf_bytes, separate_attachments = process_email_file(file_data, filename)
+                pdf_bytes, separate_attachments = process_email_file(file_data, filename,
+                                                                     get_email_config()['inline_images'])
 
                 # Save debug copy of the intermediate PDF (if enabled in config)
                 if is_debug_enabled():
@@ -347,46 +961,42 @@ def process_single_file(filename, file_data, session_id, save_locally=True):
                     debug_pdf_path = os.path.join(DEBUG_FOLDER, os.path.splitext(filename)[0] + "_email_debug.pdf")
                     with open(debug_pdf_path, 'wb') as debug_file:
                         debug_file.write(pdf_bytes)
-                    processing_status[session_id]['current_status'] = f'{filename} debug PDF saved to {debug_pdf_path}'
+                    shared_state.update_session(session_id, current_status=f'{filename} debug PDF saved to {debug_pdf_path}')
 
                 # Process the combined PDF through our normal pipeline
                 combined_content_parts = []
 
-                # First, convert the main email PDF to markdown
-                with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp_pdf:
-                    tmp_pdf.write(pdf_bytes)
-                    tmp_pdf_path = tmp_pdf.name
-
-                try:
-                    if needs_ocr(tmp_pdf_path):
-                        processing_status[session_id]['current_status'] = f'{filename} email body requires OCR...'
-                        email_content = ocr_pdf(tmp_pdf_path)
+                # First, convert the main email PDF to markdown (straight from memory)
+                with DocumentContext(data=pdf_bytes) as ctx:
+                    if needs_ocr(ctx):
+                        shared_state.update_session(session_id, current_status=f'{filename} email body requires OCR...')
+                        email_content = ocr_pdf(ctx)
                     else:
-                        with open(tmp_pdf_path, "rb") as stream:
-                            result = MarkItDown().convert_stream(stream)
-                            email_content = strip_westlaw_links(result.markdown)
-                finally:
-                    os.unlink(tmp_pdf_path)
+                        pdf_engine, _ = pick_engine('pdf', len(pdf_bytes), requested_engine)
+                        email_content = strip_westlaw_links(extract_pdf_text(ctx, pdf_engine))
 
                 combined_content_parts.append(email_content)
 
                 # Process any attachments that couldn't be embedded in the PDF
                 for i, attachment in enumerate(separate_attachments, 1):
                     att_filename = attachment['filename']
-                    att_data = attachment['data']
-                    att_ext = os.path.splitext(att_filename)[1].lower()
+                    # Attachments arrive as spooled files; load one at a time
+                    att_data = read_attachment(attachment)
+                    close_attachments([attachment])
+                    att_ext = route_extension(att_data, att_filename)
 
-                    processing_status[session_id]['current_status'] = f'{filename}: Processing attachment {i} ({att_filename})...'
+                    shared_state.update_session(session_id, current_status=f'{filename}: Processing attachment {i} ({att_filename})...')
 
                     try:
                         # Handle ZIP attachments specially
                         if att_ext == ".zip":
                             def status_cb(msg):
-                                processing_status[session_id]['current_status'] = f'{filename}: {msg}'
-                            att_content = process_zip_file(att_data, att_filename, status_cb)
+                                shared_state.update_session(session_id, current_status=f'{filename}: {msg}')
+                            att_content = process_zip_file(att_data, att_filename, status_cb, requested_engine)
                         else:
                             # Use the helper function for all other types
-                            att_content = convert_file_to_markdown(att_data, att_filename, is_data=True)
+                            att_content = convert_file_to_markdown(att_data, att_filename, is_data=True,
+                                                                   pdf_engine=requested_engine, ext=att_ext)
 
                         # Add attachment content with header
                         combined_content_parts.append(f"\n\n---\n\n# Begin Email Attachment {i}\n**Filename:** {att_filename}\n\n{att_content}")
@@ -399,121 +1009,392 @@ def process_single_file(filename, file_data, session_id, save_locally=True):
 
                 att_count = len(separate_attachments)
                 att_msg = f" with {att_count} attachment(s)" if att_count > 0 else ""
-                return {'type': 'success', 'message': f'{filename} converted successfully{att_msg}', 'file_id': file_id, 'filename': output_filename}
+                return {'type': 'success', 'message': f'{filename} converted successfully{att_msg}', 'file_id': file_id, 'filename': output_filename, 'route': 'email'}
 
             except Exception as email_err:
-                return {'type': 'error', 'message': f'{filename} email processing failed: {str(email_err)}'}
+                return {'type': 'error', 'message': f'{filename} email processing failed: {str(email_err)}', 'route': 'email'}
+
+        # Images (including multi-page TIFFs) are OCR'd directly
+        if ext in IMAGE_EXTENSIONS:
+            shared_state.update_session(session_id, current_status=f'{filename} is an image, performing OCR...')
+            ocr_to_output(lambda out, progress: run_image_ocr(file_data, out, progress))
+            return {'type': 'success', 'message': f'{filename} converted successfully (via OCR)', 'file_id': file_id, 'filename': output_filename, 'route': 'image_ocr'}
 
         # Handle PDFs specially
         if ext == ".pdf":
-            if needs_ocr(input_path):
-                processing_status[session_id]['current_status'] = f'{filename} appears to be a scanned PDF, performing OCR...'
-                content = ocr_pdf(input_path)
-                save_output(content)
-                return {'type': 'success', 'message': f'{filename} converted successfully (via OCR)', 'file_id': file_id, 'filename': output_filename}
-            else:
-                # Try regular text extraction first with MarkItDown
-                try:
-                    with open(input_path, "rb") as stream:
-                        result = MarkItDown().convert_stream(stream)
-                        content = strip_westlaw_links(result.markdown)
+            with DocumentContext(data=file_data) as ctx:
+                if needs_ocr(ctx):
+                    shared_state.update_session(session_id, current_status=f'{filename} appears to be a scanned PDF, performing OCR...')
+                    ocr_to_output(lambda out, progress, first_page, continued:
+                                  ocr_pdf(ctx, out, progress, range(first_page, ctx.page_count), continued=continued),
+                                  resumable=True)
+                    return {'type': 'success', 'message': f'{filename} converted successfully (via OCR)', 'file_id': file_id, 'filename': output_filename, 'route': 'pdf_ocr'}
+                else:
+                    pdf_engine, engine_reason = pick_engine('pdf', len(file_data), requested_engine)
+
+                    # Borderline text layer: race text extraction against OCR of the first pages
+                    if get_ocr_config()['speculative'] and has_thin_text_layer(ctx):
+                        shared_state.update_session(session_id, current_status=f'{filename} has a thin text layer, trying text extraction and OCR together...')
+                        winner = []
+                        ocr_to_output(lambda out, progress: winner.append(speculative_pdf_text(ctx, pdf_engine, out, progress)))
+                        if winner[0] == 'text':
+                            return {'type': 'success', 'message': f'{filename} converted successfully (text extraction)', 'file_id': file_id, 'filename': output_filename, 'route': 'pdf_text', 'engine': pdf_engine, 'engine_reason': engine_reason}
+                        return {'type': 'success', 'message': f'{filename} converted successfully (via OCR)', 'file_id': file_id, 'filename': output_filename, 'route': 'pdf_ocr_speculative'}
+
+                    def shard_progress(shards):
+                        done = sum(1 for shard in shards if shard['state'] == 'done')
+                        shared_state.update_session(
+                            session_id, shards=shards,
+                            current_status=f'{filename}: converted {done} of {len(shards)} page shards...')
+
+                    # Try regular text extraction first with the selected engine
+                    try:
+                        content = strip_westlaw_links(extract_pdf_text(ctx, pdf_engine, shard_progress))
 
                         # Check if we got meaningful content
                         if len(content.strip()) < 50:
                             raise Exception("Extracted text too short, trying OCR")
 
+                        shared_state.clear_fields(session_id, 'shards')
                         save_output(content)
-                        return {'type': 'success', 'message': f'{filename} converted successfully (text extraction)', 'file_id': file_id, 'filename': output_filename}
-                except:
-                    # Fall back to OCR
-                    processing_status[session_id]['current_status'] = f'{filename} text extraction failed, trying OCR...'
-                    content = ocr_pdf(input_path)
-                    save_output(content)
-                    return {'type': 'success', 'message': f'{filename} converted successfully (via OCR fallback)', 'file_id': file_id, 'filename': output_filename}
-        
-        # Check if this is actually an RTF file (common with Westlaw .doc files)
-        actual_format = None
-        if is_rtf_file(input_path):
-            actual_format = "rtf"
-            processing_status[session_id]['current_status'] = f'{filename} detected as RTF format'
-        
-        # Try Pandoc first for non-PDF files
-        if ext in PANDOC_FORMATS or actual_format == "rtf":
+                        return {'type': 'success', 'message': f'{filename} converted successfully (text extraction)', 'file_id': file_id, 'filename': output_filename, 'route': 'pdf_text', 'engine': pdf_engine, 'engine_reason': engine_reason}
+                    except:
+                        # Fall back to OCR
+                        shared_state.clear_fields(session_id, 'shards')
+                        FALLBACKS.inc(from_engine=pdf_engine, to_engine='ocr')
+                        shared_state.update_session(session_id, current_status=f'{filename} text extraction failed, trying OCR...')
+                        ocr_to_output(lambda out, progress, first_page, continued:
+                                      ocr_pdf(ctx, out, progress, range(first_page, ctx.page_count), continued=continued),
+                                      resumable=True)
+                        return {'type': 'success', 'message': f'{filename} converted successfully (via OCR fallback)', 'file_id': file_id, 'filename': output_filename, 'route': 'pdf_ocr_fallback'}
+
+        # Try Pandoc first for the formats it reads, unless the routing table prefers MarkItDown
+        engine, engine_reason = 'markitdown', 'default'
+        if ext in PANDOC_FORMATS:
+            engine, engine_reason = pick_engine(PANDOC_FORMATS[ext], len(file_data))
+        if engine == 'pandoc':
             try:
-                # Use detected format if available, otherwise use extension-based format
-                input_format = actual_format or ext[1:]
-                
-                pandoc_output = subprocess.run(
-                    ["pandoc", input_path, "-f", input_format, "-t", "markdown"],
-                    capture_output=True,
-                    check=True,
-                    text=True
-                )
-                cleaned = strip_westlaw_links(pandoc_output.stdout)
+                input_format = PANDOC_FORMATS[ext]
+
+                cleaned = strip_westlaw_links(run_pandoc(file_data, input_format))
                 save_output(cleaned)
                 return {'type': 'success', 'message': f'{filename} converted successfully' +
-                          (f' (as {input_format})' if actual_format else ''), 'file_id': file_id, 'filename': output_filename}
-            except subprocess.CalledProcessError as e:
+                          (f' (as {input_format})' if misrouted else ''), 'file_id': file_id, 'filename': output_filename, 'route': 'pandoc', 'engine': 'pandoc', 'engine_reason': engine_reason}
+            except (subprocess.CalledProcessError, OSError) as e:
+                # OSError: pandoc is missing or could not be started
                 error_msg = f"Pandoc failed on {filename}"
-                if e.stderr:
-                    error_msg += f": {e.stderr[:100]}"
-                processing_status[session_id]['current_status'] = error_msg + ", falling back to MarkItDown"
+                detail = e.stderr if isinstance(e, subprocess.CalledProcessError) else str(e)
+                if detail:
+                    error_msg += f": {detail[:100]}"
+                shared_state.update_session(session_id, current_status=error_msg + ", falling back to MarkItDown")
+                FALLBACKS.inc(from_engine='pandoc', to_engine='markitdown')
+                engine_reason = 'fallback'
         
         # Fallback to MarkItDown
-        with open(input_path, "rb") as stream:
-            result = MarkItDown().convert_stream(stream)
-            content = strip_westlaw_links(result.markdown)
+        content = strip_westlaw_links(run_markitdown(io.BytesIO(file_data)))
 
         save_output(content)
-        return {'type': 'success', 'message': f'{filename} converted successfully (via MarkItDown)', 'file_id': file_id, 'filename': output_filename}
+        return {'type': 'success', 'message': f'{filename} converted successfully (via MarkItDown)', 'file_id': file_id, 'filename': output_filename, 'route': 'markitdown', 'engine': 'markitdown', 'engine_reason': engine_reason}
         
     except Exception as e:
         return {'type': 'error', 'message': f'{filename} failed to convert: {str(e)}'}
-        
-    finally:
-        # Clean up temp file
-        if os.path.exists(input_path):
-            os.remove(input_path)
+
+def queue_full(incoming):
+    """The 429 response for an upload over the admission limits, or None to accept it."""
+    totals = shared_state.queue_totals()
+    rejected = over_limit(totals, incoming, get_queue_config())
+    if rejected is None:
+        return None
+    limit, share = rejected
+    ADMISSION_REJECTED.inc(limit=limit)
+    seconds = retry_after(totals['jobs'], share, shared_state.recent_throughput(THROUGHPUT_WINDOW))
+    response = jsonify({'error': f'The converter is busy ({totals["jobs"]} files in the queue). '
+                                 f'Please try again in {format_eta(seconds)}.',
+                        'limit': limit, 'retry_after': seconds})
+    return response, 429, {'Retry-After': str(seconds)}
 
 @app.route("/process", methods=["POST"])
 def process_files():
     """Process files and return a session ID for status polling."""
+    # Turn away an upload the queue cannot take before reading it (the length includes form overhead)
+    rejected = queue_full({'jobs': 1, 'bytes': request.content_length or 0})
+    if rejected:
+        return rejected
+
     files = request.files.getlist("files")
     session_id = str(uuid.uuid4())
-    
+
+    # Determine if this is a local request (must capture now, while the request is available)
+    save_locally = is_local_request()
+
+    # Save the files so the queue survives a restart, and size them up for the admission limits
+    os.makedirs(JOBS_FOLDER, exist_ok=True)
+    jobs = []
+    incoming = {'jobs': len(files), 'bytes': 0, 'ocr_pages': 0}
+    for index, file in enumerate(files):
+        job_id = str(uuid.uuid4())
+        input_path = os.path.join(JOBS_FOLDER, job_id)
+        file.save(input_path)
+        estimate = estimate_job(input_path, file.filename)
+        incoming['bytes'] += estimate['bytes']
+        incoming['ocr_pages'] += estimate['ocr_pages']
+        jobs.append((job_id, index, file.filename, input_path, estimate))
+
+    rejected = queue_full(incoming)
+    if rejected:
+        for job in jobs:
+            os.remove(job[3])
+        return rejected
+
     # Initialize status
-    processing_status[session_id] = {
+    shared_state.create_session(session_id, {
         'total': len(files),
         'current': 0,
         'results': [],
         'current_status': 'Starting conversion...',
-        'complete': False
-    }
-    
-    # Save files for processing
-    file_data_list = []
-    for file in files:
-        file_data_list.append((file.filename, file.read()))
+        'complete': False,
+        'profile': request.form.get('profile') == '1',
+        'pdf_engine': request.form.get('pdf_engine') if request.form.get('pdf_engine') in PDF_ENGINES + ('auto',) else None
+    })
 
-    # Determine if this is a local request (must capture now, before thread starts)
-    save_locally = is_local_request()
+    for job_id, index, filename, input_path, estimate in jobs:
+        shared_state.add_job(job_id, session_id, index, filename, input_path, save_locally,
+                             estimate['bytes'], estimate['ocr_pages'], estimate['seconds'])
+
+    if not files:
+        shared_state.update_session(session_id, complete=True, current_status='All files converted!')
+    if job_runner is not None:
+        job_runner.wake()
 
-    # Process files in background
-    def process_all():
-        for index, (filename, data) in enumerate(file_data_list):
-            processing_status[session_id]['current'] = index + 1
-            processing_status[session_id]['current_status'] = f'Processing {filename}...'
+    return jsonify({'session_id': session_id})
 
-            result = process_single_file(filename, data, session_id, save_locally)
-            processing_status[session_id]['results'].append(result)
+def job_started(job, current_status):
+    """Show a job as its session's current file.
 
-        processing_status[session_id]['complete'] = True
-        processing_status[session_id]['current_status'] = 'All files converted!'
+    Short files are started first, not in upload order, so the file number counts the finished ones.
+    """
+    session = shared_state.get_session(job['session_id']) or {}
+    done = session.get('total', 0) - shared_state.pending_jobs(job['session_id'])
+    shared_state.update_session(job['session_id'], current=done + 1, current_status=current_status)
+    return session
+
+def run_queued_job(job):
+    """Convert one uploaded file from the job queue (see job_queue)."""
+    job_started(job, f"Processing {job['filename']}...")
+    with open(job['input_path'], 'rb') as f:
+        file_data = f.read()
+    return process_single_file(job['filename'], file_data, job['session_id'], job['save_locally'], job['id'])
+
+def queued_job_done(job, result):
+    """Add a finished job's result to its session, and mark the session complete after its last file."""
+    shared_state.append_result(job['session_id'], result)
+    if os.path.exists(job['input_path']):
+        os.remove(job['input_path'])
+    if not shared_state.pending_jobs(job['session_id']):
+        shared_state.update_session(job['session_id'], complete=True, current_status='All files converted!')
+
+def start_job_runner():
+    """Start converting queued uploads in this process, including jobs interrupted by a restart."""
+    global job_runner
+    job_runner = JobRunner(shared_state, run_queued_job, queued_job_done,
+                           workers=get_server_config()['job_workers'])
+    job_runner.start()
+
+def run_remote_job(job, file_data, report):
+    """Convert a job taken from a coordinator (worker mode) with process_single_file.
+
+    Progress recorded in this instance's session is relayed to the
+    coordinator while the conversion runs.
 
-    thread = threading.Thread(target=process_all)
-    thread.start()
-    
-    return jsonify({'session_id': session_id})
+    Returns:
+        tuple: (result dict, path of the markdown output or None)
+    """
+    shared_state.purge_expired()  # Outputs already sent to the coordinator
+    session_id = str(uuid.uuid4())
+    shared_state.create_session(session_id, {
+        'total': 1,
+        'current': 1,
+        'results': [],
+        'current_status': f"Processing {job['filename']}...",
+        'complete': False,
+        'profile': job.get('profile', False),
+        'pdf_engine': job.get('pdf_engine')
+    })
+    done = threading.Event()
+
+    def relay_progress():
+        sent = None
+        while not done.wait(1):
+            status = shared_state.get_session(session_id) or {}
+            fields = {'current_status': status.get('current_status'), 'ocr_progress': status.get('ocr_progress')}
+            if fields != sent:
+                report(**fields)
+                sent = fields
+
+    threading.Thread(target=relay_progress, daemon=True).start()
+    try:
+        result = process_single_file(job['filename'], file_data, session_id, save_locally=False, job_id=job['id'])
+    finally:
+        done.set()
+        shared_state.delete_session(session_id)
+        shared_state.delete_checkpoints(job['id'])
+    artifact = shared_state.get_artifact(result['file_id']) if result.get('file_id') else None
+    if artifact:
+        # The coordinator gets the file; drop our copy the next time expired files are purged
+        shared_state.expire_artifact(result['file_id'], DOWNLOAD_KEEP_SECONDS)
+    return result, artifact['path'] if artifact else None
+
+def publish_metrics():
+    """Store this process's counters for /metrics, which may be answered by any server process."""
+    global _metrics_key
+    if _metrics_key[0] != os.getpid():
+        _metrics_key = (os.getpid(), f"{METRICS_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}")
+    shared_state.put_value(_metrics_key[1], metrics_snapshot())
+
+def start_metrics_publisher():
+    def publish_forever():
+        while True:
+            try:
+                publish_metrics()
+            except Exception as e:
+                print(f"Publishing metrics failed: {e}")
+            time.sleep(METRICS_PUBLISH_INTERVAL)
+
+    threading.Thread(target=publish_forever, daemon=True).start()
+
+def start_background_workers():
+    """Start the job runner, the hot-folder watcher and the metrics publisher (once per server process)."""
+    start_job_runner()
+    start_hot_folder_watcher()
+    start_metrics_publisher()
+
+def process_watched_file(path):
+    """Convert a file picked up by the hot-folder watcher into OUTPUT_FOLDER."""
+    filename = os.path.basename(path)
+    with open(path, 'rb') as f:
+        file_data = f.read()
+
+    session_id = str(uuid.uuid4())
+    shared_state.create_session(session_id, {
+        'total': 1,
+        'current': 1,
+        'results': [],
+        'current_status': f'Processing {filename}...',
+        'complete': False
+    })
+    try:
+        return process_single_file(filename, file_data, session_id, save_locally=True)
+    finally:
+        shared_state.delete_session(session_id)
+
+@app.route("/profiling", methods=["GET", "POST"])
+def profiling_settings():
+    """View or change job profiling at runtime (changes are local-only and apply to every server process).
+
+    POST a JSON body with any of: enabled (bool or null to use config),
+    extensions (e.g. [".pdf", ".msg"]), mode ("sampling" or "cprofile").
+    """
+    if request.method == "POST":
+        if not is_local_request():
+            return jsonify({'error': 'Profiling can only be changed from this computer'}), 403
+        body = request.get_json(silent=True) or {}
+        changes = {}
+        if 'enabled' in body:
+            changes['enabled'] = body['enabled']
+        if 'extensions' in body:
+            extensions = body['extensions']
+            changes['extensions'] = None if extensions is None else [
+                e.lower() if e.startswith('.') else '.' + e.lower() for e in extensions]
+        if 'mode' in body:
+            if body['mode'] not in profiling.PROFILE_MODES + (None,):
+                return jsonify({'error': f"mode must be one of {', '.join(profiling.PROFILE_MODES)}"}), 400
+            changes['mode'] = body['mode']
+        profiling.update_runtime_settings(shared_state, **changes)
+
+    settings = profiling.resolve_settings(get_profiling_config(), shared_state)
+    settings['output_folder'] = DEBUG_FOLDER
+    return jsonify(settings)
+
+@app.route("/watch/status", methods=["GET"])
+def watch_status():
+    """Get hot-folder queue depth and latency statistics."""
+    stats = watch_stats()
+    if stats is None:
+        return jsonify({'enabled': False})
+    return jsonify(stats)
+
+def watch_stats():
+    """Hot-folder statistics from whichever server process runs the watcher, or None if none does."""
+    if hot_folder_watcher is not None:
+        return hot_folder_watcher.stats()
+    return shared_state.get_value('watch_stats', max_age=WATCH_STATS_MAX_AGE)
+
+def publish_watch_stats():
+    """Share the watcher's statistics with the other server processes (runs in a daemon thread)."""
+    while True:
+        try:
+            shared_state.put_value('watch_stats', hot_folder_watcher.stats())
+        except Exception:
+            pass  # Database busy; try again next time
+        time.sleep(WATCH_STATS_INTERVAL)
+
+def start_hot_folder_watcher():
+    """Start the hot-folder watcher if enabled in config.
+
+    Runs in every server process; only the first to take the watch lock
+    starts the watcher, so each file is converted once. When that process
+    exits, the lock is released and the next worker to start takes over.
+    """
+    global hot_folder_watcher, _watch_lock
+    watch_config = get_watch_config()
+    if not (watch_config['enabled'] and watch_config['folders']):
+        return
+    _watch_lock = try_lock(shared_state.path + '.watch.lock')
+    if _watch_lock is None:
+        return
+    hot_folder_watcher = FolderWatcher(
+        watch_config['folders'],
+        process_watched_file,
+        settle_seconds=watch_config['settle_seconds'],
+        poll_interval=watch_config['poll_interval'],
+        max_workers=watch_config['max_workers'],
+        processed_subfolder=watch_config['processed_subfolder']
+    )
+    hot_folder_watcher.start()
+    threading.Thread(target=publish_watch_stats, daemon=True).start()
+
+def queue_depths():
+    """Files waiting for conversion, for the lmc_queue_depth gauge."""
+    waiting = 0
+    for status in shared_state.sessions():
+        if not status.get('complete'):
+            waiting += max(0, status.get('total', 0) - status.get('current', 0))
+    depths = {('sessions',): waiting}
+    stats = watch_stats()
+    if stats is not None:
+        depths[('hot_folder',)] = stats['queued'] + stats['settling']
+    return depths
+
+QUEUE_DEPTH.set_callback(queue_depths)
+
+@app.before_request
+def start_request_timer():
+    request.start_time = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    start = getattr(request, 'start_time', None)
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint,
+                                     method=request.method, status=response.status_code)
+    return response
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Expose conversion metrics of all server processes in Prometheus text format."""
+    publish_metrics()
+    return render_metrics(shared_state.values(METRICS_KEY_PREFIX)), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
 def is_local_request():
     """Check if the request is from localhost."""
@@ -523,55 +1404,186 @@ def is_local_request():
 @app.route("/status/<session_id>", methods=["GET"])
 def get_status(session_id):
     """Get the current processing status."""
-    if session_id not in processing_status:
+    shared_state.purge_expired()
+    status = shared_state.get_session(session_id)
+    if status is None:
         return jsonify({'error': 'Invalid session ID'}), 404
 
-    status = processing_status[session_id].copy()
-
     # Add flag indicating if this is a local request (files saved locally)
     status['is_local'] = is_local_request()
+    # Files of other uploads that will be started before this session's next file (None once none is waiting)
+    status['queue_position'] = shared_state.queue_position(session_id)
 
-    # Clean up completed sessions after returning status
+    # Keep completed sessions for a while after they are first reported, then clean up
     if status['complete']:
-        # Return status one last time before cleanup
-        response = jsonify(status)
-        # Clean up after a delay
-        def cleanup():
-            time.sleep(30)  # Keep session alive for 30 seconds after completion
-            if session_id in processing_status:
-                del processing_status[session_id]
-        threading.Thread(target=cleanup).start()
-        return response
+        shared_state.expire_session(session_id, SESSION_KEEP_SECONDS)
 
     return jsonify(status)
 
+@app.route("/trace/<trace_id>", methods=["GET"])
+def get_trace(trace_id):
+    """Get the recorded span timeline for a conversion."""
+    if not re.fullmatch(r'[0-9a-f-]{36}', trace_id):
+        return jsonify({'error': 'Invalid trace ID'}), 400
+    spans = load_trace(TRACE_FOLDER, trace_id)
+    if spans is None:
+        return jsonify({'error': 'Trace not found'}), 404
+    return jsonify({'trace_id': trace_id, 'spans': spans})
+
 @app.route("/download/<file_id>", methods=["GET"])
 def download_file(file_id):
     """Download a converted file."""
-    if file_id not in converted_files:
+    shared_state.purge_expired()
+    file_data = shared_state.get_artifact(file_id)
+    if file_data is None or not os.path.exists(file_data['path']):
         return jsonify({'error': 'File not found'}), 404
-    
-    file_data = converted_files[file_id]
-    
-    # Create a temporary file to send
-    temp_file = io.BytesIO()
-    temp_file.write(file_data['content'].encode('utf-8'))
-    temp_file.seek(0)
-    
-    # Clean up after sending
-    def cleanup():
-        time.sleep(60)  # Keep file available for 60 seconds
-        if file_id in converted_files:
-            del converted_files[file_id]
-    threading.Thread(target=cleanup).start()
-    
+
+    # Keep the file available for a while after the first download, then clean up
+    shared_state.expire_artifact(file_id, DOWNLOAD_KEEP_SECONDS)
+
     return send_file(
-        temp_file,
+        file_data['path'],
         as_attachment=True,
         download_name=file_data['filename'],
         mimetype='text/markdown'
     )
 
+# Coordinator side of the worker protocol (see worker_client)
+
+# Registered workers not heard from for this long are no longer listed
+WORKER_LIST_MAX_AGE = 60
+
+def worker_request_allowed():
+    """Check the worker token. Without a configured token the worker API is off, since it hands out every upload."""
+    token = get_server_config()['worker_token']
+    return bool(token) and hmac.compare_digest(request.headers.get('X-Worker-Token', ''), token)
+
+def assigned_job(worker_id, job_id):
+    """The job if it is still running on ``worker_id``, else None (it was reassigned)."""
+    job = shared_state.get_job(job_id)
+    if job is None or job['state'] != 'running' or job['worker'] != worker_id:
+        return None
+    return job
+
+def remote_output_path(job, output_filename):
+    """Where a remote worker's output goes: the output folder, or the results folder for download."""
+    if job['save_locally']:
+        return os.path.join(OUTPUT_FOLDER, output_filename)
+    os.makedirs(RESULTS_FOLDER, exist_ok=True)
+    # Not the worker's own file name, in case the worker runs on this machine
+    return os.path.join(RESULTS_FOLDER, job['id'] + ".remote.md")
+
+@app.route("/workers", methods=["GET"])
+def list_workers():
+    """Remote workers converting jobs from this instance's queue (names and addresses, so behind the worker token)."""
+    if not worker_request_allowed():
+        return jsonify({'error': 'Invalid worker token (remote workers need "worker_token" set on the coordinator)'}), 403
+    return jsonify({'workers': shared_state.workers(WORKER_LIST_MAX_AGE), 'queued': shared_state.pending_jobs()})
+
+@app.route("/workers/register", methods=["POST"])
+def register_worker():
+    if not worker_request_allowed():
+        return jsonify({'error': 'Invalid worker token (remote workers need "worker_token" set on the coordinator)'}), 403
+    body = request.get_json(silent=True) or {}
+    worker_id = str(uuid.uuid4())
+    shared_state.register_worker(worker_id, str(body.get('name') or request.remote_addr),
+                                 body.get('address') or request.remote_addr, int(body.get('slots') or 1))
+    return jsonify({'worker_id': worker_id})
+
+@app.route("/workers/<worker_id>/heartbeat", methods=["POST"])
+def worker_heartbeat(worker_id):
+    if not worker_request_allowed():
+        return jsonify({'error': 'Invalid worker token (remote workers need "worker_token" set on the coordinator)'}), 403
+    if shared_state.get_worker(worker_id) is None:
+        return jsonify({'error': 'Unknown worker'}), 404
+    body = request.get_json(silent=True) or {}
+    shared_state.heartbeat(worker_id, body.get('jobs', []))
+    return jsonify({'ok': True})
+
+@app.route("/workers/<worker_id>/claim", methods=["POST"])
+def worker_claim(worker_id):
+    if not worker_request_allowed():
+        return jsonify({'error': 'Invalid worker token (remote workers need "worker_token" set on the coordinator)'}), 403
+    if shared_state.get_worker(worker_id) is None:
+        return jsonify({'error': 'Unknown worker'}), 404
+    max_cost = (request.get_json(silent=True) or {}).get('max_cost')
+    while True:
+        job = shared_state.claim_job(worker_id, max_cost)
+        if job is None:
+            return '', 204
+        exhausted = attempts_exhausted(job)
+        if exhausted is None:
+            break
+        if shared_state.finish_job(job['id'], exhausted, failed=True, worker=worker_id):
+            queued_job_done(job, exhausted)
+    session = job_started(job, f"Processing {job['filename']} on {shared_state.get_worker(worker_id)['name']}...")
+    return jsonify({'id': job['id'], 'filename': job['filename'], 'attempts': job['attempts'],
+                    'profile': session.get('profile', False), 'pdf_engine': session.get('pdf_engine')})
+
+@app.route("/workers/<worker_id>/jobs/<job_id>/input", methods=["GET"])
+def worker_job_input(worker_id, job_id):
+    if not worker_request_allowed():
+        return jsonify({'error': 'Invalid worker token (remote workers need "worker_token" set on the coordinator)'}), 403
+    job = assigned_job(worker_id, job_id)
+    if job is None:
+        return jsonify({'error': 'Job is not assigned to this worker'}), 409
+    return send_file(job['input_path'], mimetype='application/octet-stream')
+
+@app.route("/workers/<worker_id>/jobs/<job_id>/status", methods=["POST"])
+def worker_job_status(worker_id, job_id):
+    if not worker_request_allowed():
+        return jsonify({'error': 'Invalid worker token (remote workers need "worker_token" set on the coordinator)'}), 403
+    job = assigned_job(worker_id, job_id)
+    if job is None:
+        return jsonify({'error': 'Job is not assigned to this worker'}), 409
+    body = request.get_json(silent=True) or {}
+    if body.get('current_status'):
+        shared_state.update_session(job['session_id'], current_status=body['current_status'])
+    if body.get('ocr_progress'):
+        shared_state.update_session(job['session_id'], ocr_progress=body['ocr_progress'])
+    else:
+        shared_state.clear_fields(job['session_id'], 'ocr_progress')
+    return jsonify({'ok': True})
+
+@app.route("/workers/<worker_id>/jobs/<job_id>/output", methods=["PUT"])
+def worker_job_output(worker_id, job_id):
+    """Receive a job's markdown, streamed straight to its output file."""
+    if not worker_request_allowed():
+        return jsonify({'error': 'Invalid worker token (remote workers need "worker_token" set on the coordinator)'}), 403
+    job = assigned_job(worker_id, job_id)
+    if job is None:
+        return jsonify({'error': 'Job is not assigned to this worker'}), 409
+    path = remote_output_path(job, os.path.splitext(job['filename'])[0] + ".md")
+    with open(path + ".part", 'wb') as f_out:
+        while True:
+            block = request.stream.read(1024 * 1024)
+            if not block:
+                break
+            f_out.write(block)
+    os.replace(path + ".part", path)
+    return jsonify({'ok': True})
+
+@app.route("/workers/<worker_id>/jobs/<job_id>/result", methods=["POST"])
+def worker_job_result(worker_id, job_id):
+    if not worker_request_allowed():
+        return jsonify({'error': 'Invalid worker token (remote workers need "worker_token" set on the coordinator)'}), 403
+    job = assigned_job(worker_id, job_id)
+    if job is None:
+        return jsonify({'error': 'Job is not assigned to this worker'}), 409
+    result = request.get_json(silent=True) or {}
+    # Timelines and profiles stay on the worker
+    result.pop('trace_id', None)
+    result.pop('profile_files', None)
+    result['worker'] = shared_state.get_worker(worker_id)['name']
+    if result.get('file_id'):
+        result['file_id'] = job_id
+        if not job['save_locally']:
+            shared_state.put_artifact(job_id, result['filename'], remote_output_path(job, result['filename']))
+    if not shared_state.finish_job(job_id, result, failed=result.get('type') == 'error', worker=worker_id):
+        return jsonify({'error': 'Job is not assigned to this worker'}), 409
+    queued_job_done(job, result)
+    return jsonify({'ok': True})
+
 @app.route("/", methods=["GET"])
 def index():
     html = """
@@ -798,6 +1810,21 @@ def index():
           margin-right: 0.75rem;
         }
         
+        .engine-select {
+          margin-bottom: 1.5rem;
+          font-size: 0.85rem;
+          color: #888;
+        }
+
+        .engine-select select {
+          margin-left: 0.5rem;
+          background: rgba(255, 255, 255, 0.05);
+          color: #e0e0e0;
+          border: 1px solid rgba(255, 255, 255, 0.1);
+          border-radius: 6px;
+          padding: 0.25rem 0.5rem;
+        }
+
         .submit-button {
           background: linear-gradient(135deg, #387c2b 0%, #5cb85c 100%);
           color: white;
@@ -867,6 +1894,12 @@ def index():
           font-size: 0.9rem;
           color: #888;
         }
+
+        .watch-status {
+          margin-top: 1rem;
+          font-size: 0.85rem;
+          color: #74c0fc;
+        }
         
         .results {
           margin-top: 2.5rem;
@@ -962,6 +1995,61 @@ def index():
           border-color: rgba(92, 184, 92, 0.5);
         }
         
+        .timeline-link + .download-link {
+          margin-left: 0.5rem;
+        }
+
+        .engine-tag {
+          margin-left: 0.75rem;
+          color: #888;
+          font-size: 0.75rem;
+        }
+
+        .timeline {
+          margin: -0.25rem 0 0.75rem;
+          padding: 0.75rem 1rem;
+          background: rgba(255, 255, 255, 0.03);
+          border: 1px solid rgba(255, 255, 255, 0.08);
+          border-radius: 10px;
+          font-size: 0.75rem;
+        }
+
+        .timeline-row {
+          display: flex;
+          align-items: center;
+          margin-bottom: 3px;
+        }
+
+        .timeline-label {
+          width: 45%;
+          padding-right: 0.5rem;
+          white-space: nowrap;
+          overflow: hidden;
+          text-overflow: ellipsis;
+          color: #aaa;
+        }
+
+        .timeline-track {
+          position: relative;
+          flex: 1;
+          height: 10px;
+          background: rgba(255, 255, 255, 0.05);
+          border-radius: 3px;
+        }
+
+        .timeline-bar {
+          position: absolute;
+          top: 0;
+          height: 100%;
+          min-width: 1px;
+          background: linear-gradient(90deg, #387c2b 0%, #5cb85c 100%);
+          border-radius: 3px;
+        }
+
+        .timeline-bar.error {
+          background: #ff6b6b;
+        }
+
         .reset-button {
           display: block;
           margin: 1rem auto 0;
@@ -1131,6 +2219,16 @@ def index():
           </div>
           
           <input id="file-upload" type="file" name="files" multiple onchange="showFileNames(this)">
+
+          <div class="engine-select">
+            <label for="pdf-engine">PDF text engine:</label>
+            <select id="pdf-engine" name="pdf_engine">
+              <option value="">Default</option>
+              <option value="markitdown">MarkItDown</option>
+              <option value="pymupdf">PyMuPDF (faster)</option>
+              <option value="auto">Auto (fastest measured)</option>
+            </select>
+          </div>
           
           <div class="file-list">
             <ul id="selected-files"></ul>
@@ -1144,6 +2242,7 @@ def index():
           <div class="progress-fill" id="progress-fill"></div>
         </div>
         <div class="progress-text" id="progress-text"></div>
+        <div class="watch-status hidden" id="watch-status"></div>
         
         <div class="results hidden" id="results">
           <h2>Conversion Results</h2>
@@ -1281,9 +2380,13 @@ def index():
           window.location.href = "/";
         }
         
+        function escapeHtml(value) {
+          return String(value ?? '').replace(/[&<>"']/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c]));
+        }
+
         function downloadFile(fileId, filename) {
           const link = document.createElement('a');
-          link.href = `/download/${fileId}`;
+          link.href = `/download/${encodeURIComponent(fileId)}`;
           link.download = filename;
           document.body.appendChild(link);
           link.click();
@@ -1296,9 +2399,20 @@ def index():
 
           let content = `
             <span class='result-icon'>${icons[result.type] || '•'}</span>
-            <span>${result.message}</span>
+            <span>${escapeHtml(result.message)}</span>
           `;
 
+          // Which engine converted the file, and whether the routing table picked it
+          if (result.engine) {
+            const how = result.engine_reason === 'calibrated' ? ', auto' : result.engine_reason === 'fallback' ? ', fallback' : '';
+            content += `<span class="engine-tag">${escapeHtml(result.engine)}${how}</span>`;
+          }
+
+          // Span timeline for diagnosing slow conversions
+          if (result.trace_id) {
+            content += `<a href="#" class="download-link timeline-link">Timeline</a>`;
+          }
+
           // For successful conversions, show different UI based on local vs remote
           if (result.type === 'success' && result.file_id) {
             if (isLocalRequest) {
@@ -1306,11 +2420,20 @@ def index():
               content += `<span class="download-link" style="cursor: default; opacity: 0.7;">Saved to folder</span>`;
             } else {
               // Remote user - show download button
-              content += `<a href="#" class="download-link" onclick="downloadFile('${result.file_id}', '${result.filename}'); return false;">Download</a>`;
+              content += `<a href="#" class="download-link download-button">Download</a>`;
             }
           }
 
           resultItem.innerHTML = content;
+          // Handlers are attached here rather than inline, so result fields never end up in markup
+          const timelineLink = resultItem.querySelector('.timeline-link');
+          if (timelineLink) {
+            timelineLink.addEventListener('click', (e) => { e.preventDefault(); toggleTimeline(result.trace_id, timelineLink); });
+          }
+          const downloadButton = resultItem.querySelector('.download-button');
+          if (downloadButton) {
+            downloadButton.addEventListener('click', (e) => { e.preventDefault(); downloadFile(result.file_id, result.filename); });
+          }
           resultsList.appendChild(resultItem);
 
           // Auto-download only for remote users
@@ -1324,9 +2447,75 @@ def index():
           resultsList.scrollTop = resultsList.scrollHeight;
         }
         
+        const MAX_TIMELINE_ROWS = 300;
+
+        async function toggleTimeline(traceId, link) {
+          const existing = document.getElementById(`timeline-${traceId}`);
+          if (existing) {
+            existing.remove();
+            return;
+          }
+
+          const response = await fetch(`/trace/${encodeURIComponent(traceId)}`);
+          const data = await response.json();
+          if (data.error) {
+            alert(data.error);
+            return;
+          }
+
+          const spans = data.spans;
+          const total = Math.max(...spans.map(s => s.start_ms + s.duration_ms)) || 1;
+          const depth = {};
+          const container = document.createElement('div');
+          container.className = 'timeline';
+          container.id = `timeline-${traceId}`;
+
+          spans.slice(0, MAX_TIMELINE_ROWS).forEach(s => {
+            depth[s.span_id] = s.parent_id ? (depth[s.parent_id] || 0) + 1 : 0;
+            const attrs = Object.entries(s.attrs || {}).map(([k, v]) => `${k}=${v}`).join(' ');
+
+            const row = document.createElement('div');
+            row.className = 'timeline-row';
+            row.title = `${s.name} ${attrs}${s.error ? ' - ' + s.error : ''}`;
+
+            const label = document.createElement('div');
+            label.className = 'timeline-label';
+            label.style.paddingLeft = (depth[s.span_id] * 0.75) + 'rem';
+            label.textContent = `${s.name} (${s.duration_ms.toFixed(1)} ms)`;
+
+            const track = document.createElement('div');
+            track.className = 'timeline-track';
+            const bar = document.createElement('div');
+            bar.className = 'timeline-bar' + (s.error ? ' error' : '');
+            bar.style.left = (s.start_ms / total * 100) + '%';
+            bar.style.width = (s.duration_ms / total * 100) + '%';
+            track.appendChild(bar);
+
+            row.appendChild(label);
+            row.appendChild(track);
+            container.appendChild(row);
+          });
+
+          if (spans.length > MAX_TIMELINE_ROWS) {
+            const more = document.createElement('div');
+            more.className = 'timeline-label';
+            more.textContent = `... ${spans.length - MAX_TIMELINE_ROWS} more spans in ${traceId}.jsonl`;
+            container.appendChild(more);
+          }
+
+          link.closest('.result-item').after(container);
+        }
+
         async function checkStatus(sessionId) {
+          let response;
+          try {
+            response = await fetch(`/status/${sessionId}`);
+          } catch (error) {
+            // Server restarting: queued and interrupted files resume once it is back
+            progressText.textContent = 'Waiting for the server to restart...';
+            return;
+          }
           try {
-            const response = await fetch(`/status/${sessionId}`);
             const data = await response.json();
 
             if (data.error) {
@@ -1339,7 +2528,12 @@ def index():
             // Update progress
             const percent = (data.current / data.total) * 100;
             progressFill.style.width = percent + '%';
-            progressText.textContent = data.current_status || 'Processing...';
+            if (data.queue_position) {
+              const ahead = data.queue_position;
+              progressText.textContent = `Waiting in the queue: ${ahead} file${ahead === 1 ? '' : 's'} from other uploads ahead of yours...`;
+            } else {
+              progressText.textContent = data.current_status || 'Processing...';
+            }
 
             // Add new results
             if (data.results.length > lastResultCount) {
@@ -1392,6 +2586,16 @@ def index():
           for (let i = 0; i < fileInput.files.length; i++) {
             formData.append('files', fileInput.files[i]);
           }
+
+          const pdfEngine = document.getElementById('pdf-engine').value;
+          if (pdfEngine) {
+            formData.append('pdf_engine', pdfEngine);
+          }
+
+          // Open the page with ?profile=1 to profile every file in this session
+          if (new URLSearchParams(window.location.search).get('profile') === '1') {
+            formData.append('profile', '1');
+          }
           
           try {
             // Send files for processing
@@ -1401,6 +2605,14 @@ def index():
             });
             
             const data = await response.json();
+
+            if (response.status === 429) {
+              // Queue full (see queue_full): nothing was queued
+              progressText.textContent = data.error;
+              submitButton.disabled = false;
+              submitButton.textContent = 'Convert to Markdown';
+              return;
+            }
             
             if (!data.session_id) {
               throw new Error('No session ID received');
@@ -1456,6 +2668,35 @@ def index():
           showFileNames(fileInput);
         }
 
+        // Hot-folder watcher statistics
+        const watchStatus = document.getElementById('watch-status');
+
+        async function checkWatchStatus() {
+          try {
+            const response = await fetch('/watch/status');
+            const data = await response.json();
+            if (!data.enabled) {
+              return false;
+            }
+            let text = `Hot folder (${data.backend}): ${data.queued} queued, ${data.active} converting, ` +
+                       `${data.completed} done, ${data.failed} failed`;
+            if (data.latency_avg !== undefined) {
+              text += ` \u2022 latency avg ${data.latency_avg}s, p95 ${data.latency_p95}s`;
+            }
+            watchStatus.textContent = text;
+            watchStatus.classList.remove('hidden');
+            return true;
+          } catch (error) {
+            return false;
+          }
+        }
+
+        checkWatchStatus().then(enabled => {
+          if (enabled) {
+            setInterval(checkWatchStatus, 2000);
+          }
+        });
+
         // Disclaimer modal functions
         function showDisclaimer() {
           document.getElementById('disclaimer-modal').classList.add('active');
@@ -1493,4 +2734,25 @@ def index():
     return render_template_string(html, local_ip=get_local_ip())
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5050)
+    server_config = get_server_config()
+    if server_config['mode'] == 'worker':
+        worker_config = get_worker_config()
+        if not worker_config['coordinator']:
+            sys.exit('Worker mode needs "worker": {"coordinator": "http://<host>:5050"} in config.json')
+        worker = RemoteWorker(worker_config['coordinator'], run_remote_job, name=worker_config['name'] or None,
+                              slots=worker_config['slots'], token=worker_config['token'] or None)
+        print(f"Converting jobs from {worker_config['coordinator']} as {worker.name}")
+        worker.run_forever()
+        sys.exit(0)
+
+    # Counters start from zero with each server start, as they would with a single process
+    shared_state.delete_values(METRICS_KEY_PREFIX)
+    if server_config['mode'] == 'production':
+        if serve(app, server_config['port'], server_config['workers'], server_config['threads'],
+                 on_worker_start=start_background_workers):
+            sys.exit(0)
+        print("Production mode needs gunicorn (macOS/Linux) or waitress (Windows): "
+              "pip install gunicorn / pip install waitress. Using the development server.")
+
+    start_background_workers()
+    app.run(host="0.0.0.0", port=server_config['port'])
@@ -0,0 +1,113 @@
+# Legal Markdown Converter - Direct Image OCR
+"""
+OCR for standalone images (.png, .jpg, .tif, ...) without converting them to a
+PDF first. Decoded frames go straight to Tesseract, so there is no
+image -> PDF -> pixmap -> image round trip.
+
+Multi-page TIFFs (common for fax and scanner output) are OCR'd frame by frame
+in a thread pool; Tesseract runs as a subprocess, so the frames really do run
+in parallel. Each worker opens its own handle on the image and decodes only
+its own frame.
+
+Usage:
+    text = ocr_image(image_bytes)
+    ocr_image("fax.tif", out=f, progress=lambda page, total, eta: ...)
+"""
+
+import os
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytesseract
+from PIL import Image
+
+from metrics import OCR_PAGES, OCR_PAGES_SKIPPED
+from page_classifier import is_blank_image, BLANK_MAX_INK_RATIO
+from ocr_preprocess import preprocess_page, HAS_NUMPY
+from tracing import span, set_attributes, run_in_context
+
+if HAS_NUMPY:
+    import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tif', '.tiff')
+
+
+def _open(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(source))
+    return Image.open(source)
+
+
+def frame_count(source):
+    """Number of frames (pages) in an image file."""
+    with _open(source) as img:
+        return getattr(img, "n_frames", 1)
+
+
+def _ocr_frame(source, index, preprocess_steps, skip_blank, max_ink_ratio):
+    """Decode one frame and OCR it. Runs in a worker thread."""
+    with span('ocr_page', page=index + 1):
+        with _open(source) as img:
+            img.seek(index)
+            frame = img.convert("L") if preprocess_steps or skip_blank else img.convert("RGB")
+
+        if skip_blank and is_blank_image(frame, max_ink_ratio):
+            OCR_PAGES_SKIPPED.inc(reason='blank')
+            set_attributes(source='blank')
+            return ""
+        if preprocess_steps and HAS_NUMPY:
+            frame = preprocess_page(np.asarray(frame), preprocess_steps)
+            if frame is None:
+                OCR_PAGES_SKIPPED.inc(reason='blank')
+                set_attributes(source='empty')
+                return ""
+
+        OCR_PAGES.inc()
+        return pytesseract.image_to_string(frame)
+
+
+def ocr_image(source, out=None, progress=None, preprocess_steps=None, skip_blank=True,
+              max_ink_ratio=BLANK_MAX_INK_RATIO, max_workers=None):
+    """OCR an image file, one "## Page N" section per frame.
+
+    Args:
+        source: Image bytes or a path
+        out: Optional text file object to stream the result into (returns None)
+        progress: Optional callback ``progress(page, total, eta_seconds)``
+        preprocess_steps: ocr_preprocess steps to apply (None = send frames as decoded)
+        skip_blank: Skip frames with no visible content
+        max_ink_ratio: Blank threshold (see page_classifier)
+        max_workers: Threads for multi-frame images (default: CPU count)
+
+    Returns:
+        str: The markdown text, or None when writing to ``out``
+    """
+    total = frame_count(source)
+    set_attributes(pages=total)
+    full_text = [] if out is None else None
+    pages_written = 0
+    started = time.monotonic()
+
+    workers = min(max_workers or os.cpu_count() or 1, total)
+    worker = run_in_context(_ocr_frame)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # map() yields in frame order, so pages are written in order as they finish
+        results = pool.map(lambda index: worker(source, index, preprocess_steps, skip_blank, max_ink_ratio),
+                           range(total))
+        for index, text in enumerate(results):
+            if text.strip():
+                page_text = f"## Page {index + 1}\n\n{text}" if total > 1 else text
+                if out is None:
+                    full_text.append(page_text)
+                else:
+                    out.write(("\n\n---\n\n" if pages_written else "") + page_text)
+                    out.flush()
+                pages_written += 1
+            if progress:
+                done = index + 1
+                progress(done, total, (time.monotonic() - started) / done * (total - done))
+
+    if out is not None:
+        return None
+    return "\n\n---\n\n".join(full_text)
@@ -0,0 +1,88 @@
+# Legal Markdown Converter - Job Cost Estimates
+"""
+Sizes up an uploaded file before it is queued, cheaply and without
+converting it: its bytes, its page count, how many of those pages will
+need OCR, and from those a rough run time. Admission control (see
+job_queue) uses the estimates to keep the OCR work waiting in the queue
+within what the machine can handle, and the queue starts the shortest jobs
+first (see StateStore.claim_job).
+
+- PDFs: the page count, and the share of scanned pages among up to
+  SAMPLE_PAGES pages spread over the document, scaled to the whole file
+- Images: every frame (TIFF page) is OCR'd
+- Everything else: no OCR pages. Emails and ZIP archives may contain scans,
+  but finding out means unpacking them, which is the conversion's job
+"""
+
+import os
+
+from document_context import DocumentContext
+from format_sniffer import sniff_format, resolve_extension
+from image_ocr import frame_count, IMAGE_EXTENSIONS
+
+# Pages of a PDF checked for a text layer
+SAMPLE_PAGES = 10
+
+# Rough seconds of work, for ordering the queue (only their ratios matter): per file, per OCR page,
+# per PDF page with a text layer, and per MB of other formats
+FILE_SECONDS = 0.5
+OCR_SECONDS_PER_PAGE = 3.0
+TEXT_SECONDS_PER_PAGE = 0.05
+SECONDS_PER_MB = 1.0
+# Emails and ZIP archives are unpacked and their attachments converted, some of them by OCR
+CONTAINER_EXTENSIONS = ('.eml', '.msg', '.zip')
+CONTAINER_SECONDS_PER_MB = 5.0
+
+
+def sample_pages(page_count, samples=SAMPLE_PAGES):
+    """Up to ``samples`` page numbers spread evenly over the document."""
+    if page_count <= samples:
+        return list(range(page_count))
+    step = page_count / samples
+    return sorted({int(i * step) for i in range(samples)})
+
+
+def _pdf_pages(path):
+    with DocumentContext(path=path) as ctx:
+        pages = ctx.page_count
+        checked = sample_pages(pages)
+        if not checked:
+            return 0, 0
+        scanned = sum(1 for page in checked if not ctx.has_text_layer(page))
+        return pages, round(pages * scanned / len(checked))
+
+
+def estimate_seconds(ext, size, pages, ocr_pages):
+    """Rough conversion time of a file from its routed extension, bytes and page counts."""
+    mb = size / (1024 * 1024)
+    if ext == '.pdf' and pages:
+        return FILE_SECONDS + ocr_pages * OCR_SECONDS_PER_PAGE + (pages - ocr_pages) * TEXT_SECONDS_PER_PAGE
+    if ext in IMAGE_EXTENSIONS:
+        return FILE_SECONDS + ocr_pages * OCR_SECONDS_PER_PAGE
+    if ext in CONTAINER_EXTENSIONS:
+        return FILE_SECONDS + mb * CONTAINER_SECONDS_PER_MB
+    return FILE_SECONDS + mb * SECONDS_PER_MB
+
+
+def estimate_job(path, filename):
+    """Estimate the work in one uploaded file.
+
+    Args:
+        path: The saved upload
+        filename: Its original filename (the content decides the format when they disagree)
+
+    Returns:
+        dict: {'bytes', 'pages', 'ocr_pages', 'seconds'}; pages is 0 when unknown
+    """
+    estimate = {'bytes': os.path.getsize(path), 'pages': 0, 'ocr_pages': 0}
+    ext = os.path.splitext(filename)[1].lower()
+    try:
+        ext = resolve_extension(sniff_format(path, filename), filename)
+        if ext == '.pdf':
+            estimate['pages'], estimate['ocr_pages'] = _pdf_pages(path)
+        elif ext in IMAGE_EXTENSIONS:
+            estimate['pages'] = estimate['ocr_pages'] = frame_count(path)
+    except Exception:
+        pass  # Unreadable here; the conversion reports the error
+    estimate['seconds'] = estimate_seconds(ext, estimate['bytes'], estimate['pages'], estimate['ocr_pages'])
+    return estimate
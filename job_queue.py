@@ -0,0 +1,202 @@
+# Legal Markdown Converter - Durable Job Queue
+"""
+Runs queued conversion jobs from the state store (see state_store), so
+uploads survive a restart of the server, including ``kill -9`` from the
+launchers and the menu bar app.
+
+Each server process runs a JobRunner with a few worker threads. A worker
+claims the next queued job, converts it and records the result; while it
+runs, the runner sends a heartbeat every few seconds. Any runner that finds
+a running job without a recent heartbeat (its process was killed) puts it
+back in the queue, and the job resumes from its last checkpoint (for OCR,
+the last page written) instead of from the start.
+
+A job that keeps killing its worker is given up after MAX_ATTEMPTS.
+
+Jobs are started shortest first by their estimated cost (see job_cost and
+StateStore.claim_job). With two or more worker threads, one of them only
+takes jobs estimated at up to QUICK_JOB_SECONDS, so a one-page document
+comes back within seconds even while every other thread is busy with a
+long OCR job.
+
+Admission control keeps the queue from outgrowing the machine: an upload
+that would take the pending jobs, their bytes or their estimated OCR pages
+(see job_cost) past the configured limits is turned away with a time to
+retry, based on how fast jobs have been finishing. An upload to an empty
+queue is always accepted, however large, so that it can ever run.
+"""
+
+import os
+import math
+import time
+import uuid
+import socket
+import threading
+
+# Seconds between heartbeats of running jobs
+HEARTBEAT_INTERVAL = 5
+# Running jobs without a heartbeat for this long belong to a dead process and are requeued
+STALE_SECONDS = 20
+# Attempts at a job before it is marked failed
+MAX_ATTEMPTS = 3
+# Attempts at recording a result while the database is busy; after that the job is left to be requeued
+FINISH_ATTEMPTS = 5
+# Estimated seconds up to which a job counts as quick (see JobRunner)
+QUICK_JOB_SECONDS = 30
+
+# Admission limits and how each is measured: (config key, queue_totals key, scale to the configured unit)
+LIMITS = (
+    ('max_jobs', 'jobs', 1),
+    ('max_mb', 'bytes', 1024 * 1024),
+    ('max_ocr_pages', 'ocr_pages', 1),
+)
+# Seconds of finished jobs used to predict when there will be room again
+THROUGHPUT_WINDOW = 300
+# Retry-After bounds, and the value used while no job has finished recently
+MIN_RETRY_AFTER = 5
+MAX_RETRY_AFTER = 300
+DEFAULT_RETRY_AFTER = 30
+
+
+def attempts_exhausted(job):
+    """The error result for a job claimed more than MAX_ATTEMPTS times, or None."""
+    if job['attempts'] <= MAX_ATTEMPTS:
+        return None
+    return {'type': 'error', 'message': f"{job['filename']} failed to convert: "
+                                        f"the server stopped during each of {MAX_ATTEMPTS} attempts"}
+
+
+def over_limit(totals, incoming, limits):
+    """Check an upload against the admission limits.
+
+    Args:
+        totals: The pending jobs' totals (StateStore.queue_totals)
+        incoming: The upload's totals, with the same keys (missing keys count as 0)
+        limits: Config values by key (see LIMITS); 0 or missing means unlimited
+
+    Returns:
+        tuple or None: (config key, share of the pending work that has to finish first), or
+        None if the upload fits (always when nothing is pending)
+    """
+    if not totals['jobs']:
+        return None
+    for key, measure, scale in LIMITS:
+        limit = (limits.get(key) or 0) * scale
+        if not limit:
+            continue
+        excess = totals[measure] + incoming.get(measure, 0) - limit
+        if excess > 0:
+            return key, min(1.0, excess / max(totals[measure], 1))
+    return None
+
+
+def retry_after(pending_jobs, share, throughput):
+    """Seconds until ``share`` of ``pending_jobs`` should have finished at ``throughput`` jobs per second."""
+    if throughput <= 0:
+        return DEFAULT_RETRY_AFTER
+    seconds = math.ceil(pending_jobs * share / throughput)
+    return max(MIN_RETRY_AFTER, min(MAX_RETRY_AFTER, seconds))
+
+
+class JobRunner:
+    """Worker threads that run jobs from the queue in a StateStore.
+
+    Args:
+        store: The StateStore holding the queue
+        run_job: Called as ``run_job(job)`` with the claimed job dict; returns
+            the result dict (``{'type': 'error', ...}`` for a failed conversion)
+        on_done: Called as ``on_done(job, result)`` once the result is recorded
+        workers: Jobs converted at the same time in this process (0 = only watch for
+            stale jobs, leaving the conversions to remote workers); with 2 or more,
+            one is kept for quick jobs
+        poll_interval: Seconds between checks for jobs queued by other processes
+    """
+
+    def __init__(self, store, run_job, on_done, workers=2, poll_interval=1.0):
+        self.store = store
+        self.run_job = run_job
+        self.on_done = on_done
+        self.workers = max(0, int(workers))
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        # Jobs this runner is converting; only these get heartbeats
+        self._lock = threading.Lock()
+        self._active = set()
+
+    def start(self):
+        for i in range(self.workers):
+            max_cost = QUICK_JOB_SECONDS if i == 0 and self.workers > 1 else None
+            thread = threading.Thread(target=self._work, args=(max_cost,), name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Check the queue now (a job was just added)."""
+        self._wake.set()
+
+    def _heartbeat(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                with self._lock:
+                    active = sorted(self._active)
+                self.store.heartbeat(self.worker_id, active)
+                if self.store.requeue_stale_jobs(STALE_SECONDS):
+                    self._wake.set()
+            except Exception:
+                pass  # Database busy; try again next time
+
+    def _work(self, max_cost=None):
+        while not self._stop.is_set():
+            try:
+                job = self.store.claim_job(self.worker_id, max_cost)
+            except Exception:
+                job = None  # Database busy; try again after the poll interval
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+
+            with self._lock:
+                self._active.add(job['id'])
+            result = attempts_exhausted(job)
+            if result is None:
+                try:
+                    result = self.run_job(job)
+                except Exception as e:
+                    result = {'type': 'error', 'message': f"{job['filename']} failed to convert: {e}"}
+            recorded = self._finish(job, result)
+            with self._lock:
+                self._active.discard(job['id'])
+            if not recorded:
+                continue  # Requeued for another worker meanwhile, or the database stayed busy
+            try:
+                self.on_done(job, result)
+            except Exception:
+                pass  # The result is recorded; only the session summary is behind
+
+    def _finish(self, job, result):
+        """Record a job's result, retrying while the database is busy.
+
+        Returns:
+            bool: False if the job was not recorded. A job given to another worker
+            meanwhile is left to it; one that could not be written loses its
+            heartbeats and is requeued as stale.
+        """
+        for attempt in range(1, FINISH_ATTEMPTS + 1):
+            try:
+                return self.store.finish_job(job['id'], result, failed=result.get('type') == 'error',
+                                             worker=self.worker_id)
+            except Exception:
+                if attempt < FINISH_ATTEMPTS:
+                    time.sleep(self.poll_interval * attempt)
+        return False
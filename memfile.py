@@ -0,0 +1,53 @@
+# Legal Markdown Converter - In-Memory Inputs
+"""
+Conversions work on the uploaded bytes directly: PyMuPDF, MarkItDown, zipfile
+and extract-msg all read from memory, and pandoc reads text formats on stdin.
+
+A few consumers still need a real path - pandoc's binary readers (DOCX, ODT,
+EPUB) and the PDF shard worker processes. ``real_path`` backs the bytes with
+an anonymous in-memory file on Linux (memfd, reachable as /proc/<pid>/fd/N by
+child processes while it is open) and falls back to a temporary file
+elsewhere, so slow network temp folders are only touched when there is no
+other way.
+
+Usage:
+    with real_path(docx_bytes, ".docx") as path:
+        subprocess.run(["pandoc", path, ...])
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+from metrics import INPUTS_MATERIALIZED
+
+HAS_MEMFD = hasattr(os, "memfd_create") and os.path.isdir("/proc/self/fd")
+
+
+@contextmanager
+def real_path(data, suffix=""):
+    """Yield a path whose contents are ``data``; it is removed on exit.
+
+    Args:
+        data: Bytes (or a memoryview) to expose
+        suffix: File extension, used for the temporary file fallback
+    """
+    if HAS_MEMFD:
+        fd = os.memfd_create("lmc" + suffix)
+        try:
+            with os.fdopen(fd, "wb", closefd=False) as f:
+                f.write(data)
+            INPUTS_MATERIALIZED.inc(backing='memfd')
+            # Other processes open the same memory file through the owner's fd
+            yield f"/proc/{os.getpid()}/fd/{fd}"
+        finally:
+            os.close(fd)
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        tmp.write(data)
+    INPUTS_MATERIALIZED.inc(backing='tempfile')
+    try:
+        yield tmp.name
+    finally:
+        os.unlink(tmp.name)
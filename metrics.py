@@ -0,0 +1,279 @@
+# Legal Markdown Converter - Prometheus Metrics
+"""
+Minimal, dependency-free counters, gauges and histograms rendered in the
+Prometheus text exposition format (served at /metrics).
+
+Usage:
+    from metrics import OCR_PAGES, timed_stage
+
+    @timed_stage('needs_ocr')
+    def needs_ocr(pdf_path): ...
+
+    OCR_PAGES.inc()
+
+With several server processes (production mode), each process publishes
+``snapshot()`` to the shared state store and /metrics renders the sum of all
+snapshots (``render_metrics(snapshots)``), so counters only ever go up
+whichever process answers the scrape. Gauges are computed on scrape from
+shared state and are not summed.
+"""
+
+import time
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+# Latency buckets in seconds - conversions range from milliseconds to many minutes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        """Current values as JSON-serializable [label values, value] pairs."""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, snapshots):
+        """Sum the values of several snapshots; returns {label tuple: value}."""
+        values = {}
+        for pairs in snapshots:
+            for key, value in pairs:
+                key = tuple(key)
+                values[key] = values.get(key, 0) + value
+        return values
+
+    def render(self, values=None):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        if values is None:
+            with self._lock:
+                values = dict(self._values)
+        items = sorted(values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that can go up and down, or be computed on scrape by a callback."""
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self._callback = callback
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_callback(self, callback):
+        """Compute values on scrape; ``callback()`` returns {label tuple: value}."""
+        self._callback = callback
+
+    def render(self, values=None):
+        if self._callback:
+            try:
+                values = self._callback()
+            except Exception:
+                values = {}
+            with self._lock:
+                self._values = {tuple(str(v) for v in key): value for key, value in values.items()}
+        return super().render()
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with a running sum."""
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), dict(state, counts=list(state['counts']))] for key, state in self._values.items()]
+
+    def merge(self, snapshots):
+        values = {}
+        for pairs in snapshots:
+            for key, state in pairs:
+                key = tuple(key)
+                total = values.setdefault(key, {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+                total['counts'] = [a + b for a, b in zip(total['counts'], state['counts'])]
+                total['sum'] += state['sum']
+                total['count'] += state['count']
+        return values
+
+    def render(self, values=None):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        if values is None:
+            with self._lock:
+                values = {key: dict(state, counts=list(state['counts'])) for key, state in self._values.items()}
+        items = sorted(values.items())
+        for key, state in items:
+            for bound, count in zip(self.buckets, state['counts']):
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+def snapshot():
+    """This process's counter and histogram values, JSON-serializable (see render_metrics)."""
+    return {metric.name: metric.snapshot() for metric in REGISTRY if not isinstance(metric, Gauge)}
+
+
+def render_metrics(snapshots=None):
+    """Render every registered metric in Prometheus text format.
+
+    Args:
+        snapshots: Optional list of ``snapshot()`` results of every server process
+            (including this one); counters and histograms are rendered as their sum
+    """
+    lines = []
+    for metric in REGISTRY:
+        if snapshots is None or isinstance(metric, Gauge):
+            lines.extend(metric.render())
+        else:
+            lines.extend(metric.render(metric.merge(snap.get(metric.name, []) for snap in snapshots)))
+    return '\n'.join(lines) + '\n'
+
+
+# =============================================================================
+# Conversion pipeline metrics
+# =============================================================================
+
+STAGE_SECONDS = Histogram(
+    'lmc_stage_duration_seconds', 'Time spent in each conversion pipeline stage.', ['stage'])
+STAGE_ERRORS = Counter(
+    'lmc_stage_errors_total', 'Conversion pipeline stages that raised an exception.', ['stage'])
+CONVERSION_SECONDS = Histogram(
+    'lmc_conversion_duration_seconds', 'End-to-end time to convert one uploaded file, by route.', ['route'])
+CONVERSIONS = Counter(
+    'lmc_conversions_total', 'Files converted, by route and outcome.', ['route', 'outcome'])
+OCR_PAGES = Counter(
+    'lmc_ocr_pages_total', 'Pages sent to Tesseract.')
+OCR_PAGES_SKIPPED = Counter(
+    'lmc_ocr_pages_skipped_total', 'Pages of OCR jobs not sent to Tesseract, by reason.', ['reason'])
+PANDOC_CALLS = Counter(
+    'lmc_pandoc_calls_total', 'Pandoc subprocess invocations, by input format and outcome.', ['format', 'outcome'])
+MARKITDOWN_CALLS = Counter(
+    'lmc_markitdown_calls_total', 'MarkItDown conversions, by outcome.', ['outcome'])
+EMAIL_IMAGES_SKIPPED = Counter(
+    'lmc_email_images_skipped_total', 'Decorative email images not converted as attachments, by reason.',
+    ['reason'])
+FALLBACKS = Counter(
+    'lmc_fallbacks_total', 'Times a conversion fell back to another engine.', ['from_engine', 'to_engine'])
+SPECULATIVE_WINNERS = Counter(
+    'lmc_speculative_winners_total', 'Thin-text-layer PDFs raced between text extraction and OCR, by winner.',
+    ['winner'])
+FORMAT_MISROUTES = Counter(
+    'lmc_format_misroutes_total', 'Files whose content did not match their extension.', ['extension', 'detected'])
+CACHE_HITS = Counter(
+    'lmc_cache_hits_total', 'Cache hits, by cache.', ['cache'])
+CACHE_MISSES = Counter(
+    'lmc_cache_misses_total', 'Cache misses, by cache.', ['cache'])
+INPUTS_MATERIALIZED = Counter(
+    'lmc_inputs_materialized_total', 'In-memory inputs given a file path because an engine needed one, by backing.',
+    ['backing'])
+QUEUE_DEPTH = Gauge(
+    'lmc_queue_depth', 'Files waiting to be converted, by queue.', ['queue'])
+ADMISSION_REJECTED = Counter(
+    'lmc_admission_rejected_total', 'Uploads turned away because the queue was full, by limit.', ['limit'])
+HTTP_REQUEST_SECONDS = Histogram(
+    'lmc_http_request_duration_seconds', 'HTTP request latency, by endpoint.', ['endpoint', 'method', 'status'])
+
+
+def timed_stage(stage):
+    """Decorator recording a function's duration (and failures) as a pipeline stage."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                STAGE_ERRORS.inc(stage=stage)
+                raise
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+        return wrapper
+    return decorator
@@ -0,0 +1,348 @@
+# Legal Markdown Converter - Streaming MIME Parser
+"""
+Single-pass parser for EML messages that never holds a whole attachment in
+memory. ``email.parser`` reads the full message into a tree and every
+``get_payload(decode=True)`` makes another decoded copy, so a 500 MB
+production email needed several GB of RAM.
+
+Here the message is read in blocks. Headers of each part are parsed with the
+standard library, and attachment bodies are base64/quoted-printable decoded
+as they stream past into a SpooledTemporaryFile, which stays in memory up to
+SPOOL_MAX_MEMORY and moves to a temporary file above that.
+
+Attachment records carry the file handle instead of bytes:
+    {'filename': ..., 'content_type': ..., 'size': ..., 'file': <file object>,
+     'content_id': ... or None, 'inline': bool}
+Use read_attachment() to get the bytes of one attachment when it is converted.
+"""
+
+import re
+import binascii
+from urllib.parse import unquote
+import tempfile
+from io import BytesIO
+from email import policy
+from email.parser import BytesHeaderParser
+
+# Bytes read from the message at a time
+READ_SIZE = 1024 * 1024
+# Decoded attachments larger than this are spooled to a temporary file
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+_BASE64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+_NOT_BASE64 = bytes(b for b in range(256) if b not in _BASE64_ALPHABET)
+# What may follow a boundary on its line: transport padding, then the line end
+_DELIMITER_END = re.compile(rb"[ \t]*(?:\r\n|\n|\r|\Z)")
+# Room after a "--" at a line start needed to tell whether it is a boundary
+_DELIMITER_PADDING = 80
+# Images embedded in an HTML body: <img src="cid:image001.png@01D9...">
+_CID_REFERENCE = re.compile(r"cid:([^\"'\s>)]+)", re.IGNORECASE)
+
+
+class _Reader:
+    """Buffered reader over a binary stream that can stop at MIME boundaries."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._buf = b""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        data = self._stream.read(READ_SIZE)
+        if not data:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def readline(self):
+        while True:
+            end = self._buf.find(b"\n", self._pos)
+            if end >= 0:
+                line = self._buf[self._pos:end + 1]
+                self._pos = end + 1
+                return line
+            if not self._fill():
+                line = self._buf[self._pos:]
+                self._pos = len(self._buf)
+                return line
+
+    def read_headers(self):
+        """Parse the header block of the next entity (up to the blank line)."""
+        lines = []
+        while True:
+            line = self.readline()
+            if not line or line in (b"\r\n", b"\n"):
+                break
+            if line[:1] not in (b" ", b"\t") and b":" not in line:
+                # Missing blank line: this is already the body
+                self._pos -= len(line)
+                break
+            lines.append(line)
+        return BytesHeaderParser(policy=policy.default).parsebytes(b"".join(lines))
+
+    def _match_delimiter(self, start, delimiters):
+        """(boundary, is_close, line_end) if a delimiter line starts at ``start``."""
+        for boundary, delimiter in delimiters:
+            if self._buf.startswith(delimiter, start):
+                end = start + len(delimiter)
+                close = self._buf.startswith(b"--", end)
+                match = _DELIMITER_END.match(self._buf, end + 2 if close else end)
+                if match:
+                    return boundary, close, match.end()
+        return None
+
+    def read_body(self, boundaries, write):
+        """Pass body bytes to ``write`` up to the next delimiter line of any of ``boundaries``.
+
+        The line break before a delimiter belongs to the delimiter and is not
+        part of the body.
+
+        Returns:
+            tuple: (boundary, is_close) for the delimiter found, or (None, False) at the end of input
+        """
+        delimiters = [(boundary, b"--" + boundary) for boundary in boundaries]
+        window = max((len(d) for _, d in delimiters), default=0) + _DELIMITER_PADDING
+
+        # A delimiter on the very first line (empty body)
+        while len(self._buf) - self._pos < window and self._fill():
+            pass
+        hit = self._match_delimiter(self._pos, delimiters) if delimiters else None
+        if hit:
+            self._pos = hit[2]
+            return hit[0], hit[1]
+
+        scan = self._pos
+        while True:
+            buf = self._buf
+            found = buf.find(b"\n--", scan) if delimiters else -1
+            if found < 0:
+                if self._eof:
+                    write(buf[self._pos:])
+                    self._pos = len(buf)
+                    return None, False
+                # Hold back a possible "\r\n-" split across reads
+                cut = max(self._pos, len(buf) - 3)
+                write(buf[self._pos:cut])
+                self._pos = cut
+                self._fill()
+                scan = self._pos
+                continue
+
+            # Line break before the candidate, without a preceding "\r"
+            body_end = found - 1 if found > self._pos and buf[found - 1] == 13 else found
+            if len(buf) - found <= window and not self._eof:
+                write(buf[self._pos:body_end])
+                self._pos = body_end
+                self._fill()
+                scan = self._pos
+                continue
+
+            hit = self._match_delimiter(found + 1, delimiters)
+            if hit is None:
+                scan = found + 1
+                continue
+            write(buf[self._pos:body_end])
+            self._pos = hit[2]
+            return hit[0], hit[1]
+
+
+class _Base64Decoder:
+    def __init__(self, out):
+        self._out = out
+        self._rest = b""
+
+    def write(self, data):
+        data = self._rest + data.translate(None, _NOT_BASE64)
+        usable = len(data) - len(data) % 4
+        if usable:
+            try:
+                self._out.write(binascii.a2b_base64(data[:usable]))
+            except binascii.Error:
+                pass  # Corrupt block; keep what decodes, like the email package does
+        self._rest = data[usable:]
+
+    def close(self):
+        if self._rest:
+            try:
+                self._out.write(binascii.a2b_base64(self._rest + b"=" * (-len(self._rest) % 4)))
+            except binascii.Error:
+                pass
+
+
+class _QuotedPrintableDecoder:
+    def __init__(self, out):
+        self._out = out
+        self._rest = b""
+
+    def write(self, data):
+        data = self._rest + data
+        # Decode whole lines only, so soft line breaks and =XY escapes are never split
+        end = data.rfind(b"\n") + 1
+        if end:
+            self._out.write(binascii.a2b_qp(data[:end]))
+        self._rest = data[end:]
+
+    def close(self):
+        if self._rest:
+            self._out.write(binascii.a2b_qp(self._rest))
+
+
+class _RawDecoder:
+    def __init__(self, out):
+        self.write = out.write
+
+    def close(self):
+        pass
+
+
+def _decoder(headers, out):
+    encoding = str(headers.get("Content-Transfer-Encoding", "")).strip().lower()
+    if encoding == "base64":
+        return _Base64Decoder(out)
+    if encoding == "quoted-printable":
+        return _QuotedPrintableDecoder(out)
+    return _RawDecoder(out)
+
+
+def _discard(data):
+    pass
+
+
+def _decode_text(payload, headers):
+    """Decode a text part like ``EmailMessage.get_content()`` (falling back to UTF-8)."""
+    try:
+        return payload.decode(headers.get_param("charset", "ASCII"), errors="replace")
+    except LookupError:
+        return payload.decode("utf-8", errors="replace")
+
+
+class _MessageParser:
+    def __init__(self, stream, spool_max_memory):
+        self.reader = _Reader(stream)
+        self.spool_max_memory = spool_max_memory
+        self.headers = None
+        self.plain = ""
+        self.html = None
+        self.cid_refs = set()
+        self.attachments = []
+
+    def parse(self):
+        self.headers = self.reader.read_headers()
+        self._parse_body(self.headers, [], top_level=True)
+        return self
+
+    def _parse_entity(self, boundaries, top_level):
+        headers = self.reader.read_headers()
+        return self._parse_body(headers, boundaries, top_level)
+
+    def _parse_body(self, headers, boundaries, top_level):
+        """Parse one entity's body; returns the (boundary, is_close) that ended it."""
+        boundary = headers.get_param("boundary") if headers.get_content_maintype() == "multipart" else None
+        if boundary:
+            own = str(boundary).encode("utf-8", errors="replace")
+            inner = boundaries + [own]
+            found, close = self.reader.read_body(inner, _discard)  # preamble
+            while found == own and not close:
+                found, close = self._parse_entity(inner, top_level)
+            if found == own:
+                return self.reader.read_body(boundaries, _discard)  # epilogue
+            return found, close
+
+        if headers.get_content_type() == "message/rfc822":
+            # Attached message: its attachments are collected, its text is not the body
+            return self._parse_entity(boundaries, top_level=False)
+
+        return self._parse_leaf(headers, boundaries, top_level)
+
+    def _parse_leaf(self, headers, boundaries, top_level):
+        content_type = headers.get_content_type()
+        disposition = str(headers.get("Content-Disposition", ""))
+        filename = headers.get_filename()
+        is_text = top_level and "attachment" not in disposition and content_type in ("text/plain", "text/html")
+        is_attachment = bool(filename)
+
+        if not (is_text or is_attachment):
+            return self.reader.read_body(boundaries, _discard)
+
+        out = BytesIO() if is_text else tempfile.SpooledTemporaryFile(max_size=self.spool_max_memory)
+        decoder = _decoder(headers, out)
+        found = self.reader.read_body(boundaries, decoder.write)
+        decoder.close()
+
+        if is_text:
+            payload = out.getvalue()
+            text = _decode_text(payload, headers)
+            if content_type == "text/plain":
+                self.plain = text
+            else:
+                self.cid_refs.update(cid_references(text))
+                if not self.plain:
+                    self.html = text
+            if is_attachment:
+                out = tempfile.SpooledTemporaryFile(max_size=self.spool_max_memory)
+                out.write(payload)
+
+        size = out.tell()
+        if is_attachment and size:
+            out.seek(0)
+            self.attachments.append({
+                'filename': filename,
+                'content_type': content_type,
+                'size': size,
+                'file': out,
+                'content_id': content_id(headers.get("Content-ID")),
+                'inline': "inline" in disposition.lower(),
+            })
+        else:
+            out.close()
+        return found
+
+
+def parse_message(stream, spool_max_memory=SPOOL_MAX_MEMORY):
+    """Parse an EML message from a binary stream in one pass.
+
+    Args:
+        stream: Binary file object positioned at the start of the message
+        spool_max_memory: Attachments larger than this (decoded) go to a temporary file
+
+    Returns:
+        dict: 'headers' (an EmailMessage with the top-level headers only),
+        'plain' and 'html' (body text; the last text/plain part wins, and HTML
+        is only kept while there is no plain text), 'cid_refs' (Content-IDs the
+        HTML bodies refer to) and 'attachments' (records as described in the
+        module docstring)
+    """
+    parser = _MessageParser(stream, spool_max_memory).parse()
+    return {
+        'headers': parser.headers,
+        'plain': parser.plain,
+        'html': parser.html,
+        'cid_refs': parser.cid_refs,
+        'attachments': parser.attachments,
+    }
+
+
+def content_id(value):
+    """Normalize a Content-ID header ("<id@host>") for matching with cid: references."""
+    value = str(value or "").strip().strip("<>")
+    return value or None
+
+
+def cid_references(html):
+    """Content-IDs referenced from an HTML body (``cid:`` URLs)."""
+    return {unquote(match) for match in _CID_REFERENCE.findall(html)}
+
+
+def read_attachment(attachment):
+    """The bytes of one attachment record."""
+    attachment['file'].seek(0)
+    return attachment['file'].read()
+
+
+def close_attachments(attachments):
+    """Release the attachments' spooled files."""
+    for attachment in attachments:
+        attachment['file'].close()
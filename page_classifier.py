@@ -0,0 +1,103 @@
+# Legal Markdown Converter - OCR Page Classification
+"""
+Decides, before anything is sent to Tesseract, whether a PDF page needs OCR at
+all. Productions are full of blank backs and slip sheets, and our own email
+PDFs contain cover sheets and placeholders that already have a text layer.
+
+Page kinds:
+- text_layer: born-digital page with real text (not mostly a scanned image)
+- text_only: page with some text, no images and nothing drawn outside its
+  text (cover sheets, placeholders); the text layer is everything OCR could
+  find. A page drawn as vector outlines with only a Bates stamp as text is
+  a scan
+- blank: nothing (or only scanner noise) on a low-resolution render
+- scan: needs OCR
+"""
+
+from PIL import Image, ImageDraw
+
+# Low-resolution render used for the blank check (0.5 = 36 dpi)
+BLANK_RENDER_ZOOM = 0.5
+# Standalone images are reduced to about this width (a letter page at that zoom)
+BLANK_IMAGE_WIDTH = int(612 * BLANK_RENDER_ZOOM)
+# Border ignored by the blank check (fraction of each side) - scans often have edge shadows
+BLANK_MARGIN = 0.05
+# A pixel is ink when it is this much darker than the page background
+INK_CONTRAST = 64
+# Pages with at most this fraction of ink pixels count as blank
+BLANK_MAX_INK_RATIO = 0.0005
+# Points added around each text block when it is painted out of a render (glyphs overshoot their boxes)
+TEXT_BLOCK_PADDING = 2
+
+
+def image_ink_ratio(img, margin=BLANK_MARGIN, contrast=INK_CONTRAST):
+    """Fraction of a grayscale image's pixels (inside the margin) darker than the background."""
+    dx, dy = int(img.width * margin), int(img.height * margin)
+    if dx or dy:
+        img = img.crop((dx, dy, img.width - dx, img.height - dy))
+    histogram = img.histogram()
+    total = sum(histogram)
+    if not total:
+        return 0.0
+
+    # Background = median gray level (white paper, or gray for fax scans)
+    running, background = 0, 255
+    for level, count in enumerate(histogram):
+        running += count
+        if running * 2 >= total:
+            background = level
+            break
+    return sum(histogram[:max(0, background - contrast)]) / total
+
+
+def ink_ratio(pix, margin=BLANK_MARGIN, contrast=INK_CONTRAST):
+    """Like image_ink_ratio, for a grayscale PyMuPDF pixmap."""
+    return image_ink_ratio(Image.frombytes("L", (pix.width, pix.height), pix.samples), margin, contrast)
+
+
+def is_blank_image(img, max_ink_ratio=BLANK_MAX_INK_RATIO):
+    """True if a grayscale ("L") image has no visible content.
+
+    The image is first reduced to about the size of the low-res page render.
+    """
+    factor = img.width // BLANK_IMAGE_WIDTH
+    if factor > 1:
+        img = img.reduce(factor)
+    return image_ink_ratio(img) <= max_ink_ratio
+
+
+def is_blank_page(ctx, page_num, max_ink_ratio=BLANK_MAX_INK_RATIO):
+    """True if a page has no visible content (pixel statistics on a low-res render)."""
+    pix = ctx.pixmap(page_num, zoom=BLANK_RENDER_ZOOM, gray=True)
+    return ink_ratio(pix) <= max_ink_ratio
+
+
+def ink_outside_text(ctx, page_num):
+    """Fraction of ink pixels on a low-res render of a page once its text blocks are painted out."""
+    pix = ctx.pixmap(page_num, zoom=BLANK_RENDER_ZOOM, gray=True)
+    img = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    draw = ImageDraw.Draw(img)
+    for rect in ctx.text_blocks(page_num):
+        rect = (rect + (-TEXT_BLOCK_PADDING, -TEXT_BLOCK_PADDING, TEXT_BLOCK_PADDING, TEXT_BLOCK_PADDING))
+        draw.rectangle([coord * BLANK_RENDER_ZOOM for coord in rect], fill=255)
+    return image_ink_ratio(img)
+
+
+def classify_page(ctx, page_num, skip_blank=True, max_ink_ratio=BLANK_MAX_INK_RATIO):
+    """Classify a page as 'text_layer', 'text_only', 'blank' or 'scan' (see module docstring).
+
+    Args:
+        ctx: A DocumentContext
+        page_num: 0-based page number
+        skip_blank: Whether to run the blank check at all
+        max_ink_ratio: Blank threshold (fraction of ink pixels), also for the ink a text_only page
+            may have outside its text
+    """
+    if ctx.has_text_layer(page_num):
+        return 'text_layer'
+    if (ctx.page_text(page_num) and ctx.image_coverage(page_num) == 0
+            and ink_outside_text(ctx, page_num) <= max_ink_ratio):
+        return 'text_only'
+    if skip_blank and not ctx.page_text(page_num) and is_blank_page(ctx, page_num, max_ink_ratio):
+        return 'blank'
+    return 'scan'
@@ -0,0 +1,185 @@
+# Legal Markdown Converter - Parallel Page-Shard PDF Conversion
+"""
+Splits large text PDFs into page-range shards, converts the shards in parallel
+worker processes and reassembles the markdown in page order.
+
+MarkItDown (pdfminer) is pure Python and converts one stream on one core, so a
+2,000-page transcript otherwise takes minutes with no progress reported. Each
+shard is converted independently; progress is reported as shards finish.
+
+Usage:
+    markdown = convert_pdf_sharded(pdf_path, 'markitdown', shard_pages=100,
+                                   progress=lambda shards: print(shards))
+
+Shard states passed to ``progress`` are dicts like
+``{'pages': '101-200', 'state': 'queued' | 'running' | 'done' | 'error'}``.
+
+Conversions that may turn out to be unneeded (see speculative_pdf_text) can
+be stopped: a sharded conversion through its ``cancel`` event, a whole
+document through CancellableConversion, which runs it in a child process.
+"""
+
+import os
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import fitz  # PyMuPDF
+
+# Defaults (overridable in config.json "conversion" section)
+DEFAULT_SHARD_PAGES = 100
+DEFAULT_MIN_PAGES = 300
+
+# Seconds between checks of a sharded conversion's cancel event
+CANCEL_POLL_SECONDS = 0.2
+
+# Child processes are started fresh rather than forked: the server forks from threaded processes
+# (request threads, job runner, OCR), and a forked child can inherit a lock another thread held
+_MP_CONTEXT = multiprocessing.get_context('spawn')
+
+
+class ConversionCancelled(Exception):
+    """The conversion was stopped through its cancel event."""
+
+
+def shard_ranges(page_count, shard_pages):
+    """Split ``page_count`` pages into ``(start, end)`` ranges (end exclusive)."""
+    shard_pages = max(1, int(shard_pages))
+    return [(start, min(start + shard_pages, page_count)) for start in range(0, page_count, shard_pages)]
+
+
+def _convert_shard(pdf_path, start, end, engine, body_size):
+    """Convert pages ``start``..``end - 1`` of a PDF (runs in a worker process)."""
+    with fitz.open(pdf_path, filetype="pdf") as source, fitz.open() as shard:
+        shard.insert_pdf(source, from_page=start, to_page=end - 1)
+        if engine == 'pymupdf':
+            from pymupdf_converter import pdf_to_markdown
+            return pdf_to_markdown(shard, body_size=body_size)
+        data = shard.tobytes(garbage=1)
+
+    from markitdown import MarkItDown
+    return MarkItDown().convert_stream(BytesIO(data)).markdown
+
+
+def _convert_document(pdf_path, engine):
+    """Convert a whole PDF (runs in the CancellableConversion child process)."""
+    if engine == 'pymupdf':
+        from pymupdf_converter import pdf_to_markdown
+        with fitz.open(pdf_path, filetype="pdf") as doc:
+            return pdf_to_markdown(doc)
+    from markitdown import MarkItDown
+    with open(pdf_path, "rb") as f:
+        return MarkItDown().convert_stream(f).markdown
+
+
+def _send_conversion(conn, pdf_path, engine):
+    try:
+        conn.send(('ok', _convert_document(pdf_path, engine)))
+    except Exception as e:
+        conn.send(('error', str(e)))
+    finally:
+        conn.close()
+
+
+class CancellableConversion:
+    """Converts a whole text PDF in a child process, so it can be stopped part way (a thread cannot be).
+
+    Args:
+        pdf_path: Path to the PDF (the child opens it itself; keep it until the conversion ends)
+        engine: 'markitdown' or 'pymupdf'
+    """
+
+    def __init__(self, pdf_path, engine):
+        self._receive, send = _MP_CONTEXT.Pipe(duplex=False)
+        self._process = _MP_CONTEXT.Process(target=_send_conversion, args=(send, pdf_path, engine),
+                                                name="pdf-text", daemon=True)
+        self._process.start()
+        send.close()
+
+    def result(self):
+        """Wait for the markdown. Raises RuntimeError if the conversion failed or was cancelled."""
+        try:
+            outcome, value = self._receive.recv()
+        except (EOFError, OSError):
+            raise RuntimeError("the conversion process ended without a result")
+        self._process.join()
+        if outcome == 'error':
+            raise RuntimeError(value)
+        return value
+
+    def cancel(self):
+        """Stop the conversion now."""
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process.join()
+
+
+def convert_pdf_sharded(pdf_path, engine, shard_pages=DEFAULT_SHARD_PAGES, max_workers=None, progress=None,
+                        cancel=None):
+    """Convert a text PDF in parallel page shards.
+
+    Args:
+        pdf_path: Path to the PDF (workers open it themselves)
+        engine: 'markitdown' or 'pymupdf'
+        shard_pages: Pages per shard
+        max_workers: Worker processes (default: CPU count)
+        progress: Optional callback receiving the list of shard states after each change
+        cancel: Optional threading.Event; once set, queued shards are dropped and
+            ConversionCancelled is raised without waiting for the running ones
+
+    Returns:
+        str: The markdown of every shard, joined in page order
+    """
+    body_size = None
+    with fitz.open(pdf_path, filetype="pdf") as doc:
+        page_count = len(doc)
+        if engine == 'pymupdf':
+            # Grade headings against the whole document, not each shard
+            from pymupdf_converter import sample_body_size
+            body_size = sample_body_size(doc)
+
+    ranges = shard_ranges(page_count, shard_pages)
+    shards = [{'pages': f'{start + 1}-{end}', 'state': 'queued'} for start, end in ranges]
+    results = [None] * len(ranges)
+
+    def report():
+        if progress:
+            progress([dict(shard) for shard in shards])
+
+    workers = min(max_workers or os.cpu_count() or 1, len(ranges))
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=_MP_CONTEXT)
+    cancelled = False
+    try:
+        futures = {}
+        for i, (start, end) in enumerate(ranges):
+            futures[pool.submit(_convert_shard, pdf_path, start, end, engine, body_size)] = i
+            if i < workers:
+                shards[i]['state'] = 'running'
+        report()
+
+        pending = set(futures)
+        while pending:
+            finished, pending = wait(pending, timeout=CANCEL_POLL_SECONDS if cancel else None,
+                                     return_when=FIRST_COMPLETED)
+            if cancel is not None and cancel.is_set():
+                cancelled = True
+                raise ConversionCancelled(pdf_path)
+            for future in finished:
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception:
+                    shards[i]['state'] = 'error'
+                    report()
+                    raise
+                shards[i]['state'] = 'done'
+                # The pool picks up the next queued shard as each one finishes
+                queued = next((s for s in shards if s['state'] == 'queued'), None)
+                if queued:
+                    queued['state'] = 'running'
+                report()
+    finally:
+        # Running shards cannot be interrupted; after a cancel they finish without being waited for
+        pool.shutdown(wait=not cancelled, cancel_futures=True)
+
+    return "\n\n".join(part.strip() for part in results if part and part.strip())
@@ -0,0 +1,192 @@
+# Legal Markdown Converter - On-Demand Job Profiler
+"""
+Opt-in profiling of individual conversion jobs, for attaching real profiles to
+performance bug reports.
+
+Two modes are available:
+- "sampling" (default): a background thread samples the worker thread's stack
+  every few milliseconds. Overhead is low enough to leave on for a whole
+  session. Writes collapsed stacks (``.folded``, readable by flamegraph.pl and
+  speedscope) plus a text summary of the hottest functions.
+- "cprofile": deterministic cProfile. Exact call counts, but noticeably
+  slows down Python-heavy stages. Writes a ``.prof`` file (readable by
+  pstats/snakeviz) plus a text summary. On Python 3.11 and older it profiles
+  the worker thread only; on 3.12+ cProfile is built on sys.monitoring and
+  records every thread of the process, so other jobs and requests running at
+  the same time show up in the profile (and only one job at a time can be
+  profiled this way, see profile_job).
+
+Sampling follows only the thread that runs the job. Tesseract and Pandoc run
+as subprocesses and show up as time waiting in ``subprocess`` calls.
+"""
+
+import os
+import io
+import sys
+import time
+import pstats
+import cProfile
+import threading
+from types import SimpleNamespace
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_MODES = ('sampling', 'cprofile')
+
+# Shared value (see state_store) holding the settings changed at runtime through the /profiling
+# endpoint, so every server process sees them; a missing or None entry means "use config"
+RUNTIME_SETTINGS_KEY = 'profiling.runtime_settings'
+RUNTIME_KEYS = ('enabled', 'extensions', 'mode')
+
+
+def runtime_settings(store):
+    """The runtime overrides saved in ``store`` (a StateStore)."""
+    return store.get_value(RUNTIME_SETTINGS_KEY) or {}
+
+
+def update_runtime_settings(store, **changes):
+    """Save runtime overrides in ``store``; pass None to go back to the config value."""
+    settings = runtime_settings(store)
+    settings.update(changes)
+    store.put_value(RUNTIME_SETTINGS_KEY, settings)
+
+
+def resolve_settings(config_settings, store=None):
+    """Merge the runtime overrides saved in ``store`` over the ``profiling`` section of config.json."""
+    settings = {
+        'enabled': config_settings.get('enabled', False),
+        'extensions': [e.lower() for e in config_settings.get('extensions', [])],
+        'mode': config_settings.get('mode', 'sampling'),
+        'interval_ms': config_settings.get('interval_ms', 5),
+    }
+    if store is not None:
+        for key, value in runtime_settings(store).items():
+            if key in RUNTIME_KEYS and value is not None:
+                settings[key] = value
+    return settings
+
+
+def should_profile(filename, settings, session_requested=False):
+    """Profile when requested for the session, enabled globally, or enabled for this file type."""
+    if session_requested or settings['enabled']:
+        return True
+    ext = os.path.splitext(filename)[1].lower()
+    return ext in settings['extensions']
+
+
+class SamplingProfiler:
+    """Periodically samples one thread's Python stack from a background thread."""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[';'.join(stack)] += 1
+            self.samples += 1
+
+    def write(self, path_prefix, elapsed):
+        folded_path = path_prefix + '.folded'
+        with open(folded_path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+
+        samples = self.samples or 1
+        lines = [f"Sampling profile: {self.samples} samples every {self.interval * 1000:.1f} ms "
+                 f"over {elapsed:.2f} s", "", "Top functions by self time:"]
+        for frame, count in self_counts.most_common(30):
+            lines.append(f"  {count / samples:6.1%}  {frame}")
+        lines += ["", "Top functions by total time:"]
+        for frame, count in total_counts.most_common(30):
+            lines.append(f"  {count / samples:6.1%}  {frame}")
+
+        summary_path = path_prefix + '.txt'
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        return [folded_path, summary_path]
+
+
+@contextmanager
+def profile_job(path_prefix, mode='sampling', interval_ms=5):
+    """Profile the current thread (every thread with cProfile on Python 3.12+) for the duration of the block.
+
+    Output files are written to ``path_prefix`` + extension; the list of
+    written paths is available as ``profile.paths`` after the block exits.
+    If the job could not be profiled (cProfile already running in another
+    job), the block still runs and ``profile.skipped`` gives the reason.
+    """
+    if mode not in PROFILE_MODES:
+        mode = 'sampling'
+
+    result = SimpleNamespace(paths=[], skipped=None)
+    start = time.perf_counter()
+
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one active cProfile per process; another job is being profiled
+            result.skipped = "another job was being profiled with cProfile"
+            yield result
+            return
+    else:
+        profiler = SamplingProfiler(threading.get_ident(), interval=interval_ms / 1000.0)
+        profiler.start()
+
+    try:
+        yield result
+    finally:
+        if mode == 'cprofile':
+            profiler.disable()
+        else:
+            profiler.stop()
+        elapsed = time.perf_counter() - start
+
+        try:
+            os.makedirs(os.path.dirname(path_prefix), exist_ok=True)
+            if mode == 'cprofile':
+                prof_path = path_prefix + '.prof'
+                profiler.dump_stats(prof_path)
+                summary = io.StringIO()
+                stats = pstats.Stats(profiler, stream=summary)
+                stats.sort_stats('cumulative').print_stats(40)
+                summary_path = path_prefix + '.txt'
+                with open(summary_path, 'w', encoding='utf-8') as f:
+                    f.write(f"cProfile over {elapsed:.2f} s\n\n{summary.getvalue()}")
+                result.paths = [prof_path, summary_path]
+            else:
+                result.paths = profiler.write(path_prefix, elapsed)
+        except OSError:
+            result.paths = []
@@ -0,0 +1,409 @@
+# Legal Markdown Converter - Shared State Store
+"""
+Conversion sessions, the job queue (with checkpoints of long jobs),
+converted files waiting for download and small shared values, kept in one
+SQLite database so that every server process sees the same state and
+nothing is lost when the server is killed. In production mode several worker processes serve requests, and
+a status poll or download may reach a different process from the one that
+started the conversion.
+
+Session status is stored as a JSON document and updated field by field with
+SQLite's JSON functions, so concurrent writers never overwrite each other's
+fields. The database runs in WAL mode: readers (status polls) do not block
+the writer.
+
+Usage:
+    store = StateStore("lmc_state.db")
+    store.create_session(session_id, {'total': 2, 'current': 0, 'results': []})
+    store.update_session(session_id, current=1, current_status='Processing a.pdf...')
+    store.get_session(session_id)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+DEFAULT_STATE_DB = "lmc_state.db"
+# Seconds a writer waits for another process's transaction before failing
+BUSY_TIMEOUT = 30
+# Seconds of estimated cost a queued job is credited for each second it waits (shortest-job-first with aging)
+AGING_RATE = 1.0
+# Seconds finished jobs are kept after their session is gone, for recent_throughput
+JOB_HISTORY_SECONDS = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    expires REAL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    path TEXT NOT NULL,
+    created REAL NOT NULL,
+    expires REAL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    save_locally INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    heartbeat REAL,
+    result TEXT,
+    created REAL NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    ocr_pages INTEGER NOT NULL DEFAULT 0,
+    finished REAL,
+    cost REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    job_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (job_id, key)
+);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    address TEXT,
+    slots INTEGER NOT NULL,
+    registered REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shared_values (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+# Columns added to existing tables since their first release, added to older databases when opened
+ADDED_COLUMNS = {
+    'jobs': [('bytes', 'INTEGER NOT NULL DEFAULT 0'), ('ocr_pages', 'INTEGER NOT NULL DEFAULT 0'),
+             ('finished', 'REAL'), ('cost', 'REAL NOT NULL DEFAULT 0')],
+}
+
+
+def _json_path(field):
+    return '$."' + field.replace('"', '\\"') + '"'
+
+
+# A queued job's place in line: lower starts first (bound parameter: the current time)
+PRIORITY = f"(cost - (? - created) * {AGING_RATE})"
+
+
+class StateStore:
+    """Shared state in a SQLite database (one connection per thread).
+
+    Args:
+        path: Database file; created with its tables if missing
+    """
+
+    def __init__(self, path=DEFAULT_STATE_DB):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            for table, columns in ADDED_COLUMNS.items():
+                existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                for name, definition in columns:
+                    if name not in existing:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            # A connection must not be shared with a forked child
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # Sessions
+
+    def create_session(self, session_id, status):
+        self._connect().execute("INSERT OR REPLACE INTO sessions (id, status, created) VALUES (?, ?, ?)",
+                                (session_id, json.dumps(status), time.time()))
+
+    def get_session(self, session_id):
+        """The status dict of a session, or None if it does not exist."""
+        row = self._connect().execute("SELECT status FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update_session(self, session_id, **fields):
+        """Set fields of a session's status; other fields are left as they are."""
+        if not fields:
+            return
+        paths = ", ".join("?, json(?)" for _ in fields)
+        args = []
+        for field, value in fields.items():
+            args += [_json_path(field), json.dumps(value)]
+        self._connect().execute(f"UPDATE sessions SET status = json_set(status, {paths}) WHERE id = ?",
+                                args + [session_id])
+
+    def clear_fields(self, session_id, *fields):
+        """Remove fields from a session's status."""
+        if not fields:
+            return
+        paths = ", ".join("?" for _ in fields)
+        self._connect().execute(f"UPDATE sessions SET status = json_remove(status, {paths}) WHERE id = ?",
+                                [_json_path(field) for field in fields] + [session_id])
+
+    def append_result(self, session_id, result):
+        """Append a file's result dict to the session's 'results' list."""
+        self._connect().execute(
+            "UPDATE sessions SET status = json_insert(status, '$.results[#]', json(?)) WHERE id = ?",
+            (json.dumps(result), session_id))
+
+    def expire_session(self, session_id, seconds):
+        """Delete the session ``seconds`` from now (unless an earlier expiry is already set)."""
+        self._connect().execute("UPDATE sessions SET expires = ? WHERE id = ? AND expires IS NULL",
+                                (time.time() + seconds, session_id))
+
+    def delete_session(self, session_id):
+        self._connect().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def sessions(self):
+        """Status dicts of all sessions."""
+        return [json.loads(row[0]) for row in self._connect().execute("SELECT status FROM sessions")]
+
+    # Job queue: one job per uploaded file. States: queued -> running -> done (or failed)
+
+    def add_job(self, job_id, session_id, position, filename, input_path, save_locally, size=0, ocr_pages=0,
+                cost=0.0):
+        """Queue a file of a session for conversion (its bytes already saved at ``input_path``).
+
+        ``size`` and ``ocr_pages`` (see job_cost) count towards the admission limits while the job is
+        pending; ``cost``, its estimated seconds of work, decides when it is started (see claim_job).
+        """
+        self._connect().execute(
+            "INSERT INTO jobs (id, session_id, position, filename, input_path, save_locally, state, created, "
+            "bytes, ocr_pages, cost) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, session_id, position, filename, input_path, int(save_locally), time.time(), size, ocr_pages,
+             cost))
+
+    def claim_job(self, worker, max_cost=None):
+        """Mark the next queued job as running for ``worker`` and return it, or None.
+
+        Shortest job first: the job with the lowest estimated cost starts next,
+        less AGING_RATE seconds for every second it has waited, so a long job
+        is held back by jobs queued after it for at most about its own
+        estimated run time. Ties go to the oldest job, then upload order.
+
+        Args:
+            worker: ID of the claiming worker
+            max_cost: Only claim jobs estimated at up to this many seconds
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            query = ("SELECT id, session_id, position, filename, input_path, save_locally, attempts FROM jobs "
+                     "WHERE state = 'queued'")
+            args = [time.time()]
+            if max_cost is not None:
+                query += " AND cost <= ?"
+                args.insert(0, max_cost)
+            row = conn.execute(query + f" ORDER BY {PRIORITY}, created, position LIMIT 1", args).fetchone()
+            if row:
+                conn.execute("UPDATE jobs SET state = 'running', worker = ?, heartbeat = ?, attempts = attempts + 1 "
+                             "WHERE id = ?", (worker, time.time(), row[0]))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        keys = ('id', 'session_id', 'position', 'filename', 'input_path', 'save_locally', 'attempts')
+        job = dict(zip(keys, row))
+        job['save_locally'] = bool(job['save_locally'])
+        job['attempts'] += 1
+        return job
+
+    def heartbeat(self, worker, job_ids=None):
+        """Show that ``worker`` is still running its jobs (or only ``job_ids`` of them)."""
+        now = time.time()
+        conn = self._connect()
+        if job_ids is None:
+            conn.execute("UPDATE jobs SET heartbeat = ? WHERE worker = ? AND state = 'running'", (now, worker))
+        else:
+            conn.executemany("UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ? AND state = 'running'",
+                             [(now, job_id, worker) for job_id in job_ids])
+        conn.execute("UPDATE workers SET last_seen = ? WHERE id = ?", (now, worker))
+
+    def get_job(self, job_id):
+        """A job's record (as returned by claim_job, plus its state and worker), or None."""
+        row = self._connect().execute("SELECT session_id, position, filename, input_path, save_locally, state, worker "
+                                      "FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        keys = ('session_id', 'position', 'filename', 'input_path', 'save_locally', 'state', 'worker')
+        job = dict(zip(keys, row), id=job_id)
+        job['save_locally'] = bool(job['save_locally'])
+        return job
+
+    def requeue_stale_jobs(self, max_age):
+        """Queue running jobs again whose worker has not sent a heartbeat for ``max_age`` seconds.
+
+        Returns:
+            int: Number of jobs requeued
+        """
+        return self._connect().execute(
+            "UPDATE jobs SET state = 'queued', worker = NULL WHERE state = 'running' AND heartbeat < ?",
+            (time.time() - max_age,)).rowcount
+
+    def finish_job(self, job_id, result, failed=False, worker=None):
+        """Record a job's result dict; its checkpoints are no longer needed.
+
+        Args:
+            worker: Only record the result if the job is still running for this worker
+                (it may have been requeued and claimed by another one meanwhile)
+
+        Returns:
+            bool: False if nothing was recorded
+        """
+        conn = self._connect()
+        query = "UPDATE jobs SET state = ?, result = ?, worker = NULL, finished = ? WHERE id = ?"
+        args = ['failed' if failed else 'done', json.dumps(result), time.time(), job_id]
+        if worker is not None:
+            query += " AND worker = ? AND state = 'running'"
+            args.append(worker)
+        if not conn.execute(query, args).rowcount:
+            return False
+        self.delete_checkpoints(job_id)
+        return True
+
+    def pending_jobs(self, session_id=None):
+        """Number of queued or running jobs (of one session, or all)."""
+        query = "SELECT COUNT(*) FROM jobs WHERE state IN ('queued', 'running')"
+        args = ()
+        if session_id is not None:
+            query += " AND session_id = ?"
+            args = (session_id,)
+        return self._connect().execute(query, args).fetchone()[0]
+
+    def queue_totals(self):
+        """Queued and running jobs, with their total bytes and estimated OCR pages."""
+        row = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0), COALESCE(SUM(ocr_pages), 0) FROM jobs "
+            "WHERE state IN ('queued', 'running')").fetchone()
+        return {'jobs': row[0], 'bytes': row[1], 'ocr_pages': row[2]}
+
+    def queue_position(self, session_id):
+        """Queued jobs of other sessions that start before the session's next queued job (as of now).
+
+        Returns:
+            int or None: None once none of the session's jobs is waiting
+        """
+        conn = self._connect()
+        now = time.time()
+        first = conn.execute(f"SELECT MIN({PRIORITY}) FROM jobs WHERE session_id = ? AND state = 'queued'",
+                             (now, session_id)).fetchone()[0]
+        if first is None:
+            return None
+        return conn.execute(f"SELECT COUNT(*) FROM jobs WHERE state = 'queued' AND session_id != ? AND {PRIORITY} < ?",
+                            (session_id, now, first)).fetchone()[0]
+
+    def recent_throughput(self, seconds):
+        """Jobs finished per second over the last ``seconds`` (0.0 if none)."""
+        done = self._connect().execute("SELECT COUNT(*) FROM jobs WHERE finished >= ?",
+                                       (time.time() - seconds,)).fetchone()[0]
+        return done / seconds
+
+    def save_checkpoint(self, job_id, key, value):
+        self._connect().execute("INSERT OR REPLACE INTO checkpoints (job_id, key, value) VALUES (?, ?, ?)",
+                                (job_id, key, json.dumps(value)))
+
+    def delete_checkpoints(self, job_id):
+        self._connect().execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+
+    def get_checkpoint(self, job_id, key):
+        """A value saved by an earlier attempt at the job, or None."""
+        row = self._connect().execute("SELECT value FROM checkpoints WHERE job_id = ? AND key = ?",
+                                      (job_id, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # Remote workers (other machines converting jobs from this queue, see worker_client)
+
+    def register_worker(self, worker_id, name, address, slots):
+        now = time.time()
+        self._connect().execute("INSERT OR REPLACE INTO workers (id, name, address, slots, registered, last_seen) "
+                                "VALUES (?, ?, ?, ?, ?, ?)", (worker_id, name, address, slots, now, now))
+
+    def get_worker(self, worker_id):
+        """A registered worker's name, address and slots, or None."""
+        row = self._connect().execute("SELECT name, address, slots FROM workers WHERE id = ?", (worker_id,)).fetchone()
+        return {'id': worker_id, 'name': row[0], 'address': row[1], 'slots': row[2]} if row else None
+
+    def workers(self, max_age):
+        """Registered workers seen in the last ``max_age`` seconds, with the number of jobs each is running."""
+        rows = self._connect().execute(
+            "SELECT w.id, w.name, w.address, w.slots, w.last_seen, "
+            "(SELECT COUNT(*) FROM jobs WHERE jobs.worker = w.id AND jobs.state = 'running') "
+            "FROM workers w WHERE w.last_seen >= ? ORDER BY w.name", (time.time() - max_age,)).fetchall()
+        keys = ('id', 'name', 'address', 'slots', 'last_seen', 'running')
+        return [dict(zip(keys, row)) for row in rows]
+
+    # Converted files waiting for download
+
+    def put_artifact(self, file_id, filename, path):
+        self._connect().execute("INSERT OR REPLACE INTO artifacts (id, filename, path, created) VALUES (?, ?, ?, ?)",
+                                (file_id, filename, path, time.time()))
+
+    def get_artifact(self, file_id):
+        """{'filename': ..., 'path': ...} for a converted file, or None."""
+        row = self._connect().execute("SELECT filename, path FROM artifacts WHERE id = ?", (file_id,)).fetchone()
+        return {'filename': row[0], 'path': row[1]} if row else None
+
+    def expire_artifact(self, file_id, seconds):
+        """Delete the file and its record ``seconds`` from now (unless an earlier expiry is already set)."""
+        self._connect().execute("UPDATE artifacts SET expires = ? WHERE id = ? AND expires IS NULL",
+                                (time.time() + seconds, file_id))
+
+    # Small values shared between processes (e.g. hot-folder statistics)
+
+    def put_value(self, key, value):
+        self._connect().execute("INSERT OR REPLACE INTO shared_values (key, value, updated) VALUES (?, ?, ?)",
+                                (key, json.dumps(value), time.time()))
+
+    def get_value(self, key, max_age=None):
+        """A shared value, or None if unset or older than ``max_age`` seconds."""
+        row = self._connect().execute("SELECT value, updated FROM shared_values WHERE key = ?", (key,)).fetchone()
+        if row is None or (max_age is not None and time.time() - row[1] > max_age):
+            return None
+        return json.loads(row[0])
+
+    def values(self, prefix):
+        """All shared values whose key starts with ``prefix``."""
+        rows = self._connect().execute("SELECT value FROM shared_values WHERE substr(key, 1, ?) = ?",
+                                       (len(prefix), prefix))
+        return [json.loads(row[0]) for row in rows]
+
+    def delete_values(self, prefix):
+        self._connect().execute("DELETE FROM shared_values WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def purge_expired(self):
+        """Delete expired sessions (with their finished jobs) and artifacts (including the artifacts' files)."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("DELETE FROM sessions WHERE expires <= ?", (now,))
+        conn.execute("DELETE FROM jobs WHERE state IN ('done', 'failed') AND COALESCE(finished, 0) <= ? "
+                     "AND session_id NOT IN (SELECT id FROM sessions)", (now - JOB_HISTORY_SECONDS,))
+        expired = conn.execute("SELECT id, path FROM artifacts WHERE expires <= ?", (now,)).fetchall()
+        for file_id, path in expired:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Already removed by another process
+            conn.execute("DELETE FROM artifacts WHERE id = ?", (file_id,))
@@ -0,0 +1,143 @@
+# Legal Markdown Converter - Job Queue Tests
+"""
+Checks the order in which StateStore.claim_job hands out queued jobs, the
+requeueing of jobs whose worker stopped sending heartbeats, and the
+admission helpers over_limit and retry_after.
+
+Run with: python -m pytest test_job_queue.py
+"""
+
+import time
+
+import pytest
+
+import state_store
+from state_store import StateStore, AGING_RATE
+from job_queue import over_limit, retry_after, STALE_SECONDS, MIN_RETRY_AFTER, MAX_RETRY_AFTER, DEFAULT_RETRY_AFTER
+
+
+@pytest.fixture
+def store(tmp_path):
+    return StateStore(str(tmp_path / "state.db"))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable time.time() for state_store, starting now."""
+    now = [time.time()]
+    monkeypatch.setattr(state_store.time, "time", lambda: now[0])
+    return now
+
+
+def add(store, job_id, cost=0.0, position=0, size=0, ocr_pages=0):
+    store.add_job(job_id, "session", position, f"{job_id}.pdf", f"/tmp/{job_id}.pdf", False,
+                  size=size, ocr_pages=ocr_pages, cost=cost)
+
+
+def claim_all(store, worker="w1", max_cost=None):
+    ids = []
+    while True:
+        job = store.claim_job(worker, max_cost)
+        if job is None:
+            return ids
+        ids.append(job['id'])
+
+
+def test_shortest_job_first(store, clock):
+    add(store, "scan", cost=900)
+    add(store, "docx", cost=1)
+    add(store, "brief", cost=20)
+    assert claim_all(store) == ["docx", "brief", "scan"]
+
+
+def test_ties_go_to_the_oldest_job_then_upload_order(store, clock):
+    add(store, "second", cost=5, position=2)
+    add(store, "first", cost=5, position=1)
+    clock[0] += 1
+    add(store, "later", cost=5, position=0)
+    assert claim_all(store) == ["first", "second", "later"]
+
+
+def test_waiting_jobs_age_ahead_of_new_short_ones(store, clock):
+    add(store, "scan", cost=100)
+    clock[0] += 100 / AGING_RATE + 1
+    add(store, "docx", cost=1)
+    assert claim_all(store) == ["scan", "docx"]
+
+
+def test_max_cost_leaves_long_jobs_queued(store, clock):
+    add(store, "scan", cost=900)
+    add(store, "docx", cost=1)
+    assert claim_all(store, max_cost=30) == ["docx"]
+    assert claim_all(store) == ["scan"]
+
+
+def test_claimed_job_is_not_handed_out_twice(store, clock):
+    add(store, "only")
+    job = store.claim_job("w1")
+    assert job['id'] == "only" and job['attempts'] == 1
+    assert store.claim_job("w2") is None
+    assert store.get_job("only")['state'] == 'running'
+
+
+def test_stale_job_is_requeued_for_another_worker(store, clock):
+    add(store, "job")
+    store.claim_job("w1")
+    clock[0] += STALE_SECONDS + 1
+    assert store.requeue_stale_jobs(STALE_SECONDS) == 1
+    assert store.get_job("job")['state'] == 'queued'
+
+    job = store.claim_job("w2")
+    assert job['id'] == "job" and job['attempts'] == 2
+    # The first worker's late result is not recorded over the second one's run
+    assert not store.finish_job("job", {'type': 'success'}, worker="w1")
+    assert store.finish_job("job", {'type': 'success'}, worker="w2")
+    assert store.get_job("job")['state'] == 'done'
+
+
+def test_heartbeat_keeps_a_running_job(store, clock):
+    add(store, "job")
+    store.claim_job("w1")
+    clock[0] += STALE_SECONDS + 1
+    store.heartbeat("w1", ["job"])
+    assert store.requeue_stale_jobs(STALE_SECONDS) == 0
+    assert store.get_job("job")['worker'] == "w1"
+
+
+def test_queue_totals_count_queued_and_running_jobs(store, clock):
+    add(store, "a", position=0, size=100, ocr_pages=3)
+    add(store, "b", position=1, size=50, ocr_pages=0)
+    add(store, "c", position=2, size=10, ocr_pages=1)
+    assert store.claim_job("w1")['id'] == "a"
+    store.finish_job(store.claim_job("w1")['id'], {'type': 'success'})
+    assert store.queue_totals() == {'jobs': 2, 'bytes': 110, 'ocr_pages': 4}
+
+
+def test_over_limit_admits_anything_into_an_empty_queue():
+    empty = {'jobs': 0, 'bytes': 0, 'ocr_pages': 0}
+    assert over_limit(empty, {'jobs': 1, 'ocr_pages': 5000}, {'max_ocr_pages': 10}) is None
+
+
+def test_over_limit_reports_the_first_limit_exceeded():
+    totals = {'jobs': 10, 'bytes': 100 * 1024 * 1024, 'ocr_pages': 400}
+    limits = {'max_jobs': 20, 'max_mb': 150, 'max_ocr_pages': 500}
+    assert over_limit(totals, {'jobs': 1, 'bytes': 1024, 'ocr_pages': 50}, limits) is None
+
+    key, share = over_limit(totals, {'jobs': 1, 'bytes': 0, 'ocr_pages': 200}, limits)
+    assert key == 'max_ocr_pages'
+    assert share == pytest.approx(100 / 400)
+
+    key, share = over_limit(totals, {'jobs': 1, 'bytes': 200 * 1024 * 1024}, limits)
+    assert key == 'max_mb' and share == 1.0
+
+
+def test_over_limit_ignores_unset_limits():
+    totals = {'jobs': 1000, 'bytes': 10 ** 12, 'ocr_pages': 10 ** 6}
+    assert over_limit(totals, {'jobs': 1}, {'max_jobs': 0, 'max_mb': None}) is None
+
+
+def test_retry_after():
+    assert retry_after(10, 0.5, 0) == DEFAULT_RETRY_AFTER
+    assert retry_after(100, 0.5, 1.0) == 50
+    assert retry_after(1, 0.1, 10.0) == MIN_RETRY_AFTER
+    assert retry_after(10000, 1.0, 0.1) == MAX_RETRY_AFTER
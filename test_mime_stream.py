@@ -0,0 +1,170 @@
+# Legal Markdown Converter - Streaming MIME Parser Tests
+"""
+Checks parse_message against the standard library's email.parser on a few
+multipart messages, with CRLF and LF line endings and with the message read
+in small blocks so that boundaries and base64 lines are split across reads.
+
+Run with: python -m pytest test_mime_stream.py
+"""
+
+import base64
+from io import BytesIO
+from email import policy
+from email.parser import BytesParser
+
+import pytest
+
+import mime_stream
+from mime_stream import parse_message, read_attachment, close_attachments
+
+PDF_BYTES = b"%PDF-1.4\n" + bytes(range(256)) * 8 + b"\n%%EOF\n"
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + bytes(range(255, -1, -1)) * 3
+
+
+def _base64_lines(data):
+    encoded = base64.b64encode(data).decode("ascii")
+    return "\n".join(encoded[i:i + 76] for i in range(0, len(encoded), 76))
+
+
+MIXED = f"""From: a@example.com
+To: b@example.com
+Subject: Production
+MIME-Version: 1.0
+Content-Type: multipart/mixed; boundary="outer"
+
+This is the preamble.
+--outer
+Content-Type: text/plain; charset="utf-8"
+Content-Transfer-Encoding: quoted-printable
+
+Please find the exhibits attached.=0AThe caf=C3=A9 receipt is exhibit B.
+--outer
+Content-Type: application/pdf; name="exhibit_a.pdf"
+Content-Disposition: attachment; filename="exhibit_a.pdf"
+Content-Transfer-Encoding: base64
+
+{_base64_lines(PDF_BYTES)}
+--outer
+Content-Type: text/plain; charset="utf-8"; name="notes.txt"
+Content-Disposition: attachment; filename="notes.txt"
+
+--not a boundary, just a dashed line
+Second line.
+--outer--
+This is the epilogue.
+"""
+
+ALTERNATIVE = f"""From: a@example.com
+Subject: Newsletter
+MIME-Version: 1.0
+Content-Type: multipart/mixed; boundary="mixed"
+
+--mixed
+Content-Type: multipart/related; boundary="related"
+
+--related
+Content-Type: multipart/alternative; boundary="alt"
+
+--alt
+Content-Type: text/plain; charset="us-ascii"
+
+Plain text version.
+--alt
+Content-Type: text/html; charset="us-ascii"
+
+<html><body><p>HTML version</p><img src="cid:logo@example"></body></html>
+--alt--
+
+--related
+Content-Type: image/png; name="logo.png"
+Content-Disposition: inline; filename="logo.png"
+Content-ID: <logo@example>
+Content-Transfer-Encoding: base64
+
+{_base64_lines(PNG_BYTES)}
+--related--
+
+--mixed
+Content-Type: application/pdf
+Content-Disposition: attachment; filename="exhibit_b.pdf"
+Content-Transfer-Encoding: base64
+
+{_base64_lines(PDF_BYTES[::-1])}
+--mixed--
+"""
+
+# Transport padding after the boundaries, an empty part and a boundary that is a prefix of the next
+PADDED = """From: a@example.com
+Subject: Padded
+MIME-Version: 1.0
+Content-Type: multipart/mixed; boundary="b"
+
+--b   \t
+Content-Type: text/plain
+
+Body text.
+--b
+Content-Type: text/plain
+Content-Disposition: attachment; filename="empty.txt"
+
+--b
+Content-Type: text/plain
+Content-Disposition: attachment; filename="dashes.txt"
+
+--bb is not our boundary
+--b--
+"""
+
+SAMPLES = {'mixed': MIXED, 'alternative': ALTERNATIVE, 'padded': PADDED}
+
+
+def _reference(raw):
+    """Body text and attachments of a message as the standard library parses it."""
+    msg = BytesParser(policy=policy.default).parsebytes(raw)
+    body = msg.get_body(preferencelist=('plain', 'html'))
+    attachments = [(part.get_filename(), part.get_content_type(), part.get_payload(decode=True))
+                   for part in msg.walk() if part.get_filename()]
+    return body.get_content(), [a for a in attachments if a[2]]
+
+
+def _parse(raw):
+    parsed = parse_message(BytesIO(raw))
+    try:
+        attachments = [(a['filename'], a['content_type'], read_attachment(a)) for a in parsed['attachments']]
+    finally:
+        close_attachments(parsed['attachments'])
+    return parsed, attachments
+
+
+@pytest.mark.parametrize("line_end", ["\r\n", "\n"], ids=["crlf", "lf"])
+@pytest.mark.parametrize("read_size", [mime_stream.READ_SIZE, 7], ids=["one_read", "small_reads"])
+@pytest.mark.parametrize("name", sorted(SAMPLES))
+def test_matches_email_parser(monkeypatch, name, line_end, read_size):
+    monkeypatch.setattr(mime_stream, "READ_SIZE", read_size)
+    raw = SAMPLES[name].replace("\n", line_end).encode("utf-8")
+
+    parsed, attachments = _parse(raw)
+    body, expected_attachments = _reference(raw)
+
+    assert parsed['plain'].rstrip() == body.rstrip()
+    assert attachments == expected_attachments
+    assert parsed['headers']['Subject'] == BytesParser(policy=policy.default).parsebytes(raw)['Subject']
+
+
+def test_inline_image_is_referenced_by_html():
+    parsed, attachments = _parse(ALTERNATIVE.encode("utf-8"))
+    logo = next(a for a in parsed['attachments'] if a['filename'] == 'logo.png')
+    assert logo['inline'] and logo['content_id'] == 'logo@example'
+    assert parsed['cid_refs'] == {'logo@example'}
+    assert ('logo.png', 'image/png', PNG_BYTES) in attachments
+
+
+def test_large_attachment_is_spooled_to_disk():
+    raw = MIXED.replace("\n", "\r\n").encode("utf-8")
+    parsed = parse_message(BytesIO(raw), spool_max_memory=64)
+    try:
+        pdf = next(a for a in parsed['attachments'] if a['filename'] == 'exhibit_a.pdf')
+        assert pdf['file']._rolled
+        assert pdf['size'] == len(PDF_BYTES) and read_attachment(pdf) == PDF_BYTES
+    finally:
+        close_attachments(parsed['attachments'])
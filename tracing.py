@@ -0,0 +1,189 @@
+# Legal Markdown Converter - Per-Job Trace Recording
+"""
+Records a tree of timed spans for each conversion job so slow jobs can be
+diagnosed after the fact.
+
+Usage:
+    with start_trace('process_single_file', folder=TRACE_FOLDER, filename=name) as trace:
+        ...
+
+    @traced()
+    def parse_msg(...): ...
+
+    with span('ocr_page', page=3):
+        ...
+
+Spans are attached to whichever trace is active in the current context; code
+running outside a trace (benchmarks, scripts) records nothing. Work handed to
+other threads must be run with ``contextvars.copy_context().run`` (see
+``run_in_context``) to stay attached to the job's trace.
+
+When the root span finishes, the trace is written to ``<folder>/<trace_id>.jsonl``
+with one JSON object per span.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from functools import wraps
+from contextlib import contextmanager
+
+# Oldest trace files are removed once a folder holds more than this many
+MAX_TRACE_FILES = 500
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    def __init__(self, trace, name, parent_id, attrs):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attrs = dict(attrs)
+        self.start = time.perf_counter()
+        self.end = None
+        self.error = None
+        self.thread = threading.current_thread().name
+
+    def to_dict(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        record = {
+            'trace_id': self.trace.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_ms': round((self.start - self.trace.start) * 1000, 3),
+            'duration_ms': round((end - self.start) * 1000, 3),
+            'thread': self.thread,
+            'attrs': self.attrs,
+        }
+        if self.error:
+            record['error'] = self.error
+        return record
+
+
+class Trace:
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or str(uuid.uuid4())
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def save(self, folder):
+        """Write the trace as JSONL, ordered by span start time."""
+        os.makedirs(folder, exist_ok=True)
+        with self._lock:
+            records = [s.to_dict() for s in sorted(self.spans, key=lambda s: s.start)]
+        path = os.path.join(folder, f"{self.trace_id}.jsonl")
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in records:
+                record['started_at'] = self.started_at
+                f.write(json.dumps(record, default=str) + '\n')
+        _prune(folder)
+        return path
+
+
+def _prune(folder):
+    try:
+        files = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith('.jsonl')]
+        if len(files) > MAX_TRACE_FILES:
+            files.sort(key=os.path.getmtime)
+            for path in files[:len(files) - MAX_TRACE_FILES]:
+                os.remove(path)
+    except OSError:
+        pass
+
+
+@contextmanager
+def _enter(span):
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name, folder=None, trace_id=None, **attrs):
+    """Start a new trace with a root span; saved to ``folder`` (if given) on exit."""
+    trace = Trace(trace_id)
+    root = Span(trace, name, None, attrs)
+    trace.add(root)
+    trace.root = root
+    try:
+        with _enter(root):
+            yield trace
+    finally:
+        if folder:
+            try:
+                trace.save(folder)
+            except OSError:
+                pass
+
+
+@contextmanager
+def span(name, **attrs):
+    """Record a child span of the current span. Does nothing outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent.span_id, attrs)
+    parent.trace.add(child)
+    with _enter(child):
+        yield child
+
+
+def traced(name=None):
+    """Decorator recording each call of a function as a span."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_attributes(**attrs):
+    """Attach attributes to the current span (no-op outside a trace)."""
+    current = _current_span.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+def run_in_context(fn):
+    """Wrap ``fn`` so it runs in a copy of the caller's context (for thread pools)."""
+    ctx = contextvars.copy_context()
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so copy per call
+        return ctx.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+def load_trace(folder, trace_id):
+    """Read a saved trace back as a list of span dicts, or None if missing."""
+    path = os.path.join(folder, f"{trace_id}.jsonl")
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,221 @@
+# Legal Markdown Converter - Remote Worker
+"""
+Worker mode: this machine converts jobs from another instance's queue (the
+coordinator) instead of serving uploads itself, so idle office machines can
+share the load of one busy converter.
+
+Protocol (JSON over HTTP, all under /workers on the coordinator):
+- POST /workers/register        {name, address, slots} -> {worker_id}
+- POST /workers/<id>/heartbeat  {jobs} every few seconds, naming the jobs still being converted;
+                                404 means register again
+- POST /workers/<id>/claim      {max_cost} -> a job ({id, filename, profile, pdf_engine, ...}), or 204 when
+                                the queue is empty (max_cost: only jobs estimated at up to that many seconds)
+- GET  .../jobs/<job>/input     the uploaded file
+- POST .../jobs/<job>/status    progress ({current_status, ocr_progress}) for the uploader's progress page
+- PUT  .../jobs/<job>/output    the markdown, streamed from the file it was written to
+- POST .../jobs/<job>/result    the result dict; the job is done
+
+A worker that stops sending heartbeats is treated like a killed server
+process: the coordinator puts its jobs back in the queue for another worker
+(see job_queue). A 409 reply means the job was reassigned in the meantime,
+and the worker drops it.
+
+Workers must send the coordinator's worker token in the X-Worker-Token
+header; a coordinator without a token refuses all workers.
+"""
+
+import os
+import json
+import socket
+import threading
+import urllib.error
+import urllib.request
+
+from job_queue import HEARTBEAT_INTERVAL, QUICK_JOB_SECONDS
+
+# Seconds before an HTTP call to the coordinator is given up
+REQUEST_TIMEOUT = 60
+# Seconds to wait before retrying when the coordinator cannot be reached
+RETRY_INTERVAL = 5
+# Attempts at delivering a finished job before it is left for the coordinator to reassign
+DELIVERY_ATTEMPTS = 3
+
+
+class JobReassigned(Exception):
+    """The coordinator gave the job to another worker."""
+
+
+class RemoteWorker:
+    """Pulls jobs from a coordinator and converts them on this machine.
+
+    Args:
+        coordinator: Base URL of the coordinating instance (e.g. "http://192.168.1.20:5050")
+        process_fn: Called as ``process_fn(job, file_data, report)``; converts
+            the file and returns ``(result, output_path)`` (output_path None
+            when there is no output). ``report(**fields)`` sends progress fields.
+        name: Name shown on the coordinator (default: the host name)
+        slots: Jobs converted at the same time (with 2 or more, one only takes quick jobs, as in JobRunner)
+        token: Shared secret configured on the coordinator, if any
+        poll_interval: Seconds between claims while the queue is empty
+    """
+
+    def __init__(self, coordinator, process_fn, name=None, slots=2, token=None, poll_interval=1.0):
+        self.coordinator = coordinator.rstrip('/')
+        self.process_fn = process_fn
+        self.name = name or socket.gethostname()
+        self.slots = max(1, int(slots))
+        self.token = token
+        self.poll_interval = poll_interval
+        self.worker_id = None
+        self._registered = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._active = set()
+        self._completed = 0
+        self._failed = 0
+
+    # HTTP
+
+    def _request(self, method, path, payload=None, data=None, headers=None):
+        """Call the coordinator; returns (status, body bytes). Raises OSError when it cannot be reached."""
+        headers = dict(headers or {})
+        if payload is not None:
+            data = json.dumps(payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        if self.token:
+            headers['X-Worker-Token'] = self.token
+        req = urllib.request.Request(self.coordinator + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def _job_call(self, method, job, action, **kwargs):
+        status, body = self._request(method, f"/workers/{self.worker_id}/jobs/{job['id']}/{action}", **kwargs)
+        if status == 409:
+            raise JobReassigned(job['id'])
+        if status != 200:
+            raise OSError(f"coordinator answered {status} to {action}: {body[:200]!r}")
+        return body
+
+    # Registration and heartbeats
+
+    def register(self):
+        """Register with the coordinator, retrying until it answers."""
+        while not self._stop.is_set():
+            try:
+                status, body = self._request('POST', '/workers/register', {
+                    'name': self.name, 'address': socket.gethostname(), 'slots': self.slots})
+                if status == 200:
+                    self.worker_id = json.loads(body)['worker_id']
+                    self._registered.set()
+                    return
+                print(f"Coordinator refused registration ({status}): {body[:200]!r}")
+            except OSError as e:
+                print(f"Coordinator {self.coordinator} not reachable ({e}), retrying...")
+            self._stop.wait(RETRY_INTERVAL)
+
+    def _heartbeat(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                with self._lock:
+                    active = sorted(self._active)
+                status, _ = self._request('POST', f"/workers/{self.worker_id}/heartbeat", {'jobs': active})
+                if status == 404:
+                    # The coordinator forgot us (its database was reset); its stale check requeues our jobs
+                    self._registered.clear()
+                    self.register()
+            except OSError:
+                pass  # Jobs in flight are reassigned if this lasts; keep trying
+
+    # Jobs
+
+    def _claim(self, max_cost=None):
+        self._registered.wait()
+        try:
+            status, body = self._request('POST', f"/workers/{self.worker_id}/claim", {'max_cost': max_cost})
+        except OSError:
+            self._stop.wait(RETRY_INTERVAL)
+            return None
+        if status == 200:
+            return json.loads(body)
+        if status == 404:
+            self._registered.clear()
+        self._stop.wait(self.poll_interval)
+        return None
+
+    def _run(self, job):
+        file_data = self._job_call('GET', job, 'input')
+
+        def report(**fields):
+            try:
+                self._job_call('POST', job, 'status', payload=fields)
+            except (OSError, JobReassigned):
+                pass  # Progress only; the result is what matters
+
+        result, output_path = self.process_fn(job, file_data, report)
+        for attempt in range(1, DELIVERY_ATTEMPTS + 1):
+            try:
+                if output_path:
+                    with open(output_path, 'rb') as f:
+                        self._job_call('PUT', job, 'output', data=f, headers={
+                            'Content-Type': 'text/markdown; charset=utf-8',
+                            'Content-Length': str(os.path.getsize(output_path))})
+                self._job_call('POST', job, 'result', payload=result)
+                return result
+            except JobReassigned:
+                raise
+            except OSError:
+                if attempt == DELIVERY_ATTEMPTS:
+                    raise
+                self._stop.wait(RETRY_INTERVAL)
+
+    def _work(self, max_cost=None):
+        while not self._stop.is_set():
+            job = self._claim(max_cost)
+            if job is None:
+                continue
+            with self._lock:
+                self._active.add(job['id'])
+            try:
+                result = self._run(job)
+                ok = result.get('type') != 'error'
+            except JobReassigned:
+                print(f"{job['filename']}: reassigned by the coordinator, dropped")
+                ok = False
+            except OSError as e:
+                # No longer in our heartbeats, so the coordinator reassigns it
+                print(f"{job['filename']}: could not reach the coordinator ({e})")
+                ok = False
+            with self._lock:
+                self._active.discard(job['id'])
+                if ok:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+
+    def stats(self):
+        with self._lock:
+            return {'worker_id': self.worker_id, 'coordinator': self.coordinator,
+                    'completed': self._completed, 'failed': self._failed}
+
+    def start(self):
+        """Register, then start the heartbeat and ``slots`` conversion threads."""
+        self.register()
+        threading.Thread(target=self._heartbeat, name="worker-heartbeat", daemon=True).start()
+        for i in range(self.slots):
+            max_cost = QUICK_JOB_SECONDS if i == 0 and self.slots > 1 else None
+            threading.Thread(target=self._work, args=(max_cost,), name=f"remote-job-{i}", daemon=True).start()
+
+    def run_forever(self):
+        self.start()
+        try:
+            while not self._stop.wait(1):
+                pass
+        except KeyboardInterrupt:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        self._registered.set()
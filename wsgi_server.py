@@ -0,0 +1,103 @@
+# Legal Markdown Converter - Production WSGI Server
+"""
+Serves the Flask app with a production WSGI server instead of the
+single-process development server:
+
+- macOS/Linux: gunicorn with several worker processes, each running a few
+  threads (``gthread`` workers), so one slow upload or status poll does not
+  hold up the others and a crashed worker is replaced
+- Windows: waitress (gunicorn does not run there), one process with a
+  thread pool
+
+Both are optional dependencies, only needed for ``"server": {"mode":
+"production"}``. All state the workers share lives in the state store (see
+state_store), so any worker can answer any request.
+"""
+
+import sys
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Seconds a worker may stay silent before gunicorn replaces it (large uploads are read inside the request)
+WORKER_TIMEOUT = 300
+
+
+def _serve_gunicorn(app, port, workers, threads, on_worker_start):
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'0.0.0.0:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('timeout', WORKER_TIMEOUT)
+            if on_worker_start:
+                self.cfg.set('post_worker_init', lambda worker: on_worker_start())
+
+        def load(self):
+            return app
+
+    Server().run()
+
+
+def _serve_waitress(app, port, threads, on_worker_start):
+    from waitress import serve
+
+    if on_worker_start:
+        on_worker_start()
+    serve(app, host='0.0.0.0', port=port, threads=threads)
+
+
+def available_server():
+    """Name of the production server that can run here ('gunicorn' or 'waitress'), or None."""
+    candidates = ('waitress',) if sys.platform == 'win32' else ('gunicorn', 'waitress')
+    for name in candidates:
+        try:
+            __import__(name)
+            return name
+        except ImportError:
+            pass
+    return None
+
+
+def serve(app, port, workers=4, threads=8, on_worker_start=None):
+    """Run ``app`` with a production WSGI server until it is stopped.
+
+    Args:
+        app: The Flask app
+        port: Port to listen on (all interfaces)
+        workers: Worker processes (gunicorn only)
+        threads: Request threads per worker
+        on_worker_start: Optional callable run once in each worker process after it starts
+
+    Returns:
+        bool: False if no production server is installed (nothing was run)
+    """
+    server = available_server()
+    if server == 'gunicorn':
+        _serve_gunicorn(app, port, workers, threads, on_worker_start)
+    elif server == 'waitress':
+        _serve_waitress(app, port, threads, on_worker_start)
+    return server is not None
+
+
+def try_lock(path):
+    """Take an exclusive lock on ``path`` without waiting, for work only one process may do.
+
+    Returns:
+        The open lock file (keep it open to hold the lock), or None if another
+        process holds it. Where file locks are unavailable the lock always succeeds.
+    """
+    lock_file = open(path, 'a')
+    if fcntl is None:
+        return lock_file  # Windows: waitress runs a single process
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file